@@ -0,0 +1,167 @@
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from utils.config import Config
+from utils.cache_stub import Corpus, CacheStub, make_synthetic_corpus
+from utils.metrics import metrics
+
+# End-to-end crawl benchmark: runs the full Crawler from config.ini against utils.cache_stub
+# serving a recorded (or generated) corpus, and reports pages/s, peak RSS and the crawler's own
+# metrics (utils/metrics.py): per-stage latency percentiles and how long threads waited on locks.
+#
+#   python3 bench_crawl.py                          # generated corpus, no latency
+#   python3 bench_crawl.py --latency 0.05 --error_rate 0.01 --threads 16
+#   python3 bench_crawl.py --politeness 0.05 --slow_hosts lab1.ics.uci.edu --slow_error_rate 0.3
+#   python3 bench_crawl.py --partitions 4           # distributed crawl, 4 local processes
+#   python3 bench_crawl.py --page_cache pages.db    # twice: a first crawl, then a recrawl
+#   python3 bench_crawl.py --record corpus_dir      # crawl through the real cache server and record it
+#   python3 bench_crawl.py --corpus corpus_dir      # replay the recording
+
+
+def make_config(args, directory, cache_server):
+    cparser = ConfigParser()
+    cparser.read(args.config_file)
+    local = cparser["LOCAL PROPERTIES"]
+    local["SAVE"] = os.path.join(directory, "frontier.db")
+    local["ROBOTSFILE"] = os.path.join(directory, "robots.json")
+    local["TRAPREPORT"] = os.path.join(directory, "traps.json")
+    # a page cache of an earlier run makes the crawl a recrawl, by default every run starts empty
+    local["PAGECACHE"] = args.page_cache or os.path.join(directory, "pages.db")
+    if args.threads:
+        local["THREADCOUNT"] = str(args.threads)
+    if args.download_mode:
+        local["DOWNLOADMODE"] = args.download_mode
+    if args.partitions:
+        local["PARTITIONS"] = str(args.partitions)
+    if args.politeness is not None:
+        cparser["CRAWLER"]["POLITENESS"] = str(args.politeness)
+    config = Config(cparser)
+    config.cache_server = cache_server
+    return config
+
+
+def record(args):
+    # A normal crawl through the real cache server that saves every response into the corpus
+    from utils.server_registration import get_cache_server
+    from crawler import Crawler
+    import crawler.worker as worker_module
+    from utils.robots import get_robots_cache
+
+    corpus = Corpus(args.record)
+    directory = tempfile.mkdtemp()
+    try:
+        config = make_config(args, directory, None)
+        config.cache_server = get_cache_server(config, True)
+        corpus.set_seeds(config.seed_urls)
+
+        def download(url, config, logger=None):
+            resp = original(url, config, logger)
+            corpus.record(url, resp)
+            return resp
+
+        original = worker_module.download
+        worker_module.download = download
+        get_robots_cache(config).fetch_url = download
+        Crawler(config, True).start()
+        print(f"Recorded {len(corpus)} responses in {args.record}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def replay(args):
+    from crawler import Crawler
+
+    directory = tempfile.mkdtemp()
+    try:
+        if args.corpus:
+            corpus = Corpus(args.corpus)
+        else:
+            corpus = make_synthetic_corpus(
+                os.path.join(directory, "corpus"), args.hosts, args.pages_per_host)
+        slow_hosts = [host.strip() for host in (args.slow_hosts or "").split(",") if host.strip()]
+        stub = CacheStub(corpus, args.latency, args.jitter, args.error_rate, seed=0, host_profiles={
+            host: (args.slow_latency, args.slow_error_rate) for host in slow_hosts})
+        if args.politeness is None:
+            # the stub does not need politeness, so by default the crawl runs as fast as it can
+            args.politeness = 0
+        config = make_config(args, directory, stub.start())
+        config.seed_urls = corpus.seeds
+        if config.partitions > 1:
+            replay_distributed(config, stub)
+            return
+        crawler = Crawler(config, True)
+
+        start = time.perf_counter()
+        crawler.start()
+        elapsed = time.perf_counter() - start
+        stub.stop()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = metrics.snapshot()
+    pages = report["counters"].get("pages", 0)
+    print(f"\n{pages} pages ({stub.requests} cache server requests) in {elapsed:.2f}s: "
+          f"{pages / elapsed:.1f} pages/s, {config.threads_count} threads, {config.download_mode} mode")
+    print(f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MB")
+    # the percentiles are the upper bounds of the metrics' histogram buckets
+    print(f"\n{'stage':>14} {'count':>8} {'p50 ms':>9} {'p99 ms':>9} {'total s':>9}")
+    for stage, entry in sorted(report["stages"].items(), key=lambda item: -item[1]["seconds"]):
+        print(f"{stage:>14} {entry['count']:8d} {entry['p50'] * 1e3:9.2f} "
+              f"{entry['p99'] * 1e3:9.2f} {entry['seconds']:9.2f}")
+    print(f"\n{'lock':>14} {'contended':>10} {'wait s':>9}")
+    for name, entry in sorted(report["locks"].items()):
+        print(f"{name:>14} {entry['contended']:10d} {entry['wait_seconds']:9.3f}")
+    # politeness delays the rate control raised when the crawl ended
+    delays = report["gauges"].get("host delay") or dict()
+    print(f"\n{report['gauges'].get('host backoffs', 0)} host backoffs")
+    for host, delay in sorted(delays.items(), key=lambda item: -item[1]):
+        print(f"{host:>24} {delay:7.2f}s")
+
+
+def replay_distributed(config, stub):
+    # the stage metrics stay in the partitions' processes (METRICSFILE.<partition>), only the
+    # merged crawl statistics come back
+    from crawler import distributed
+
+    start = time.perf_counter()
+    report = distributed.crawl(config, True)
+    elapsed = time.perf_counter() - start
+    stub.stop()
+    print(f"\n{report['pages']} pages ({stub.requests} cache server requests) in {elapsed:.2f}s: "
+          f"{stub.requests / elapsed:.1f} requests/s, {config.partitions} partitions of "
+          f"{config.threads_count} threads, {config.download_mode} mode")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--corpus", type=str, default=None, help="recorded corpus to replay")
+    parser.add_argument("--record", type=str, default=None,
+                        help="crawl through the real cache server and record the responses here")
+    parser.add_argument("--hosts", type=int, default=8, help="hosts in the generated corpus")
+    parser.add_argument("--pages_per_host", type=int, default=250)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every reply")
+    parser.add_argument("--jitter", type=float, default=0, help="up to this many more seconds")
+    parser.add_argument("--error_rate", type=float, default=0, help="fraction of cache server errors")
+    parser.add_argument("--slow_hosts", type=str, default=None,
+                        help="comma separated hosts that are slower and fail with 503s")
+    parser.add_argument("--slow_latency", type=float, default=0.2, help="seconds added to their replies")
+    parser.add_argument("--slow_error_rate", type=float, default=0.2, help="fraction of them that are 503s")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--politeness", type=float, default=None,
+                        help="overrides POLITENESS, 0 by default when replaying")
+    parser.add_argument("--download_mode", type=str, choices=["threads", "async"], default=None)
+    parser.add_argument("--partitions", type=int, default=None, help="overrides PARTITIONS")
+    parser.add_argument("--page_cache", type=str, default=None,
+                        help="PAGECACHE kept between runs, the second run with it is a recrawl")
+    args = parser.parse_args()
+    if args.record:
+        record(args)
+    else:
+        replay(args)
@@ -0,0 +1,2 @@
+# Benchmarks for the crawler subsystems.
+# Run from the project root, e.g. "python -m benchmarks.bench_simhash"
@@ -0,0 +1,53 @@
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from utils.checkpoint import Checkpointer
+from utils.simhash import SimhashIndex
+from utils.stats import CrawlStats
+
+
+def fill(stats, simhash_index, words, pages, rng):
+    stats.words.update({f"word{i}": rng.randrange(1, 10000) for i in range(words)})
+    stats.subdomains.update({f"https://sub{i}.ics.uci.edu": rng.randrange(1, 1000) for i in range(500)})
+    stats.pages = pages
+    stats.longest_page = (12345, "https://www.ics.uci.edu/longest")
+    for i in range(pages):
+        simhash_index.add(rng.getrandbits(256), f"https://www.ics.uci.edu/page/{i}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--words", type=int, default=1000000, help="distinct words in the stats")
+    parser.add_argument("--pages", type=int, default=100000, help="fingerprints in the simhash index")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        save_file = os.path.join(directory, "frontier.db")
+        stats, simhash_index = CrawlStats(), SimhashIndex(256, 12)
+        fill(stats, simhash_index, args.words, args.pages, random.Random(0))
+        checkpointer = Checkpointer(save_file, stats, simhash_index)
+        start = time.perf_counter()
+        checkpointer.checkpoint()
+        written = time.perf_counter() - start
+        sizes = {name: os.path.getsize(save_file + name) / 1024 / 1024 for name in (".stats", ".simhash")}
+
+        # a second checkpoint only appends what is new
+        simhash_index.add(1, "https://www.ics.uci.edu/new")
+        start = time.perf_counter()
+        checkpointer.checkpoint()
+        incremental = time.perf_counter() - start
+
+        restored, restored_index = CrawlStats(), SimhashIndex(256, 12)
+        start = time.perf_counter()
+        Checkpointer(save_file, restored, restored_index).open()
+        loaded = time.perf_counter() - start
+        # the band tables of the simhash index are still being filled in the background
+        restored_index.entries(len(restored_index))
+        indexed = time.perf_counter() - start
+        assert dict(restored.words.items()) == dict(stats.words.items()) and len(restored_index) == len(simhash_index)
+        print(f"{args.words} words, {args.pages} fingerprints | "
+              f"stats {sizes['.stats']:.1f}MB, simhash {sizes['.simhash']:.1f}MB")
+        print(f"checkpoint {written:.2f}s | next checkpoint {incremental:.2f}s | "
+              f"reload {loaded:.2f}s (simhash index ready after {indexed:.2f}s)")
@@ -0,0 +1,77 @@
+import os
+import random
+import time
+from argparse import ArgumentParser
+
+from utils.html_extract import parse_page
+
+# The baseline is the BeautifulSoup parsing the scraper used to do. bs4 is not a dependency of
+# the crawler any more, install it for this benchmark only: python -m pip install beautifulsoup4
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    raise SystemExit("bench_extract compares against BeautifulSoup, install beautifulsoup4 to run it.")
+
+
+def soup_path(url, content):
+    # What extract_next_links and robots_checkage_creation used to do with every page:
+    # one BeautifulSoup tree for the scraper, get_text() for the length check, the tokenizer
+    # and the exact duplicate check, find_all('a') for the links, and a second tree for robots
+    soup = BeautifulSoup(content, "lxml")
+    if len(soup.get_text()) != 0:
+        soup.get_text()
+    links = [link.get("href") for link in soup.find_all("a")]
+    soup.get_text()
+    BeautifulSoup(content, "lxml").get_text()
+    return links
+
+
+def single_pass(url, content):
+    page = parse_page(url, content)
+    return page.links
+
+
+def synthetic_pages(rng):
+    pages = list()
+    for size in (100 * 1024, 1024 * 1024, 5 * 1024 * 1024):
+        parts, length, i = ["<html><head><title>t</title><script>var x = 1;</script></head><body>"], 0, 0
+        while length < size:
+            i += 1
+            part = (f"<div class='c{i % 7}'><p>Research in <b>machine learning</b> and {rng.random()} "
+                    f"systems</p><a href='/page/{i}#s'>link {i}</a></div>\n")
+            parts.append(part)
+            length += len(part)
+        parts.append("</body></html>")
+        pages.append((f"synthetic-{size // 1024}KB", "".join(parts).encode("utf-8")))
+    return pages
+
+
+def load_pages(pages_dir):
+    pages = list()
+    for name in sorted(os.listdir(pages_dir)):
+        with open(os.path.join(pages_dir, name), "rb") as page:
+            pages.append((name, page.read()))
+    return pages
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=str, default=None, help="directory of saved html pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    url = "https://www.ics.uci.edu/"
+    pages = load_pages(args.pages) if args.pages else synthetic_pages(random.Random(0))
+    for name, content in pages:
+        timings = dict()
+        for label, function in (("beautifulsoup", soup_path), ("single pass", single_pass)):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                function(url, content)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+        print(f"{name:>24} {len(content) / 1024:9.0f}KB | "
+              f"beautifulsoup {timings['beautifulsoup'] * 1e3:9.1f} ms | "
+              f"single pass {timings['single pass'] * 1e3:8.1f} ms | "
+              f"speedup {timings['beautifulsoup'] / timings['single pass']:5.1f}x")
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from threading import Thread
+from types import SimpleNamespace
+
+from crawler.frontier import Frontier
+
+
+def make_config(directory, store, sync_interval):
+    return SimpleNamespace(
+        save_file=os.path.join(directory, f"frontier-{store}-{sync_interval}"),
+        frontier_store=store, sync_interval=sync_interval, time_delay=0.5, url_seen="set",
+        queue_window=0, queue_order="lifo", max_time_delay=0.5, host_concurrency=1, frontier_shards=1,
+        seed_urls=["https://www.ics.uci.edu"])
+
+
+def run(config, threads, urls_per_thread):
+    frontier = Frontier(config, True)
+
+    def insert(worker_id):
+        for i in range(urls_per_thread):
+            url = f"https://www.ics.uci.edu/w{worker_id}/page{i}"
+            frontier.add_url(url)
+            if i % 10 == 0:
+                frontier.mark_url_complete(url)
+
+    workers = [Thread(target=insert, args=(worker_id,)) for worker_id in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    frontier.close()
+    elapsed = time.perf_counter() - start
+    # resume from the save file and make sure nothing was lost
+    resumed = Frontier(config, False)
+    expected = threads * urls_per_thread - threads * ((urls_per_thread + 9) // 10) + 1
+    assert len(resumed.to_be_downloaded) == expected, (len(resumed.to_be_downloaded), expected)
+    resumed.close()
+    return threads * urls_per_thread / elapsed
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--threads", type=str, default="4,8,16,32")
+    parser.add_argument("--urls", type=int, default=500, help="urls added per thread")
+    args = parser.parse_args()
+    # the original behaviour (shelve synced on every change) against the batched stores
+    stores = [("shelve", 0), ("shelve", 1.0), ("sqlite", 0), ("sqlite", 1.0)]
+    with tempfile.TemporaryDirectory() as directory:
+        for threads in args.threads.split(","):
+            results = [
+                f"{store}/{interval}s {run(make_config(directory, store, interval), int(threads), args.urls):9.0f}"
+                for store, interval in stores]
+            print(f"{threads:>3} threads | urls/sec: " + " | ".join(results))
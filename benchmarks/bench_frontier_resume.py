@@ -0,0 +1,56 @@
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from types import SimpleNamespace
+
+from crawler.frontier import Frontier
+from crawler.frontier_store import get_store_class
+from utils import get_urlhash
+
+
+def make_config(directory, store, window):
+    return SimpleNamespace(
+        save_file=os.path.join(directory, f"frontier-{store}"),
+        frontier_store=store, sync_interval=1.0, time_delay=0, url_seen="set",
+        queue_window=window, queue_order="lifo", max_time_delay=0, host_concurrency=1, frontier_shards=1,
+        seed_urls=["https://www.ics.uci.edu"])
+
+
+def fill(config, urls, hosts):
+    # a crawl that discovered urls urls on hosts hosts and downloaded a third of them
+    store = get_store_class(config.frontier_store)(config.save_file, config.sync_interval)
+    for i in range(urls):
+        url = f"https://host{i % hosts}.ics.uci.edu/dir{i % 97}/page{i}"
+        urlhash = get_urlhash(url)
+        store.add(urlhash, url)
+        if i % 3 == 0:
+            store.mark_complete(urlhash, url)
+    store.close()
+
+
+def resume(config):
+    start = time.perf_counter()
+    frontier = Frontier(config, False)
+    url = frontier.get_tbd_url()
+    first_url = time.perf_counter() - start
+    in_memory = frontier.to_be_downloaded.count
+    frontier.release_host(url)
+    frontier.close()
+    return first_url, in_memory
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=300000, help="urls in the save file")
+    parser.add_argument("--hosts", type=int, default=500)
+    parser.add_argument("--store", type=str, default="sqlite")
+    parser.add_argument("--windows", type=int, nargs="+", default=[0, 100000, 10000])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        fill(make_config(directory, args.store, 0), args.urls, args.hosts)
+        print(f"{args.urls} urls in a {args.store} save file, {args.urls * 2 // 3} to download")
+        for window in args.windows:
+            first_url, in_memory = resume(make_config(directory, args.store, window))
+            label = f"window {window}" if window else "unbounded"
+            print(f"{label:>16} | first url after {first_url:6.2f}s | {in_memory:8d} urls in memory")
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from threading import Thread
+from types import SimpleNamespace
+
+from crawler.frontier import Frontier
+from utils.metrics import metrics
+
+# Hand-off between the Frontier and its workers: every worker takes a url, "scrapes" it into
+# --links links (most of them already seen, like a real site) and adds them, then marks the url
+# complete, until the frontier says the crawl is over. Compares adding the links one add_url at
+# a time through one store lock with one add_urls per page through FRONTIERSHARDS locks, and
+# reports pages/s and how often and how long the workers waited on the frontier's locks.
+# Every run has to download every page exactly once: no worker may stop while others still
+# find urls.
+#
+#   python -m benchmarks.bench_handoff --workers 4 16 64
+
+
+def make_config(directory, name, shards):
+    return SimpleNamespace(
+        save_file=os.path.join(directory, f"frontier-{name}"),
+        frontier_store="sqlite", sync_interval=1.0, time_delay=0, url_seen="set",
+        queue_window=0, queue_order="lifo", max_time_delay=0, host_concurrency=1, frontier_shards=shards,
+        seed_urls=["https://host0.ics.uci.edu/page0"])
+
+
+def page_links(page, pages, hosts, links):
+    # the links of a page: a few pages further on, the rest spread over the whole site
+    return [f"https://host{target % hosts}.ics.uci.edu/page{target}"
+            for target in ((page * 31 + i * 7919 + (i < 3) * page) % pages for i in range(links))]
+
+
+def run(config, workers, pages, hosts, links, batched):
+    frontier = Frontier(config, True)
+    downloaded = list()
+
+    def work():
+        count = 0
+        while True:
+            url = frontier.get_tbd_url()
+            if url is None:
+                break
+            frontier.release_host(url)
+            found = page_links(int(url.rsplit("page", 1)[1]), pages, hosts, links)
+            if batched:
+                frontier.add_urls(found)
+            else:
+                for link in found:
+                    frontier.add_url(link)
+            frontier.mark_url_complete(url)
+            count += 1
+        downloaded.append(count)
+
+    before = metrics.snapshot()["locks"]
+    threads = [Thread(target=work) for _ in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = metrics.snapshot()["locks"]
+    frontier.close()
+    # every page reachable from the seed, each downloaded once
+    assert sum(downloaded) == len(frontier.seen), (sum(downloaded), len(frontier.seen))
+    waits = dict()
+    for name, entry in after.items():
+        old = before.get(name, {"contended": 0, "wait_seconds": 0})
+        waits[name] = (entry["contended"] - old["contended"], entry["wait_seconds"] - old["wait_seconds"])
+    return sum(downloaded) / elapsed, waits
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--links", type=int, default=50, help="links found on every page")
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+    modes = [("add_url, 1 lock", False, 1), (f"add_urls, {args.shards} shards", True, args.shards)]
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            for label, batched, shards in modes:
+                config = make_config(directory, f"{workers}-{shards}", shards)
+                pages_per_second, waits = run(config, workers, args.pages, args.hosts, args.links, batched)
+                contention = " | ".join(
+                    f"{name} {count} waits {seconds:.2f}s" for name, (count, seconds) in sorted(waits.items()) if count)
+                print(f"{workers:3d} workers | {label:>20} | {pages_per_second:8.0f} pages/s | {contention or 'no waits'}")
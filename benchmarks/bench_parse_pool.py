@@ -0,0 +1,57 @@
+import random
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+import scraper
+from crawler.parse_pool import ParsePool
+from benchmarks.bench_extract import load_pages
+
+
+def synthetic_pages(rng, count):
+    words = ("research", "machine", "learning", "systems", "students", "faculty", "graph",
+             "network", "security", "data", "informatics", "course", "seminar", "lab")
+    pages = list()
+    for i in range(count):
+        paragraphs = list()
+        for j in range(rng.randint(20, 400)):
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(10, 60)))
+            paragraphs.append(f"<p>{text} {rng.random()}</p><a href='/p/{i}/{j}'>link {j}</a>\n")
+        content = f"<html><head><title>{i}</title></head><body>{''.join(paragraphs)}</body></html>"
+        pages.append((f"https://www.ics.uci.edu/p/{i}", content.encode("utf-8")))
+    return pages
+
+
+def run(pages, threads, analyze):
+    # threads stand in for the crawler's workers, each one analyzing the pages it downloaded
+    with ThreadPoolExecutor(threads) as executor:
+        start = time.perf_counter()
+        list(executor.map(lambda page: analyze(page[0], page[0], page[1]), pages))
+        return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=str, default=None, help="directory of saved html pages")
+    parser.add_argument("--count", type=int, default=400, help="number of synthetic pages")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    if args.pages:
+        pages = [(f"https://www.ics.uci.edu/{name}", content) for name, content in load_pages(args.pages)]
+    else:
+        pages = synthetic_pages(random.Random(0), args.count)
+    size = sum(len(content) for _, content in pages)
+    print(f"{len(pages)} pages, {size / 1024 / 1024:.1f}MB, {args.threads} threads")
+
+    elapsed = run(pages, args.threads, scraper.analyze_page)
+    print(f"{'in-thread':>12} | {len(pages) / elapsed:8.1f} pages/s")
+    for processes in args.processes:
+        pool = ParsePool(processes)
+        try:
+            # first round starts the processes and imports the scraper in them
+            run(pages[:processes * 2], args.threads, pool.analyze_page)
+            elapsed = run(pages, args.threads, pool.analyze_page)
+        finally:
+            pool.close()
+        print(f"{f'{processes} processes':>12} | {len(pages) / elapsed:8.1f} pages/s")
@@ -0,0 +1,80 @@
+import random
+import time
+from argparse import ArgumentParser
+
+from utils.simhash import SimhashIndex
+
+BITS = 256
+MAX_DISTANCE = 13   # same threshold as scraper.isNearSimilarity (243 of 256 bits)
+
+
+def linear_scan(simhash_set, fingerprint):
+    # The original scraper.isNearSimilarity loop, kept here as the baseline
+    threshold = BITS - MAX_DISTANCE
+    for finger in simhash_set:
+        finger_similarity = 0
+        for i in range(len(finger)):
+            if finger[i] == fingerprint[i]:
+                finger_similarity += 1
+            if finger_similarity >= threshold:
+                return True
+    return False
+
+
+def flip_bits(fingerprint, count, rng):
+    for bit in rng.sample(range(BITS), count):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def to_str(fingerprint):
+    return format(fingerprint, "0256b")
+
+
+def run(size, queries, scan_limit, rng):
+    fingerprints = [rng.getrandbits(BITS) for _ in range(size)]
+    start = time.perf_counter()
+    index = SimhashIndex(BITS, MAX_DISTANCE)
+    for i, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, i)
+    build = time.perf_counter() - start
+
+    # half the queries are near duplicates of a stored page, half are misses (full scan)
+    probes = list()
+    for q in range(queries):
+        if q % 2 == 0:
+            probes.append(flip_bits(rng.choice(fingerprints), rng.randint(0, MAX_DISTANCE), rng))
+        else:
+            probes.append(rng.getrandbits(BITS))
+
+    start = time.perf_counter()
+    for probe in probes:
+        index.find(probe)
+    indexed = (time.perf_counter() - start) / queries
+
+    # The linear scan is too slow to run over 1M strings, so we time it on at most
+    # scan_limit fingerprints and scale the miss time linearly (it is O(n) per lookup).
+    scan_set = [to_str(f) for f in fingerprints[:scan_limit]]
+    misses = [to_str(p) for p in probes[1::2]] or [to_str(rng.getrandbits(BITS))]
+    start = time.perf_counter()
+    for probe in misses:
+        linear_scan(scan_set, probe)
+    scan = (time.perf_counter() - start) / len(misses) * (size / len(scan_set))
+
+    print(f"{size:>9} fingerprints | build {build:7.2f}s | "
+          f"index {indexed * 1e6:9.1f} us/lookup | "
+          f"linear scan {scan * 1e3:11.1f} ms/lookup"
+          f"{' (extrapolated)' if len(scan_set) < size else ''} | "
+          f"speedup {scan / indexed:,.0f}x")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan_limit", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    for size in args.sizes.split(","):
+        run(int(size), args.queries, args.scan_limit, rng)
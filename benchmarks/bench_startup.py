@@ -0,0 +1,96 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+# Time to first fetch: how long a new crawler process takes from its start to the download of its
+# first page, for a given number of workers. Every round is a fresh interpreter, so what importing
+# the crawler costs (the stopword list, numpy, the scraper's dependencies) is counted, as is
+# building the workers. The pages come from utils.cache_stub serving a generated corpus.
+#
+#   python -m benchmarks.bench_startup --workers 1 64
+
+
+def child(args):
+    # runs in the new process: builds the Crawler and exits as soon as a worker downloads a page
+    from utils.config import Config
+    from crawler import Crawler
+    import crawler.worker as worker_module
+    imported = time.time()
+
+    cparser = ConfigParser()
+    cparser.read(args.config_file)
+    local = cparser["LOCAL PROPERTIES"]
+    local["SAVE"] = os.path.join(args.directory, "frontier.db")
+    local["ROBOTSFILE"] = os.path.join(args.directory, "robots.json")
+    local["THREADCOUNT"] = str(args.workers[0])
+    local["DOWNLOADMODE"] = "threads"
+    # the wait after the robots.txt of the first host is politeness, not startup
+    cparser["CRAWLER"]["POLITENESS"] = "0"
+    config = Config(cparser)
+    host, port = args.cache_server.rsplit(":", 1)
+    config.cache_server = (host, int(port))
+    config.seed_urls = args.seeds.split(",")
+
+    def download(url, config, logger=None):
+        print(f"{imported - args.launched:.4f} {time.time() - args.launched:.4f}", flush=True)
+        os._exit(0)
+
+    worker_module.download = download
+    Crawler(config, True).start()
+
+
+def first_fetch(args, workers, cache_server, seeds, directory):
+    launched = time.time()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--workers", str(workers),
+         "--config_file", args.config_file, "--cache_server", cache_server, "--seeds", ",".join(seeds),
+         "--directory", directory, "--launched", repr(launched)],
+        check=True, capture_output=True, text=True).stdout.split()
+    imported, fetched = output[-2:]
+    return float(imported), float(fetched)
+
+
+def main(args):
+    from utils.cache_stub import CacheStub, make_synthetic_corpus
+
+    directory = tempfile.mkdtemp()
+    try:
+        corpus = make_synthetic_corpus(os.path.join(directory, "corpus"), 8, 20)
+        stub = CacheStub(corpus)
+        host, port = stub.start()
+        for workers in args.workers:
+            imports, fetches = list(), list()
+            for round in range(args.rounds):
+                crawl_directory = os.path.join(directory, f"crawl-{workers}-{round}")
+                os.makedirs(crawl_directory)
+                imported, fetched = first_fetch(args, workers, f"{host}:{port}", corpus.seeds, crawl_directory)
+                imports.append(imported)
+                fetches.append(fetched)
+            print(f"{workers:3d} workers | imports {min(imports) * 1e3:7.1f}ms | "
+                  f"first fetch {min(fetches) * 1e3:7.1f}ms (best of {args.rounds})")
+        stub.stop()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 64])
+    parser.add_argument("--rounds", type=int, default=5)
+    # used by the crawler processes the benchmark starts
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--cache_server", type=str)
+    parser.add_argument("--seeds", type=str)
+    parser.add_argument("--directory", type=str)
+    parser.add_argument("--launched", type=float)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+    else:
+        main(args)
@@ -0,0 +1,84 @@
+import os
+import random
+import time
+from argparse import ArgumentParser
+from collections import Counter
+
+from utils.html_extract import parse_page
+from utils.tokenizer import tokenize, count_tokens
+
+
+def old_tokenize(page_text: str):
+    # The original scraper.tokenize, kept here as the baseline (including its off-by-one)
+    index = 0
+    new_word = ""
+    token_list = []
+    letter = page_text[index]
+    while index < len(page_text):
+        val = ord(letter.lower())
+        if letter.isalnum() and (97 <= val <= 122 or 48 <= val <= 57):
+            new_word += letter.lower()
+        else:
+            if new_word != "":
+                token_list.append(new_word)
+            new_word = ""
+        letter = page_text[index]
+        index += 1
+    if new_word != "":
+        token_list.append(new_word)
+    return token_list
+
+
+def load_pages(pages_dir):
+    # Visible text of every saved page in pages_dir (e.g. pages saved from the cache server),
+    # extracted the way the scraper does it
+    pages = list()
+    for name in sorted(os.listdir(pages_dir)):
+        with open(os.path.join(pages_dir, name), "rb") as page:
+            content = page.read()
+        pages.append((name, len(content), parse_page(name, content).text))
+    return pages
+
+
+def synthetic_pages(rng):
+    # Stand-in text when no saved pages are given: mixed case words, numbers and punctuation
+    words = ["Informatics", "ICS", "research", "2024", "faculty", "students", "Donald", "Bren",
+             "Hall", "the", "of", "machine-learning", "CS-122A", "e-mail:", "(949)", "824-7427"]
+    pages = list()
+    for size in (10 * 1024, 100 * 1024, 1024 * 1024, 5 * 1024 * 1024):
+        parts, length = list(), 0
+        while length < size:
+            word = rng.choice(words) + rng.choice(" \n\t.,;")
+            parts.append(word)
+            length += len(word)
+        pages.append((f"synthetic-{size // 1024}KB", size, "".join(parts)))
+    return pages
+
+
+def timed(function, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=str, default=None, help="directory of saved html pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    pages = load_pages(args.pages) if args.pages else synthetic_pages(random.Random(0))
+    for name, size, text in pages:
+        if not text:
+            continue
+        old = timed(old_tokenize, text, 1)
+        new = timed(tokenize, text, args.repeat)
+        stream = timed(count_tokens, text, args.repeat)
+        # same tokens apart from the characters the old off-by-one skipped or repeated
+        assert Counter(tokenize(text)) == count_tokens(text)
+        print(f"{name:>24} {size / 1024:9.0f}KB | old {old * 1e3:9.1f} ms | "
+              f"tokenize {new * 1e3:8.1f} ms ({old / new:5.1f}x) | "
+              f"count_tokens {stream * 1e3:8.1f} ms ({old / stream:5.1f}x)")
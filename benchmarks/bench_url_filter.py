@@ -0,0 +1,115 @@
+import random
+import re
+import time
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+from utils.url_filter import UrlFilter
+
+
+def old_is_valid(url, robots=None):
+    # The original scraper.is_valid, kept here as the baseline
+    # Decide whether to crawl this url or not. 
+    # If you decide to crawl it, return True; otherwise return False.
+    # There are already some conditions that return False.
+    try:
+        parsed = urlparse(url)
+        # check if url contains "pdf"
+        for extension in {"pdf", ".zip", ".gz", ".css", ".ps", ".ppt", ".js", ".bib", ".ppsx", ".txt", ".r"}:
+            if extension in url:
+                return False
+        if parsed.scheme not in set(["http", "https"]):
+            return False
+        # Gets the ending of the url
+        # filtered_hostname is everything to the right of the first "."
+        if parsed.hostname == None or '.' not in parsed.hostname:
+            return False
+        else:
+            filtered_hostname = parsed.hostname.split('.', 1)[1]
+        if filtered_hostname not in set(["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]):
+            return False
+        if parsed.query is not None:
+            # Gets rid of "share=" urls, Gets rid of "action=" urls (ex. login, forgot password, etc..)
+            if ("share=" in parsed.query) or ("action=" in parsed.query):
+                return False
+        # Gets rid of calendar event paths by checking path
+        if "event" in parsed.path:
+            return False
+
+        # Deal with page traps for example .../page/200 we handle this by setting max page # as 5
+        if "/page/" in parsed.path:
+            splitparse = parsed.path.split("/")[-2:]
+            if splitparse[1] == "":
+                pagenum = int(splitparse[0])
+            else:
+                pagenum = int(splitparse[1])
+            if pagenum <= 5:
+                return False
+
+        return not re.match(
+            r".*\.(css|js|bmp|gif|jpe?g|ico"
+            + r"|png|tiff?|mid|mp2|mp3|mp4"
+            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+            + r"|epub|dll|cnf|tgz|sha1"
+            + r"|thmx|mso|arff|rtf|jar|csv"
+            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower())
+
+    except TypeError:
+        # if parsed is not None:
+        print("TypeError for ", parsed)
+        raise
+
+
+def synthetic_links(count, rng):
+    # Stand-in for a corpus of links scraped from ICS pages
+    hosts = ["www.ics.uci.edu", "www.cs.uci.edu", "www.informatics.uci.edu", "www.stat.uci.edu",
+             "vision.ics.uci.edu", "wics.ics.uci.edu", "www.uci.edu", "github.com", "twitter.com"]
+    paths = ["/", "/about/", "/faculty/profiles/view_faculty.php", "/~eppstein/pubs/a.pdf",
+             "/community/news/view_news?id=2031", "/events/2024-01-05/", "/blog/page/3",
+             "/blog/page/12/", "/wp-content/uploads/paper.pptx", "/?share=twitter",
+             "/research/areas/", "/ugrad/courses/listing.php?year=2023&level=ALL"]
+    return [f"https://{rng.choice(hosts)}{rng.choice(paths)}" for _ in range(count)]
+
+
+def load_links(path):
+    with open(path) as links:
+        return [line.strip() for line in links if line.strip()]
+
+
+def safe_old_is_valid(url):
+    # the old is_valid raises on /page/<not a number>
+    try:
+        return old_is_valid(url)
+    except (ValueError, TypeError):
+        return False
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--links", type=str, default=None, help="file with one scraped link per line")
+    parser.add_argument("--count", type=int, default=200000)
+    args = parser.parse_args()
+    links = load_links(args.links) if args.links else synthetic_links(args.count, random.Random(0))
+    url_filter = UrlFilter()
+
+    start = time.perf_counter()
+    for url in links:
+        safe_old_is_valid(url)
+    old = (time.perf_counter() - start) / len(links)
+
+    start = time.perf_counter()
+    for url in links:
+        url_filter.is_valid(url)
+    new = (time.perf_counter() - start) / len(links)
+
+    # one page's worth of links at a time, like extract_next_links
+    start = time.perf_counter()
+    for i in range(0, len(links), 100):
+        url_filter.filter(links[i:i + 100])
+    batch = (time.perf_counter() - start) / len(links)
+
+    print(f"{len(links)} links | old is_valid {old * 1e6:6.2f} us/url | "
+          f"UrlFilter.is_valid {new * 1e6:6.2f} us/url ({old / new:4.1f}x) | "
+          f"UrlFilter.filter {batch * 1e6:6.2f} us/url ({old / batch:4.1f}x)")
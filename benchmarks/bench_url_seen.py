@@ -0,0 +1,76 @@
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from utils import get_urlhash
+from utils.url_seen import UrlHashSet, BloomFilter
+
+
+def make_urls(count):
+    return [f"https://www.ics.uci.edu/~user{i % 997}/research/page{i}.html?id={i}" for i in range(count)]
+
+
+def copy(text):
+    # a new string object, so the structure owns its strings like it would in a crawl
+    return (text + " ")[:-1]
+
+
+def measure(label, build, count):
+    tracemalloc.start()
+    structure = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    # timed again without tracemalloc, which slows allocations down
+    start = time.perf_counter()
+    structure = build()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>36} | {size / count * 1e6 / 2 ** 20:8.1f} MB per million urls | "
+          f"build {elapsed:6.2f}s")
+    return structure
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=1000000)
+    parser.add_argument("--list_urls", type=int, default=20000,
+                        help="size used to time lookups in the old unique_list")
+    args = parser.parse_args()
+    urls = make_urls(args.urls)
+    hashes = [get_urlhash(url) for url in urls]
+
+    # memory of each structure, not counting the url strings and hashes they are built from
+    measure("unique_list (list of url strings)", lambda: [copy(url) for url in urls], args.urls)
+    measure("dict of hex urlhash -> completed", lambda: {copy(urlhash): False for urlhash in hashes}, args.urls)
+
+    def build_set():
+        seen = UrlHashSet()
+        for urlhash in hashes:
+            seen.add(urlhash)
+        return seen
+    seen = measure("UrlHashSet (64-bit keys)", build_set, args.urls)
+
+    def build_bloom():
+        bloom = BloomFilter(args.urls, 0.001)
+        for urlhash in hashes:
+            bloom.add(urlhash)
+        return bloom
+    bloom = measure("BloomFilter (0.1% false positives)", build_bloom, args.urls)
+
+    # lookups of urls that were never added
+    misses = [get_urlhash(url + "&new") for url in urls[:10000]]
+    false_positives = sum(urlhash in bloom for urlhash in misses)
+    print(f"bloom false positive rate {false_positives / len(misses):.4%}")
+
+    old = urls[:args.list_urls]
+    probes = [url + "&new" for url in urls[:200]]
+    start = time.perf_counter()
+    for url in probes:
+        url in old
+    list_time = (time.perf_counter() - start) / len(probes)
+    start = time.perf_counter()
+    for urlhash in misses:
+        urlhash in seen
+    set_time = (time.perf_counter() - start) / len(misses)
+    print(f"lookup: unique_list of {len(old)} urls {list_time * 1e6:9.1f} us | "
+          f"UrlHashSet of {len(seen)} urls {set_time * 1e6:6.2f} us")
@@ -0,0 +1,82 @@
+import heapq
+import random
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from collections import Counter
+
+from utils.word_stats import WordCounts
+
+# Word frequencies of a crawl: the old Counter sorted at report time against utils.word_stats,
+# exact and bounded. Pages draw their words from a Zipf-like vocabulary plus a few one-off
+# tokens (hex ids, numbers) per page, which is what makes the vocabulary of a real crawl grow
+# without end.
+
+
+def copy(text):
+    # a new string object for every page, like the tokens of a page in a crawl
+    return (text + " ")[:-1]
+
+
+def make_pages(pages, vocabulary, junk, seed=0):
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(vocabulary)]
+    weights = [1 / (i + 1) for i in range(vocabulary)]
+    for page in range(pages):
+        counts = Counter(map(copy, rng.choices(words, weights, k=300)))
+        for _ in range(junk):
+            counts[f"{rng.getrandbits(48):012x}"] += 1
+        counts[str(page)] += 1
+        yield counts
+
+
+def top_counter(words, k):
+    return heapq.nsmallest(k, words.items(), key=lambda item: (-item[1], item[0]))
+
+
+def run(label, args, make, update, report):
+    # memory with the pages generated as they are counted, so only the strings a store keeps count
+    tracemalloc.start()
+    words = make()
+    for counts in make_pages(args.pages, args.vocabulary, args.junk):
+        update(words, counts)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del words
+    # timed again on pages generated beforehand, without tracemalloc
+    pages = list(make_pages(args.pages, args.vocabulary, args.junk))
+    words = make()
+    start = time.perf_counter()
+    for counts in pages:
+        update(words, counts)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    top = report(words)
+    report_time = time.perf_counter() - start
+    print(f"{label:>28} | {len(words):9d} words kept | {size / 2 ** 20:7.1f} MB | "
+          f"count {elapsed:6.2f}s | top 50 {report_time * 1e3:8.2f}ms")
+    return top
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--junk", type=int, default=20, help="one-off tokens per page")
+    parser.add_argument("--capacity", type=int, default=10000)
+    parser.add_argument("--sketch_width", type=int, default=1 << 18)
+    args = parser.parse_args()
+
+    expected = run("Counter + nsmallest", args, Counter,
+                   lambda words, counts: words.update(counts), lambda words: top_counter(words, 50))
+    exact = run("WordCounts (exact)", args, WordCounts,
+                lambda words, counts: words.update(counts), lambda words: words.top_words(50))
+    assert exact == expected, "the exact top 50 differs from the Counter's"
+    bounded = run(f"WordCounts ({args.capacity} words)", args,
+                  lambda: WordCounts(50, args.capacity, args.sketch_width),
+                  lambda words, counts: words.update(counts), lambda words: words.top_words(50))
+    true_counts = dict(expected)
+    overlap = len(set(true_counts) & {word for word, _ in bounded})
+    error = max(count - true_counts[word] for word, count in bounded if word in true_counts)
+    print(f"bounded top 50: {overlap}/50 of the true top 50, counts at most {error} too high "
+          f"(the lowest true top 50 count is {expected[-1][1]})")
@@ -1,36 +1,93 @@
 from utils import get_logger
 from crawler.frontier import Frontier
 from crawler.worker import Worker
-from itertools import islice
+from crawler.parse_pool import close_parse_pool
+from utils.metrics import metrics, MetricsServer, SnapshotWriter
+from utils.profiler import SamplingProfiler
+import scraper
+
+
+def print_report(report):
+    # the answers of the crawl, from CrawlStats.snapshot()
+    print("\nHow many unique pages did you find: ", report["unique_pages"])
+    print("\n50 most common words in the entire set of pages: ", [word for word, count in report["top_words"]])
+    print("\nLongest page in terms of the # of words:", report["longest_page"]["url"], "with", report["longest_page"]["words"], "words")
+    print("\nSubdomains found in the ics.uci.edu domain: ", report["subdomains"])
+    print("\nnumber of urls with near similarity: ", report["duplicates"])
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
         self.logger = get_logger("CRAWLER")
+        # compiles the is_valid rules from the config before the frontier checks its save file
+        scraper.configure(config, restart)
         self.frontier = frontier_factory(config, restart)
+        # the checkpoints of the stats and dedup state flush the frontier's store first
+        if scraper.checkpointer is not None:
+            scraper.checkpointer.store = getattr(self.frontier, "save", None)
+        # live crawl statistics, filled in by the workers as they go
+        self.stats = scraper.stats
+        # the unique page count comes from the urls the frontier has seen
+        self.stats.url_seen = getattr(self.frontier, "seen", None)
+        # live metrics, see utils/metrics.py
+        self.metrics = metrics
+        self.register_gauges()
         self.workers = list()
         self.worker_factory = worker_factory
+        self.workers_count = self.config.threads_count
+        if worker_factory is Worker and self.config.download_mode == "async":
+            # imported here so aiohttp is only needed in async mode
+            from crawler.async_worker import AsyncWorker
+            self.worker_factory = AsyncWorker
+            self.workers_count = 1
     
+    def register_gauges(self):
+        scheduler = getattr(self.frontier, "to_be_downloaded", None)
+        if scheduler is not None:
+            self.metrics.gauge("queued urls", lambda: len(scheduler))
+            self.metrics.gauge("host queue depth", lambda: scheduler.depths(20))
+            # hosts whose delay the rate control raised above POLITENESS, and how often it backed off
+            self.metrics.gauge("host delay", lambda: scheduler.delays(20))
+            self.metrics.gauge("host backoffs", lambda: scheduler.rate.backoffs)
+        if self.stats.url_seen is not None:
+            self.metrics.gauge("unique pages", lambda: len(self.stats.url_seen))
+        if scraper.trap_detector is not None:
+            # url patterns the trap detector blocked, and why
+            trap_detector = scraper.trap_detector
+            self.metrics.gauge("trap patterns", lambda: trap_detector.blocked(20))
+
+    def start_monitoring(self):
+        # the metrics endpoint, snapshot file and profiler that are turned on in config.ini
+        monitors = list()
+        if self.config.metrics_port:
+            monitors.append(MetricsServer(self.metrics, self.config.metrics_port).start())
+            self.logger.info(f"Serving metrics on http://localhost:{self.config.metrics_port}/metrics")
+        if self.config.metrics_file:
+            monitors.append(SnapshotWriter(self.metrics, self.config.metrics_file, self.config.metrics_interval).start())
+        if self.config.profile_interval > 0:
+            monitors.append(SamplingProfiler(self.config.profile_file, self.config.profile_interval).start())
+        return monitors
+
     def start_async(self):
         self.workers = [
             self.worker_factory(worker_id, self.config, self.frontier)
-            for worker_id in range(self.config.threads_count)]
+            for worker_id in range(self.workers_count)]
         for worker in self.workers:
             worker.start()
 
     def start(self):
+        monitors = self.start_monitoring()
         self.start_async()
         self.join()
-        running_dict = dict(sorted(Worker.running_dict.items(), key=lambda x: x[0], reverse=False))
-        running_dict = dict(sorted(running_dict.items(), key=lambda value: value[1], reverse=True))
-        temp = list(islice(running_dict, 50))
-        print("\nHow many unique pages did you find: ", len(set(Worker.unique_list)))
-        # print("\nUnique pages: ", Worker.unique_list)
-        print("\n50 most common words in the entire set of pages: ", temp)
-        print("\nLongest page in terms of the # of words:", Worker.max_word_url, "with", Worker.max_word_count, "words")
-        sorted_sub_domain_dict = dict(sorted(Worker.sub_domain_dict.items(), key=lambda x: x[0], reverse=False))
-        print("\nSubdomains found in the ics.uci.edu domain: ", sorted_sub_domain_dict)
-        print("\nnumber of urls with near similarity: ", Worker.similarityCount) # test
+        self.frontier.close()
+        close_parse_pool()
+        scraper.close()
+        for monitor in monitors:
+            monitor.stop()
+        self.report()
+
+    def report(self):
+        print_report(self.stats.snapshot(50))
     
     def join(self):
         for worker in self.workers:
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from crawler.worker import Worker
+from utils.download_async import create_session, download
+from utils.metrics import metrics
+
+
+class AsyncWorker(Worker):
+    ''' Runs config.async_tasks downloads at once on one asyncio event loop, over a pooled
+        keep-alive connection to the cache server.
+
+        A single dispatcher takes urls from the frontier (which still decides when every host
+        may be fetched) and hands them to the download tasks through a bounded queue. The
+        scraping itself is CPU work, so it runs on a small thread pool to keep the loop free. '''
+    def __init__(self, worker_id, config, frontier):
+        super().__init__(worker_id, config, frontier)
+        self.tasks = config.async_tasks
+
+    def run(self):
+        asyncio.run(self.crawl())
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def crawl(self):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.tasks)
+        # one thread blocks on the frontier, the others scrape the downloaded pages
+        with ThreadPoolExecutor(1) as frontier_pool, ThreadPoolExecutor(self.config.threads_count) as scrape_pool:
+            async with create_session(self.config) as session:
+                fetchers = [
+                    asyncio.create_task(self.fetch(queue, session, scrape_pool))
+                    for _ in range(self.tasks)]
+                while True:
+                    # returns None once no url is queued or in progress, pages in flight included
+                    tbd_url = await loop.run_in_executor(frontier_pool, self.frontier.get_tbd_url)
+                    if not tbd_url:
+                        break
+                    await queue.put(tbd_url)
+                for _ in fetchers:
+                    await queue.put(None)
+                await asyncio.gather(*fetchers)
+
+    async def fetch(self, queue, session, scrape_pool):
+        while True:
+            tbd_url = await queue.get()
+            if tbd_url is None:
+                return
+            try:
+                await self.crawl_url_async(tbd_url, session, scrape_pool)
+            except Exception as e:
+                # a url left in progress would keep the crawl from ever ending
+                self.logger.exception(f"Failed to crawl {tbd_url}: {e}")
+                self.frontier.abandon_url(tbd_url)
+
+    async def crawl_url_async(self, tbd_url, session, scrape_pool):
+        loop = asyncio.get_running_loop()
+        # may download robots.txt, which blocks, so it runs on the scraping threads
+        with metrics.timer("robots"):
+            allowed = await loop.run_in_executor(scrape_pool, self.check_robots, tbd_url)
+        if not allowed:
+            return
+        resp = None
+        start = time.perf_counter()
+        try:
+            with metrics.timer("download"):
+                resp = await download(tbd_url, self.config, session, self.logger)
+        except Exception as e:
+            self.logger.error(f"Failed to download {tbd_url}: {e}")
+            self.frontier.mark_url_complete(tbd_url)
+            return
+        finally:
+            self.frontier.release_host(
+                tbd_url, resp, time.perf_counter() - start, self.robots.crawl_delay(tbd_url))
+        await loop.run_in_executor(scrape_pool, self.process_page, tbd_url, resp)
@@ -0,0 +1,376 @@
+import copy
+import ipaddress
+import multiprocessing
+import os
+import socket
+
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, wait
+from queue import Queue
+from threading import Thread, Condition, Lock, Event
+from zlib import crc32
+
+from utils import get_logger, get_host, normalize
+from utils.stats import CrawlStats
+from crawler import Crawler, print_report
+from crawler.frontier import Frontier
+
+# Distributed crawl: the hosts are hash-partitioned over PARTITIONS crawler processes, each a
+# full Crawler with its own frontier store, robots.txt cache, politeness state, dedup state and
+# checkpoints (files suffixed with .<partition>), so every host is only ever fetched by one process.
+#
+# One coordinator process routes the links between them. A partition that finds a link to a host
+# of another partition buffers it and sends it to the coordinator in batches of FORWARDBATCH
+# urls (or every FORWARDINTERVAL seconds), which forwards the batch to its partition over the
+# same connection (multiprocessing.connection, a TCP socket, so partitions may run on other
+# machines). A partition whose queue is empty and that has no page in progress tells the
+# coordinator it is idle, with the number of batches it has added so far. The crawl is over once
+# every partition is idle and has added every batch forwarded to it: a partition only makes new
+# links while it has work, and its links reach the coordinator before its next idle message. The
+# coordinator then stops the partitions and merges their crawl statistics into one report.
+#
+# The connections are authenticated with a shared key, as their messages are unpickled: a random
+# one handed to the local partition processes, or the COORDINATORKEY environment variable (the
+# same on every machine) when the partitions run elsewhere.
+#
+# Near duplicates are only detected within a partition. Links in a batch that was not forwarded
+# yet when a partition crashed are lost, the rest of a partition resumes like a normal crawl.
+
+
+def parse_address(address):
+    # "host:port" of COORDINATOR -> (host, port)
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def coordinator_key():
+    ''' The key of a crawl whose partitions run on other machines. '''
+    key = os.environ.get("COORDINATORKEY", "")
+    if not key:
+        raise ValueError("Set the COORDINATORKEY environment variable to the same secret on every machine of the crawl.")
+    return key.encode("utf-8")
+
+
+def check_remote_address(address):
+    # the partitions on other machines have to find the coordinator at COORDINATOR
+    host, port = parse_address(address)
+    if port == 0:
+        raise ValueError(f"COORDINATOR {address} needs a fixed port for partitions on other machines.")
+    try:
+        loopback = ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        loopback = False
+    if loopback:
+        raise ValueError(f"COORDINATOR {address} is only reachable from this machine.")
+
+
+def partition_of(url, partitions):
+    # crc32 rather than hash(), which differs between processes
+    return crc32(get_host(url).encode("utf-8")) % partitions
+
+
+def partition_config(config, partition):
+    ''' A copy of config with the files and ports of one partition. '''
+    config = copy.copy(config)
+    config.save_file = f"{config.save_file}.{partition}"
+    if config.robots_file:
+        config.robots_file = f"{config.robots_file}.{partition}"
+    if config.metrics_port:
+        config.metrics_port += partition
+    if config.metrics_file:
+        config.metrics_file = f"{config.metrics_file}.{partition}"
+    config.profile_file = f"{config.profile_file}.{partition}"
+    if config.trap_report:
+        config.trap_report = f"{config.trap_report}.{partition}"
+    if config.page_cache:
+        config.page_cache = f"{config.page_cache}.{partition}"
+    config.seed_urls = [url for url in config.seed_urls if partition_of(url, config.partitions) == partition]
+    return config
+
+
+class PartitionLink(object):
+    ''' The connection of one partition to the coordinator. '''
+    def __init__(self, address, authkey, partition, partitions, batch_size, interval):
+        self.partition = partition
+        self.partitions = partitions
+        self.batch_size = batch_size
+        self.interval = interval
+        self.connection = Client(address, authkey=authkey)
+        self.send_lock = Lock()
+        # partition -> urls to forward to it
+        self.buffers = [list() for _ in range(partitions)]
+        self.buffer_lock = Lock()
+        self._closed = Event()
+        self.send(("hello", partition))
+
+    def send(self, message):
+        with self.send_lock:
+            self.connection.send(message)
+
+    def forward(self, partition, url):
+        with self.buffer_lock:
+            buffer = self.buffers[partition]
+            buffer.append(url)
+            if len(buffer) < self.batch_size:
+                return
+            self.buffers[partition] = list()
+        self.send(("links", partition, buffer))
+
+    def flush(self):
+        # sends every buffered url, done before telling the coordinator this partition is idle
+        with self.buffer_lock:
+            buffers = [(partition, buffer) for partition, buffer in enumerate(self.buffers) if buffer]
+            self.buffers = [list() for _ in range(self.partitions)]
+        for partition, buffer in buffers:
+            self.send(("links", partition, buffer))
+
+    def start(self, frontier):
+        Thread(target=self._receive, args=(frontier,), daemon=True).start()
+        if self.interval > 0:
+            Thread(target=self._flush_loop, daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        self.connection.close()
+
+    def _receive(self, frontier):
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                # the coordinator is gone, there is nobody left to hand out links
+                frontier.finish()
+                return
+            if message[0] == "links":
+                frontier.add_forwarded(message[1])
+            elif message[0] == "done":
+                frontier.finish()
+                return
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.interval):
+            self.flush()
+
+
+class PartitionedFrontier(Frontier):
+    ''' The Frontier of one partition: keeps the urls of its own hosts, forwards the others through
+        the link, and only runs out of urls once the coordinator says the whole crawl is done. '''
+    def __init__(self, config, restart, link):
+        self.link = link
+        self.partition = link.partition
+        self.partitions = link.partitions
+        self.condition = Condition()
+        # idle messages are sent in the order their counts were taken
+        self.report_lock = Lock()
+        # batches added from other partitions, and that count when this partition last said it was idle
+        self.received = 0
+        self.reported = -1
+        self.done = False
+        super().__init__(config, restart)
+        link.start(self)
+
+    def add_urls(self, urls):
+        local_urls = list()
+        for url in urls:
+            url = normalize(url)
+            partition = partition_of(url, self.partitions)
+            if partition == self.partition:
+                local_urls.append(url)
+            else:
+                self.link.forward(partition, url)
+        super().add_urls(local_urls)
+
+    def add_forwarded(self, urls):
+        # a batch of urls of this partition found by the others
+        with self.condition:
+            super().add_urls(urls)
+            self.received += 1
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.done = True
+            self.condition.notify_all()
+
+    def get_tbd_url(self):
+        while True:
+            # blocks while this partition has urls queued or in progress, None once it has neither
+            url = super().get_tbd_url()
+            if url is not None:
+                return url
+            with self.condition:
+                if self.done:
+                    return None
+                if not self.to_be_downloaded.idle() or self.reported == self.received:
+                    # woken by a forwarded batch or the end of the crawl
+                    self.condition.wait(1)
+                    continue
+            self._report_idle()
+
+    def _report_idle(self):
+        # The sends block once the socket is full, so they happen without the condition held: the
+        # receive thread needs it to add the batches the coordinator keeps sending meanwhile.
+        with self.report_lock:
+            with self.condition:
+                if not self.to_be_downloaded.idle() or self.reported == self.received:
+                    return
+                received = self.reported = self.received
+            self.link.flush()
+            self.link.send(("idle", received))
+
+
+class PartitionCrawler(Crawler):
+    ''' The Crawler of one partition, sends its statistics to the coordinator instead of printing them. '''
+    def __init__(self, config, restart, link):
+        self.link = link
+        super().__init__(config, restart, frontier_factory=lambda config, restart: PartitionedFrontier(config, restart, link))
+
+    def report(self):
+        url_seen = self.stats.url_seen
+        self.link.send(("stats", self.stats.state(), len(url_seen) if url_seen is not None else 0))
+
+
+def run_partition(config, restart, partition, address, authkey):
+    ''' Crawls one partition, config is the crawl's Config (with its cache_server set). '''
+    config = partition_config(config, partition)
+    link = PartitionLink(
+        address, authkey, partition, config.partitions,
+        config.forward_batch, config.forward_interval)
+    try:
+        PartitionCrawler(config, restart, link).start()
+    finally:
+        link.close()
+
+
+class Coordinator(object):
+    def __init__(self, config, authkey):
+        self.logger = get_logger("COORDINATOR")
+        self.partitions = config.partitions
+        self.listener = Listener(parse_address(config.coordinator), authkey=authkey)
+        # partition -> connection
+        self.connections = dict()
+        # partition -> messages to send to it, each sent by its own thread so a partition that is
+        # slow to read never stops the coordinator from reading the others
+        self.outboxes = dict()
+        self.senders = list()
+        # batches forwarded to every partition, and how many it had added when it was last idle
+        self.forwarded = [0] * self.partitions
+        self.idle = [None] * self.partitions
+        self.links = 0
+
+    @property
+    def address(self):
+        return self.listener.address
+
+    def accept(self):
+        while len(self.connections) < self.partitions:
+            try:
+                connection = self.listener.accept()
+            except (AuthenticationError, EOFError, OSError) as e:
+                self.logger.error(f"Rejected a connection: {e}")
+                continue
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                message = None
+            partition = message[1] if isinstance(message, tuple) and len(message) == 2 and message[0] == "hello" else None
+            if (not isinstance(partition, int) or not 0 <= partition < self.partitions
+                    or partition in self.connections):
+                self.logger.error(f"Rejected a connection that sent {message!r} instead of a new partition.")
+                connection.close()
+                continue
+            self.connections[partition] = connection
+            self.outboxes[partition] = Queue()
+            self.logger.info(f"Partition {partition} joined ({len(self.connections)}/{self.partitions}).")
+
+    def _send_loop(self, partition):
+        connection, outbox = self.connections[partition], self.outboxes[partition]
+        while True:
+            message = outbox.get()
+            if message is None:
+                return
+            try:
+                connection.send(message)
+            except (EOFError, OSError):
+                self.logger.error(f"Lost the connection to partition {partition}, its messages are dropped.")
+                return
+
+    def _finished(self):
+        return all(idle == forwarded for idle, forwarded in zip(self.idle, self.forwarded))
+
+    def _recv(self, partition, connection):
+        try:
+            return connection.recv()
+        except (EOFError, OSError):
+            raise RuntimeError(f"Lost the connection to partition {partition}.")
+
+    def run(self):
+        ''' Routes the links until every partition is done, returns the merged report. '''
+        self.accept()
+        partitions = {connection: partition for partition, connection in self.connections.items()}
+        for partition in self.connections:
+            sender = Thread(target=self._send_loop, args=(partition,), daemon=True, name=f"Coordinator-{partition}")
+            sender.start()
+            self.senders.append(sender)
+        while not self._finished():
+            for connection in wait(list(partitions)):
+                message = self._recv(partitions[connection], connection)
+                if message[0] == "links":
+                    _, target, urls = message
+                    self.outboxes[target].put(("links", urls))
+                    self.forwarded[target] += 1
+                    self.links += len(urls)
+                elif message[0] == "idle":
+                    self.idle[partitions[connection]] = message[1]
+        self.logger.info(f"Every partition is idle, forwarded {self.links} links in {sum(self.forwarded)} batches.")
+        stats = CrawlStats()
+        unique_pages = 0
+        for outbox in self.outboxes.values():
+            outbox.put(("done",))
+            outbox.put(None)
+        for partition, connection in self.connections.items():
+            message = self._recv(partition, connection)
+            while message[0] != "stats":
+                message = self._recv(partition, connection)
+            stats.merge(message[1])
+            unique_pages += message[2]
+        for sender in self.senders:
+            sender.join()
+        for connection in self.connections.values():
+            connection.close()
+        self.listener.close()
+        report = stats.snapshot(50)
+        report["unique_pages"] = unique_pages
+        return report
+
+
+def crawl(config, restart, local=True):
+    ''' Runs the coordinator, and every partition in a local process unless local is False
+        (the partitions are then started on other machines with launch.py --partition). '''
+    if local:
+        # only the processes started here get the key
+        authkey = os.urandom(32)
+    else:
+        check_remote_address(config.coordinator)
+        authkey = coordinator_key()
+    coordinator = Coordinator(config, authkey)
+    processes = list()
+    if local:
+        context = multiprocessing.get_context("spawn")
+        for partition in range(config.partitions):
+            process = context.Process(
+                target=run_partition, args=(config, restart, partition, coordinator.address, authkey),
+                name=f"Partition-{partition}")
+            process.start()
+            processes.append(process)
+    try:
+        report = coordinator.run()
+    except BaseException:
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+    print_report(report)
+    return report
@@ -1,17 +1,24 @@
 import os
-import shelve
-
-from threading import Thread, RLock
-from queue import Queue, Empty
 
 from utils import get_logger, get_urlhash, normalize
 from scraper import is_valid
+from crawler.frontier_store import get_store_class
+from crawler.scheduler import HostScheduler
+from crawler.rate_control import RateControl
+from utils.url_seen import make_url_seen
+from utils.metrics import metrics
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
-        self.lock = RLock()
+        # per host queues, hands out urls in an order that keeps the politeness delay per host
+        # with QUEUEWINDOW, urls past the window spill to disk next to the save file,
+        # the delay and concurrency of every host adapt between POLITENESS and MAXPOLITENESS
+        self.to_be_downloaded = HostScheduler(
+            self.config.time_delay, self.config.queue_window,
+            f"{self.config.save_file}.queue", self.config.queue_order,
+            RateControl.from_config(self.config))
+        store_class = get_store_class(self.config.frontier_store)
         if not os.path.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
             self.logger.info(
@@ -21,54 +28,76 @@ class Frontier(object):
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            store_class.delete(self.config.save_file)
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        # every url discovered so far, also gives the crawl statistics their unique page count
+        self.seen = make_url_seen(self.config)
+        # the store locks the urls by shard of their hash (FRONTIERSHARDS), so workers adding links wait less on each other
+        self.save = store_class(self.config.save_file, self.config.sync_interval, self.seen, self.config.frontier_shards)
         if restart:
-            for url in self.config.seed_urls:
-                self.add_url(url)
+            self.add_urls(self.config.seed_urls)
         else:
             # Set the frontier state with contents of save file.
             self._parse_save_file()
             if not self.save:
-                for url in self.config.seed_urls:
-                    self.add_url(url)
+                self.add_urls(self.config.seed_urls)
 
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
         total_count = len(self.save)
-        tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
+        tbd_count = self.save.count_incomplete()
+        # the incomplete urls are read from the save file as the queue needs them
+        self.to_be_downloaded.set_source(
+            (url for url in self.save.iter_incomplete() if is_valid(url)), tbd_count)
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
     def get_tbd_url(self):
-        with self.lock:
-            try:
-                return self.to_be_downloaded.pop()
-            except IndexError:
-                return None
+        # Blocks until the host of some queued url may be fetched, returns None when there is
+        # nothing left to download: the queue is empty and no url handed out is still in progress.
+        # Every url handed out has to end in mark_url_complete, requeue_url or abandon_url.
+        with metrics.timer("frontier get"):
+            return self.to_be_downloaded.get()
+
+    def requeue_url(self, url):
+        # Puts a url that was handed out but not downloaded back in the queue.
+        self.to_be_downloaded.requeue(url)
+
+    def release_host(self, url, resp=None, latency=None, crawl_delay=None):
+        # The download of url is done, its host can be fetched again after the politeness delay.
+        # With the latency and Response of the download (None if it failed) the delay adapts to the host.
+        self.to_be_downloaded.release(url, latency, resp, crawl_delay)
 
     def add_url(self, url):
-        with self.lock:
-            url = normalize(url)
-            urlhash = get_urlhash(url)
-            if urlhash not in self.save:
-                self.save[urlhash] = (url, False)
-                self.save.sync()
-                self.to_be_downloaded.append(url)
+        self.add_urls((url,))
+
+    def add_urls(self, urls):
+        # The links of a page in one batch: they are normalized and hashed without any lock held,
+        # the store takes each of its shards' locks once and the queue its lock once
+        urls = [normalize(url) for url in urls]
+        new_urls = self.save.add_many([(get_urlhash(url), url) for url in urls])
+        if new_urls:
+            self.to_be_downloaded.put_many(new_urls)
     
     def mark_url_complete(self, url):
-        with self.lock:
-            urlhash = get_urlhash(url)
-            if urlhash not in self.save:
-                # This should not happen.
-                self.logger.error(
-                    f"Completed url {url}, but have not seen it before.")
+        urlhash = get_urlhash(url)
+        if not self.save.mark_complete(urlhash, url):
+            # This should not happen.
+            self.logger.error(
+                f"Completed url {url}, but have not seen it before.")
+        self.to_be_downloaded.done(url)
+
+    def abandon_url(self, url):
+        # A url its worker failed on is completed, so it is not handed out again. It is done()
+        # even if that fails, or the crawl would wait for it forever.
+        try:
+            self.mark_url_complete(url)
+        except Exception:
+            self.to_be_downloaded.done(url)
+            raise
 
-            self.save[urlhash] = (url, True)
-            self.save.sync()
+    def close(self):
+        # Writes out everything that is still buffered in the store.
+        self.to_be_downloaded.close()
+        self.save.close()
@@ -0,0 +1,300 @@
+import os
+import shelve
+import sqlite3
+
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from threading import Thread, RLock, Event, Condition
+
+from utils.url_seen import UrlHashSet
+from utils.metrics import metrics
+
+# Persistent storage behind the Frontier.
+#
+# Every store keeps the hashes of all discovered urls in memory (a utils.url_seen structure,
+# shared with the crawl statistics) so membership checks never touch the disk. Adds and
+# completions are buffered and written in one batch (group commit) every sync_interval
+# seconds by a background thread, so a worker never waits on a disk sync.
+# Batches are written in order, so after a crash the save file holds a consistent prefix of
+# the crawl: a url is only marked complete if the links found on it were saved too.
+# A sync_interval of 0 writes every change straight away, like the original shelve frontier.
+# The changes of a url go through the lock of its shard (picked by its urlhash), so workers that
+# add different urls wait less on each other; a batch of urls takes each shard's lock once.
+
+
+class FrontierStore(ABC):
+    def __init__(self, path, sync_interval=0, seen=None, shards=1):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.write_lock = RLock()
+        # batches are written in the order they were taken out of pending: batches counts the
+        # batches taken, written the ones on disk
+        self.written_condition = Condition(self.write_lock)
+        self.batches = 0
+        self.written = 0
+        # hashes of every url ever discovered
+        self.seen = seen if seen is not None else UrlHashSet()
+        # a seen structure whose state is shared by every url (a Bloom filter's bytes) gets one lock
+        if not getattr(self.seen, "shardable", False):
+            shards = 1
+        self.locks = [metrics.timed_lock("frontier store", RLock()) for _ in range(max(1, shards))]
+        # per shard, urlhash -> (url, completed), changes that are not on disk yet
+        self.pending = [dict() for _ in self.locks]
+        self._open()
+        for urlhash in self._load_hashes():
+            self.seen.add(urlhash)
+        self._closed = Event()
+        self._flusher = None
+        if sync_interval > 0:
+            self._flusher = Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    @classmethod
+    def delete(cls, path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def __len__(self):
+        return len(self.seen)
+
+    def __contains__(self, urlhash):
+        return urlhash in self.seen
+
+    def _shard(self, urlhash):
+        return int(urlhash[-4:], 16) % len(self.locks) if len(self.locks) > 1 else 0
+
+    def add(self, urlhash, url):
+        ''' Records a newly discovered url. Returns False if it was already known. '''
+        return bool(self.add_many([(urlhash, url)]))
+
+    def add_many(self, items):
+        ''' Records the (urlhash, url) pairs of newly discovered urls, returns the urls that were
+            not known yet. Written in one batch when sync_interval is 0. '''
+        shards = defaultdict(list)
+        for urlhash, url in items:
+            shards[self._shard(urlhash)].append((urlhash, url))
+        new = list()
+        for shard, shard_items in shards.items():
+            with self.locks[shard]:
+                # read under the lock, a flush swaps the pending dicts out
+                pending = self.pending[shard]
+                for urlhash, url in shard_items:
+                    if self.seen.add(urlhash):
+                        pending[urlhash] = (url, False)
+                        new.append(url)
+        if new and not self.sync_interval:
+            self.flush()
+        return new
+
+    def mark_complete(self, urlhash, url):
+        ''' Marks a url as downloaded. Returns False if the url was never added. '''
+        shard = self._shard(urlhash)
+        with self.locks[shard]:
+            known = urlhash in self.seen
+            self.seen.add(urlhash)
+            self.pending[shard][urlhash] = (url, True)
+        if not self.sync_interval:
+            self.flush()
+        return known
+
+    def values(self):
+        ''' (url, completed) for every url in the store, as it was when this was called. '''
+        self.flush()
+        # read with write_lock held, the background flush writes to the same file
+        with self.write_lock:
+            rows = [(url, completed) for urlhash, url, completed in self._load()]
+        yield from rows
+
+    def count_incomplete(self):
+        return sum(1 for url, completed in self.values() if not completed)
+
+    def iter_incomplete(self):
+        ''' Yields the urls that were not downloaded yet, as they were when this was called
+            (urls added afterwards are not included). Reads the store lazily. '''
+        self.flush()
+        with self.write_lock:
+            urlhashes = [urlhash for urlhash, url, completed in self._load() if not completed]
+        for urlhash in urlhashes:
+            with self.write_lock:
+                url, completed = self._get(urlhash)
+            if not completed:
+                yield url
+
+    def flush(self):
+        # the pending dict is swapped out so workers can keep adding urls while the batch is written
+        self.write_pending(self.take_pending())
+
+    def take_pending(self):
+        ''' Swaps out the changes not written yet, for write_pending. '''
+        # all the shards at once, so a batch never holds a completed url without the links that
+        # were found on it (added before it was completed, maybe in other shards)
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            batch = dict()
+            for pending in self.pending:
+                batch.update(pending)
+            if not batch:
+                return None
+            self.pending = [dict() for _ in self.locks]
+            self.batches += 1
+            return self.batches, batch
+        finally:
+            for lock in reversed(self.locks):
+                lock.release()
+
+    def write_pending(self, taken):
+        ''' Writes what take_pending returned, after every batch taken before it. '''
+        if taken is None:
+            return
+        number, batch = taken
+        with self.written_condition:
+            while self.written != number - 1:
+                self.written_condition.wait()
+            try:
+                with metrics.timer("frontier write"):
+                    self._write(batch)
+            finally:
+                self.written = number
+                self.written_condition.notify_all()
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self._close()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.sync_interval):
+            self.flush()
+
+    @abstractmethod
+    def _open(self):
+        ''' Opens (or creates) the save file at self.path. '''
+
+    @abstractmethod
+    def _load(self):
+        ''' Yields (urlhash, url, completed) for every url on disk. '''
+
+    def _load_hashes(self):
+        for urlhash, url, completed in self._load():
+            yield urlhash
+
+    @abstractmethod
+    def _get(self, urlhash):
+        ''' (url, completed) of a url on disk. '''
+
+    @abstractmethod
+    def _write(self, batch):
+        ''' Writes a batch of urlhash -> (url, completed) to disk. '''
+
+    @abstractmethod
+    def _close(self):
+        ''' Closes the save file. '''
+
+
+class ShelveStore(FrontierStore):
+    # The original save format, a shelve of urlhash -> (url, completed)
+    @classmethod
+    def delete(cls, path):
+        # dbm backends may add their own extensions to the file name
+        for suffix in ("", ".db", ".dat", ".dir", ".bak"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def _open(self):
+        self.save = shelve.open(self.path)
+
+    def _load(self):
+        for urlhash, (url, completed) in self.save.items():
+            yield urlhash, url, completed
+
+    def _get(self, urlhash):
+        return self.save[urlhash]
+
+    def _write(self, batch):
+        for urlhash, value in batch.items():
+            self.save[urlhash] = value
+        self.save.sync()
+
+    def _close(self):
+        self.save.close()
+
+
+class SqliteStore(FrontierStore):
+    # SQLite in WAL mode, every batch is one transaction
+    @classmethod
+    def delete(cls, path):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def _open(self):
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # with WAL, NORMAL only syncs at checkpoints and is still safe against corruption
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "urlhash TEXT PRIMARY KEY, url TEXT NOT NULL, completed INTEGER NOT NULL)")
+
+    def _load(self):
+        with self.write_lock:
+            rows = self.conn.execute("SELECT urlhash, url, completed FROM urls").fetchall()
+        for urlhash, url, completed in rows:
+            yield urlhash, url, bool(completed)
+
+    def _load_hashes(self):
+        # a cursor, the urls themselves are not needed to fill the seen set
+        for urlhash, in self.conn.execute("SELECT urlhash FROM urls"):
+            yield urlhash
+
+    def _get(self, urlhash):
+        with self.write_lock:
+            url, completed = self.conn.execute("SELECT url, completed FROM urls WHERE urlhash = ?", (urlhash,)).fetchone()
+        return url, bool(completed)
+
+    def count_incomplete(self):
+        self.flush()
+        with self.write_lock:
+            return self.conn.execute("SELECT COUNT(*) FROM urls WHERE completed = 0").fetchone()[0]
+
+    def iter_incomplete(self, batch_size=10000):
+        # INSERT OR REPLACE gives a row a new rowid, so rows added or completed after this call
+        # all have a rowid past last and the urls are read in rowid order up to it, batch by batch
+        self.flush()
+        with self.write_lock:
+            last = self.conn.execute("SELECT MAX(rowid) FROM urls").fetchone()[0] or 0
+        position = 0
+        while position < last:
+            with self.write_lock:
+                rows = self.conn.execute(
+                    "SELECT rowid, url FROM urls WHERE completed = 0 AND rowid > ? AND rowid <= ? "
+                    "ORDER BY rowid LIMIT ?", (position, last, batch_size)).fetchall()
+            if not rows:
+                return
+            position = rows[-1][0]
+            for rowid, url in rows:
+                yield url
+
+    def _write(self, batch):
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO urls (urlhash, url, completed) VALUES (?, ?, ?)",
+            [(urlhash, url, int(completed)) for urlhash, (url, completed) in batch.items()])
+        self.conn.execute("COMMIT")
+
+    def _close(self):
+        self.conn.close()
+
+
+STORES = {
+    "shelve": ShelveStore,
+    "sqlite": SqliteStore,
+}
+
+
+def get_store_class(name):
+    assert name in STORES, f"Unknown frontier store {name}, expected one of {sorted(STORES)}"
+    return STORES[name]
@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from threading import Lock
+
+import scraper
+
+# Runs scraper.analyze_page (parsing, tokenizing and fingerprinting) in a pool of processes so
+# the CPU heavy part of scraping is not serialized by the GIL of the crawler process.
+#
+# The worker threads keep downloading and wait on the pool (without holding the GIL) for the
+# links, word counts and fingerprint of each page; the dedup indexes and the stats stay in the
+# crawler process. Pages of at least SHARED_MEMORY_SIZE bytes are handed to the parse process
+# through shared memory instead of being pickled through the pool's pipe. The crawler process
+# owns every block; the parse process only attaches to it and parses straight from its buffer.
+
+SHARED_MEMORY_SIZE = 1 << 16
+
+
+def _attach(name):
+    # attaches to a block the crawler process owns. From Python 3.13 the block is not registered
+    # with the resource tracker again. Before that the parse processes share the crawler
+    # process's tracker (spawn passes it on), so registering it again is a no-op: unregistering it
+    # here would drop the crawler process's own registration and the tracker fails on its unlink.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _analyze_shared(url, base_url, name, size):
+    block = _attach(name)
+    content = block.buf[:size]
+    try:
+        return scraper.analyze_page(url, base_url, content)
+    finally:
+        content.release()
+        block.close()
+
+
+class ParsePool(object):
+    def __init__(self, processes):
+        # spawn, not fork: the crawler process already runs threads when the pool starts
+        self.executor = ProcessPoolExecutor(processes, mp_context=get_context("spawn"))
+
+    def analyze_page(self, url, base_url, content):
+        ''' Same as scraper.analyze_page, but runs in one of the pool's processes. '''
+        if len(content) < SHARED_MEMORY_SIZE:
+            return self.executor.submit(scraper.analyze_page, url, base_url, content).result()
+        block = shared_memory.SharedMemory(create=True, size=len(content))
+        try:
+            block.buf[:len(content)] = content
+            return self.executor.submit(_analyze_shared, url, base_url, block.name, len(content)).result()
+        finally:
+            block.close()
+            block.unlink()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+_parse_pool = None
+_parse_pool_lock = Lock()
+
+def get_parse_pool(config):
+    # One pool per crawler process, or None when pages are parsed in the worker threads
+    global _parse_pool
+    if config.parse_processes <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ParsePool(config.parse_processes)
+        return _parse_pool
+
+def close_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.close()
+            _parse_pool = None
@@ -0,0 +1,132 @@
+from heapq import nlargest
+
+# Per host politeness delay and concurrency of the HostScheduler, adapted to how each host responds.
+#
+# Every download reports its latency and status. A failed download, a 429 or a 5xx (or a cache
+# server error, 600-606) doubles the host's delay, or raises it to the Retry-After the host sent,
+# and drops it back to one download at a time. Otherwise the delay moves towards its target,
+# the floor times how much slower the host is than usual (its smoothed latency over the lowest
+# one seen, which creeps up by BASELINE_DRIFT per response so a lasting change becomes the new
+# usual): straight up when the host slows down, half of the way down per response when it speeds
+# up. A host that is slow but steady is not held back, only one that gets slower. The delay never
+# leaves [floor, ceiling], where floor is POLITENESS (or the host's robots.txt Crawl-delay if
+# longer), so a host is never fetched faster than the fixed delay allowed. A host that stays
+# healthy at the floor earns one more download in flight every HEALTHY_STREAK responses, up to
+# max_concurrency; downloads in flight still start at least a delay apart (see HostScheduler).
+
+# weight of the newest latency in the smoothed latency
+SMOOTHING = 0.3
+# how much of the way to its target the delay comes down per healthy response
+DECAY = 0.5
+# how much the usual latency of a host rises per response towards its current latency
+BASELINE_DRIFT = 0.01
+# a host is slower than usual once its latency is this many times its usual latency
+SLOWDOWN = 1.5
+# healthy responses in a row at the target delay before one more download may be in flight
+HEALTHY_STREAK = 10
+# the delay a backoff starts from when the floor is 0
+MIN_BACKOFF = 0.1
+
+
+def is_overloaded(status):
+    # statuses that mean the host (or the cache server fetching it) is struggling
+    return status is None or status == 429 or 500 <= status < 607
+
+
+def retry_after(resp):
+    # seconds from the Retry-After header of a 429 or 503, None if there is none (or it is a date)
+    if resp is None or resp.status not in {429, 503}:
+        return None
+    raw_response = resp.raw_response
+    if raw_response is None or raw_response.headers is None:
+        return None
+    value = raw_response.headers.get("Retry-After", "").strip()
+    return float(value) if value.isdigit() else None
+
+
+class _HostRate(object):
+    __slots__ = ("delay", "latency", "baseline", "concurrency", "streak", "floor")
+
+    def __init__(self, delay):
+        self.delay = delay
+        # smoothed latency, and the lowest it has been (drifting up)
+        self.latency = None
+        self.baseline = None
+        self.concurrency = 1
+        self.streak = 0
+        self.floor = delay
+
+
+class RateControl(object):
+    ''' Politeness delay and downloads in flight of every host. Not thread safe, the
+        HostScheduler calls it with its condition held. With ceiling == floor and
+        max_concurrency 1 every host keeps the fixed floor delay. '''
+    def __init__(self, floor, ceiling=None, max_concurrency=1):
+        self.floor = floor
+        self.ceiling = max(floor, ceiling if ceiling is not None else floor)
+        self.max_concurrency = max(1, max_concurrency)
+        # host -> _HostRate, only for hosts that reported a download
+        self.hosts = dict()
+        self.backoffs = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.time_delay, config.max_time_delay, config.host_concurrency)
+
+    def delay(self, host):
+        rate = self.hosts.get(host)
+        return rate.delay if rate is not None else self.floor
+
+    def concurrency(self, host):
+        rate = self.hosts.get(host)
+        return rate.concurrency if rate is not None else 1
+
+    def delays(self, k=None):
+        ''' host -> delay of the hosts slower than the floor, only the k slowest if k is given. '''
+        delays = [(rate.delay, host) for host, rate in self.hosts.items() if rate.delay > self.floor]
+        if k is not None:
+            delays = nlargest(k, delays)
+        return {host: delay for delay, host in delays}
+
+    def record(self, host, latency, status, retry=None, crawl_delay=None):
+        ''' Adapts the host to one download that took latency seconds and ended with status
+            (None if it failed), retry is the Retry-After of the response in seconds. '''
+        rate = self.hosts.get(host)
+        if rate is None:
+            rate = self.hosts[host] = _HostRate(self.floor)
+        # the robots.txt Crawl-delay of the host is a floor of its own, even above the ceiling
+        rate.floor = max(self.floor, crawl_delay or 0)
+        ceiling = max(self.ceiling, rate.floor)
+        if rate.latency is None:
+            rate.latency = rate.baseline = latency
+        else:
+            rate.latency = SMOOTHING * latency + (1 - SMOOTHING) * rate.latency
+            rate.baseline = min(rate.latency, rate.baseline + BASELINE_DRIFT * (rate.latency - rate.baseline))
+        if is_overloaded(status):
+            delay = min(ceiling, max(2 * rate.delay, MIN_BACKOFF, retry or 0, rate.floor))
+            if delay > rate.delay or rate.concurrency > 1:
+                self.backoffs += 1
+            rate.delay = delay
+            rate.concurrency = 1
+            rate.streak = 0
+            return
+        slowdown = rate.latency / rate.baseline if rate.baseline > 0 else 1
+        if slowdown < SLOWDOWN:
+            slowdown = 1
+        target = min(ceiling, max(rate.floor, rate.floor * slowdown))
+        if target > rate.delay:
+            # slowing down
+            rate.delay = target
+            rate.concurrency = max(1, rate.concurrency - 1)
+            rate.streak = 0
+            return
+        rate.delay = max(target, rate.delay - DECAY * (rate.delay - target))
+        if rate.delay > 1.01 * target + 0.001:
+            return
+        rate.delay = target
+        if target > rate.floor:
+            return
+        rate.streak += 1
+        if rate.streak >= HEALTHY_STREAK and rate.concurrency < self.max_concurrency:
+            rate.concurrency += 1
+            rate.streak = 0
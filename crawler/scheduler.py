@@ -0,0 +1,252 @@
+import time
+from heapq import heappush, heappop, nlargest
+from itertools import islice
+from threading import Condition, RLock
+from urllib.parse import urlsplit
+
+from utils import get_host
+from utils.metrics import metrics
+from crawler.spill_queue import SpillQueue
+from crawler.rate_control import RateControl, retry_after
+
+
+def path_depth(url):
+    return sum(1 for part in urlsplit(url).path.split("/") if part)
+
+# How each host's urls are ordered: the smallest key (url, sequence number) is downloaded first
+QUEUE_ORDERS = {
+    # newest first, like the original list
+    "lifo": lambda url, seq: (0, -seq),
+    "fifo": lambda url, seq: (0, seq),
+    # shallowest path first, then oldest: breadth first within every host
+    "depth": lambda url, seq: (path_depth(url), seq),
+}
+
+
+class HostScheduler(object):
+    ''' The to-be-downloaded queue of the Frontier, split into one queue per host.
+
+        Hosts with queued urls sit in a min-heap keyed on the time they may be fetched again.
+        get() hands out a url whose host is ready now, or waits until one is, so politeness
+        holds across all the workers without any of them sleeping while another host could
+        be fetched. How long a host waits and how many downloads it may have in progress come
+        from a RateControl (see crawler/rate_control.py), which adapts them to the latency and
+        status of the host's downloads, reported by release(). Downloads of a host start at
+        least its delay apart, and once one is released the host waits delay / concurrency
+        more seconds; with the default one download at a time that is the full delay after the
+        previous download ended, like a fixed politeness delay.
+
+        With a window, at most that many urls are kept in memory; the rest spill to disk segments
+        (see crawler/spill_queue.py) and come back once the queues drain below half the window.
+        A source (an iterator of urls, e.g. the incomplete urls of a resumed crawl) is read the
+        same way, a window at a time, so a resumed crawl starts downloading straight away.
+
+        Every url get() hands out is in progress until done() is called for it. When nothing is
+        queued get() waits while urls are in progress, since their pages may add more, and only
+        returns None once the queue is empty and no url is in progress: every worker is idle.
+        A url that is done() before its host was release()d releases it, so a worker that fails
+        on a url never keeps its host or the crawl waiting. '''
+    def __init__(self, time_delay, window=0, spill_path=None, order="lifo", rate=None):
+        self.time_delay = time_delay
+        self.rate = rate if rate is not None else RateControl(time_delay)
+        self.condition = Condition(metrics.timed_lock("scheduler", RLock()))
+        assert order in QUEUE_ORDERS, f"Unknown queue order {order}, expected one of {sorted(QUEUE_ORDERS)}"
+        self.key = QUEUE_ORDERS[order]
+        self.seq = 0
+        # host -> heap of (key, url) of that host waiting to be downloaded
+        self.queues = dict()
+        # host -> earliest time.monotonic() at which the host may be fetched again
+        self.next_fetch = dict()
+        # heap of (next_fetch, host) for every host that has queued urls and may start another
+        # download, an entry whose host's next_fetch moved later since is pushed again when popped
+        self.ready = list()
+        # hosts in ready
+        self.scheduled = set()
+        # host -> number of downloads in progress
+        self.in_flight = dict()
+        # urls handed out by get() and not done() yet, and those of them whose host is not released
+        self.in_progress = set()
+        self.holding = set()
+        # urls in memory
+        self.count = 0
+        # 0 keeps every url in memory
+        self.window = window
+        # the queues are refilled below half the window, at least one url for the smallest windows
+        self.low_water = max(1, window // 2)
+        self.spill = SpillQueue(spill_path, max(1, window // 4)) if window else None
+        self.source = None
+        # how many urls the source still holds, as far as the caller knew
+        self.source_count = 0
+
+    def __len__(self):
+        return self.count + (len(self.spill) if self.spill else 0) + self.source_count
+
+    def set_source(self, urls, count=0):
+        ''' Queues every url of the iterator urls, read lazily when there is a window. '''
+        with self.condition:
+            if not self.window:
+                for url in urls:
+                    self._push(url)
+                return
+            self.source = iter(urls)
+            self.source_count = count
+            self._refill()
+
+    def depths(self, k=None):
+        ''' host -> number of urls queued in memory, only the k deepest queues if k is given. '''
+        with self.condition:
+            depths = [(len(queue), host) for host, queue in self.queues.items()]
+        if k is not None:
+            depths = nlargest(k, depths)
+        return {host: depth for depth, host in depths}
+
+    def delays(self, k=None):
+        ''' host -> politeness delay of the hosts the rate control slowed down, the k slowest if k is given. '''
+        with self.condition:
+            return self.rate.delays(k)
+
+    def put(self, url):
+        self.put_many((url,))
+
+    def put_many(self, urls):
+        with self.condition:
+            for url in urls:
+                if self.window and self.count >= self.window:
+                    self.seq += 1
+                    self.spill.push(self.key(url, self.seq), url)
+                else:
+                    self._push(url)
+
+    def done(self, url):
+        ''' url, handed out by get(), was downloaded (or put back). '''
+        with self.condition:
+            if url in self.holding:
+                self.release(url)
+            self.in_progress.discard(url)
+            if not self.in_progress and not self._pending():
+                # the crawl is over, every waiting get() returns None
+                self.condition.notify_all()
+
+    def requeue(self, url):
+        ''' Puts url, handed out by get(), back in the queue and makes it done() in one step, so no
+            other worker can get it in between and have its own download of it ended here. '''
+        with self.condition:
+            self.put(url)
+            self.done(url)
+
+    def idle(self):
+        ''' True if nothing is queued and no url is in progress. '''
+        with self.condition:
+            return not self._pending() and not self.in_progress
+
+    def _push(self, url, key=None):
+        # adds url to its host's queue in memory, called with the condition held
+        if key is None:
+            self.seq += 1
+            key = self.key(url, self.seq)
+        host = get_host(url)
+        queue = self.queues.setdefault(host, list())
+        heappush(queue, (key, url))
+        self.count += 1
+        if len(queue) == 1:
+            self._schedule(host)
+
+    def _schedule(self, host):
+        # puts a host with queued urls in ready, unless it is there or has all the downloads it may have
+        if host in self.scheduled or self.in_flight.get(host, 0) >= self.rate.concurrency(host):
+            return
+        heappush(self.ready, (self.next_fetch.get(host, 0), host))
+        self.scheduled.add(host)
+        self.condition.notify()
+
+    def _refill(self):
+        # brings spilled urls, then urls of the source, back in memory until the window is half full
+        while self.count < self.low_water:
+            if self.spill:
+                for key, url in self.spill.pop_segment():
+                    self._push(url, key)
+            elif self.source is not None:
+                urls = list(islice(self.source, self.low_water - self.count))
+                if not urls:
+                    self.source = None
+                    self.source_count = 0
+                    break
+                self.source_count = max(0, self.source_count - len(urls))
+                for url in urls:
+                    self._push(url)
+            else:
+                break
+
+    def _pending(self):
+        return self.count or (self.spill and len(self.spill)) or self.source is not None
+
+    def get(self):
+        ''' Returns a url whose host can be fetched now, or None once nothing is queued or in progress. '''
+        with self.condition:
+            while True:
+                if not self._pending():
+                    if not self.in_progress:
+                        return None
+                    # the pages in progress may add urls
+                    self.condition.wait()
+                    continue
+                if self.window and self.count < self.low_water:
+                    self._refill()
+                    if not self.count:
+                        continue
+                if not self.ready:
+                    # every host with queued urls has all the downloads in progress it may have
+                    self.condition.wait()
+                    continue
+                now = time.monotonic()
+                wait = self.ready[0][0] - now
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                when, host = heappop(self.ready)
+                if self.next_fetch.get(host, 0) > when:
+                    heappush(self.ready, (self.next_fetch[host], host))
+                    continue
+                self.scheduled.discard(host)
+                queue = self.queues[host]
+                _, url = heappop(queue)
+                self.count -= 1
+                self.in_flight[host] = self.in_flight.get(host, 0) + 1
+                self.next_fetch[host] = now + self.rate.delay(host)
+                self.in_progress.add(url)
+                self.holding.add(url)
+                if queue:
+                    self._schedule(host)
+                else:
+                    del self.queues[host]
+                return url
+
+    def release(self, url, latency=None, resp=None, crawl_delay=None):
+        ''' Called once the download of url is done, starts the politeness delay of its host.
+            latency is how long the download took and resp its Response (None if it failed),
+            leaving latency out (e.g. for a robots.txt or a skipped url) does not adapt the host. '''
+        host = get_host(url)
+        with self.condition:
+            if latency is not None:
+                self.rate.record(
+                    host, latency, resp.status if resp is not None else None, retry_after(resp), crawl_delay)
+            if url in self.holding:
+                self.holding.discard(url)
+                in_flight = self.in_flight.get(host, 0) - 1
+                if in_flight > 0:
+                    self.in_flight[host] = in_flight
+                else:
+                    self.in_flight.pop(host, None)
+            self.next_fetch[host] = max(
+                self.next_fetch.get(host, 0),
+                time.monotonic() + self.rate.delay(host) / self.rate.concurrency(host))
+            if host in self.queues:
+                self._schedule(host)
+            # wake everyone, waiters blocked on a busy host and on a timed wait both need to re-check
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            if self.spill:
+                self.spill.close()
+            self.source = None
@@ -0,0 +1,68 @@
+import os
+import shutil
+from heapq import heappush, heappop
+
+# Disk tier of the HostScheduler for frontiers that do not fit its in-memory window.
+#
+# Urls that overflow the window are buffered as (key, url) and written out segment_size at a
+# time, sorted by key, as one text file per segment with a "key<tab>url" line per url (keys are
+# tuples of ints, urls never contain tabs or newlines). The segments sit in a heap on the
+# smallest key they hold, so pop_segment() always brings back the segment with the url the
+# queue order wants next. Nothing here survives a restart: the
+# frontier's store is the durable copy, the queue is rebuilt from it when the crawler resumes.
+
+
+class SpillQueue(object):
+    def __init__(self, path, segment_size):
+        self.path = path
+        self.segment_size = max(1, segment_size)
+        # (key, url) not written out yet
+        self.buffer = list()
+        # heap of (smallest key, segment number, file, number of urls)
+        self.segments = list()
+        self.next_segment = 0
+        self.count = 0
+        # left over from a crawl that did not shut down cleanly
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __len__(self):
+        return self.count
+
+    def push(self, key, url):
+        self.buffer.append((key, url))
+        self.count += 1
+        if len(self.buffer) >= self.segment_size:
+            self._write_segment()
+
+    def pop_segment(self):
+        ''' Removes and returns the (key, url) of the buffer or of the segment holding the smallest key. '''
+        if self.buffer and (not self.segments or min(self.buffer)[0] <= self.segments[0][0]):
+            urls, self.buffer = self.buffer, list()
+        elif self.segments:
+            _, _, segment_file, _ = heappop(self.segments)
+            urls = list()
+            with open(segment_file) as segment:
+                for line in segment:
+                    key, url = line.rstrip("\n").split("\t", 1)
+                    urls.append((tuple(int(part) for part in key.split()), url))
+            os.remove(segment_file)
+        else:
+            return list()
+        self.count -= len(urls)
+        return urls
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.buffer = list()
+        self.segments = list()
+        self.count = 0
+
+    def _write_segment(self):
+        self.buffer.sort()
+        os.makedirs(self.path, exist_ok=True)
+        segment_file = os.path.join(self.path, f"{self.next_segment:08d}.txt")
+        with open(segment_file, "w") as segment:
+            segment.writelines(f"{' '.join(map(str, key))}\t{url}\n" for key, url in self.buffer)
+        heappush(self.segments, (self.buffer[0][0], self.next_segment, segment_file, len(self.buffer)))
+        self.next_segment += 1
+        self.buffer = list()
@@ -1,115 +1,118 @@
-from itertools import islice
-from threading import Thread, RLock, Semaphore
-from collections import defaultdict
+import time
+from functools import lru_cache
+
+from threading import Thread
 from inspect import getsource
 from utils.download import download
+from utils.response import TOO_LARGE, UNSUPPORTED_TYPE
 from utils import get_logger
+from utils.robots import get_robots_cache
+from crawler.parse_pool import get_parse_pool
+from utils.metrics import metrics
 import scraper
-import time
-from urllib.parse import urlparse
-import urllib.robotparser as robot
-from bs4 import BeautifulSoup
+
+
+@lru_cache(maxsize=None)
+def check_scraper():
+    # basic check for requests in scraper, reads its source once per process rather than once per worker
+    source = getsource(scraper)
+    assert {source.find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
+    assert {source.find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
 
 
 class Worker(Thread):
-    shared_dict = defaultdict(int)
-    shared_lock = RLock()
-    shared_semaphores = defaultdict(Semaphore)
-    running_dict = dict()
-    unique_list = list()
-    max_word_count = 0
-    max_word_url = ""
-    sub_domain_dict = dict()
-    similarityCount = 0
     def __init__(self, worker_id, config, frontier):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
-        # basic check for requests in scraper
-        assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
-        assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
-        super().__init__(daemon=True)
-        
-        # each worker gets its own similarityCount
-        # self.similarityCount = 0
-    def getDomain(self, url):
-        try:
-            parsed = urlparse(url)
-            if parsed.hostname == None or '.' not in parsed.hostname:
-                return None
-            else:
-                filtered_hostname = parsed.hostname.split('.', 1)[1]
-                return filtered_hostname
-        except:
-            return None
+        self.robots = get_robots_cache(config)
+        # None unless pages are parsed in separate processes (PARSEPROCESSES in config.ini)
+        self.parse_pool = get_parse_pool(config)
+        check_scraper()
+        super().__init__(name=f"Worker-{worker_id}", daemon=True)
     def run(self):
         while True:
             tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            currentDomain = self.getDomain(tbd_url)
-            if currentDomain is not None:
-                self.shared_semaphores[currentDomain].acquire()
-                try:
-                    with Worker.shared_lock:
-                        Worker.shared_dict[currentDomain] += 1
-                        if Worker.shared_dict[currentDomain] > 2:
-                            time.sleep(self.config.time_delay)
-                finally:
-                    self.shared_semaphores[currentDomain].release()
+            try:
+                self.crawl_url(tbd_url)
+            except Exception as e:
+                # a url left in progress would keep the crawl from ever ending
+                self.logger.exception(f"Failed to crawl {tbd_url}: {e}")
+                self.frontier.abandon_url(tbd_url)
+    def crawl_url(self, tbd_url):
+        with metrics.timer("robots"):
+            allowed = self.check_robots(tbd_url)
+        if not allowed:
+            return
+        # Politeness is handled by the frontier, it only hands out urls whose host is ready
+        # and adapts the host's delay to the latency and status of its downloads
+        resp = None
+        start = time.perf_counter()
+        try:
+            with metrics.timer("download"):
                 resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
+        except Exception as e:
+            self.logger.error(f"Failed to download {tbd_url}: {e}")
+            self.frontier.mark_url_complete(tbd_url)
+            return
+        finally:
+            self.frontier.release_host(
+                tbd_url, resp, time.perf_counter() - start, self.robots.crawl_delay(tbd_url))
+        self.process_page(tbd_url, resp)
+    def check_robots(self, tbd_url):
+        # Returns True if tbd_url can be downloaded now.
+        # The first url handed out for a host fetches the host's robots.txt instead (that counts as
+        # the host's request for politeness) and goes back in the frontier to wait for its turn.
+        if not self.robots.is_cached(tbd_url):
             try:
-                robot_permissions_dict = self.robots_checkage_creation(resp)
-                scraped_urls = scraper.scraper(tbd_url, resp, robot_permissions_dict)
-            except:
-                pass
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
+                self.robots.fetch(tbd_url, self.logger)
+            except Exception as e:
+                # the url goes back in the frontier and the next url of the host tries again
+                self.logger.error(f"Failed to fetch the robots.txt for {tbd_url}: {e}")
+            finally:
+                self.frontier.release_host(tbd_url)
+            self.frontier.requeue_url(tbd_url)
+            return False
+        if not self.robots.can_fetch(tbd_url):
+            self.logger.info(f"Skipping {tbd_url}, disallowed by robots.txt.")
+            self.frontier.release_host(tbd_url)
             self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
-            with Worker.shared_lock:
-                Worker.shared_dict[currentDomain] -= 1
-            with Worker.shared_lock:
-                Worker.running_dict.update(scraper.running_dict)
-                # self.running_dict = dict(sorted(self.running_dict.items(), key=lambda x: x[0], reverse=False))
-                # self.running_dict = dict(sorted(self.running_dict.items(), key=lambda value: value[1], reverse=True))
-                Worker.unique_list.extend(scraper.unique_list)
-                if Worker.max_word_count < scraper.max_word_count:
-                    Worker.max_word_count = scraper.max_word_count
-                    Worker.max_word_url = scraper.max_word_url
-                # print(scraper.sub_domain_dict)
-                Worker.sub_domain_dict.update(scraper.sub_domain_dict)
-                # if Worker.similarityCount != scraper.similarCount:
-                #     Worker.similarityCount += 1
-                # temp = list(islice(sorted_running_dict, 50))
-                # print("\nHow many unique pages did you find: ", len(scraper.unique_list))
-                # print("\n50 most common words in the entire set of pages: ", temp)
-                # print("\nLongest page in terms of the # of words:", scraper.max_word_url, "with", scraper.max_word_count, "words")
-                # sorted_sub_domain_dict = dict(sorted(scraper.sub_domain_dict.items(), key=lambda x: x[0], reverse=False))
-                # print("\nSubdomains found in the ics.uci.edu domain: ", sorted_sub_domain_dict)
-        similarityCount = scraper.similarCount
-    def robots_checkage_creation(self, resp):
-        #function that checks robots.txt at root
-        robot_permissions_dict = dict()
-        if resp.status == 204 or resp.status >= 400:
-            return robot_permissions_dict
-        robots_urls = []
-        for domain in ["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]:
-            robots_urls.append((domain, f'https://{domain}/robots.txt'))
-        for url in robots_urls:
-            rp = robot.RobotFileParser()
-            rp.set_url(url[1])
-        # Downloads webpage with BeautifulSoup
-            try: 
-                soup = BeautifulSoup(resp.raw_response.content, "lxml")
+            return False
+        # urls queued before the trap detector blocked their pattern
+        trap = scraper.is_trap(tbd_url)
+        if trap is not None:
+            self.logger.info(f"Skipping {tbd_url}, crawler trap ({trap}).")
+            self.frontier.release_host(tbd_url)
+            self.frontier.mark_url_complete(tbd_url)
+            return False
+        return True
+    def process_page(self, tbd_url, resp):
+        # Scrapes a downloaded page, adds its links to the frontier and merges the stats.
+        # Shared by the threaded run loop and crawler.async_worker.AsyncWorker
+        self.logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.")
+        scraped_urls = list()
+        # non-html pages are dropped before they are parsed, the scraper skips their error status
+        if not resp.check_content_type(self.config.content_types):
+            self.logger.info(resp.error)
+        if resp.status in {TOO_LARGE, UNSUPPORTED_TYPE}:
+            metrics.count("rejected pages")
+        # a checkpoint of the stats and dedup state waits until the page is fully recorded
+        with scraper.recording():
+            try:
+                analyze = self.parse_pool.analyze_page if self.parse_pool is not None else None
+                with metrics.timer("scrape"):
+                    scraped_urls = scraper.scraper(tbd_url, resp, self.robots, analyze)
             except:
-                soup = BeautifulSoup(resp.raw_response.content, "utf-8")
-            if len(soup.get_text()) != 0:
-                rp.parse(soup.get_text())
-                robot_permissions_dict[url[0]] = rp
-        return robot_permissions_dict
-        
\ No newline at end of file
+                pass
+            with metrics.timer("frontier add"):
+                self.frontier.add_urls(scraped_urls)
+                self.frontier.mark_url_complete(tbd_url)
+            # merges the stats this thread recorded for the page into the global view
+            scraper.stats.flush()
+        metrics.count("pages")
+        metrics.count("links", len(scraped_urls))
@@ -4,20 +4,38 @@ from argparse import ArgumentParser
 from utils.server_registration import get_cache_server
 from utils.config import Config
 from crawler import Crawler
+from crawler import distributed
 
 
-def main(config_file, restart):
+def main(config_file, restart, download_mode=None, partitions=None, partition=None, coordinator_only=False):
     cparser = ConfigParser()
     cparser.read(config_file)
+    if download_mode:
+        cparser["LOCAL PROPERTIES"]["DOWNLOADMODE"] = download_mode
+    if partitions:
+        cparser["LOCAL PROPERTIES"]["PARTITIONS"] = str(partitions)
     config = Config(cparser)
     config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
-    crawler.start()
+    if partition is not None:
+        # one partition of a distributed crawl whose coordinator runs on COORDINATOR
+        distributed.run_partition(
+            config, restart, partition, distributed.parse_address(config.coordinator), distributed.coordinator_key())
+    elif config.partitions > 1:
+        distributed.crawl(config, restart, local=not coordinator_only)
+    else:
+        crawler = Crawler(config, restart)
+        crawler.start()
 
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--download_mode", type=str, choices=["threads", "async"], default=None)
+    parser.add_argument("--partitions", type=int, default=None, help="overrides PARTITIONS")
+    parser.add_argument("--partition", type=int, default=None,
+                        help="only crawl this partition, for partitions started on other machines")
+    parser.add_argument("--coordinator_only", action="store_true", default=False,
+                        help="only run the coordinator, the partitions are started with --partition")
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.download_mode, args.partitions, args.partition, args.coordinator_only)
@@ -1,68 +1,84 @@
-import re
-from urllib.parse import urlparse
-from bs4 import BeautifulSoup
-import nltk
-from nltk.corpus import stopwords
-import urllib.robotparser as robot
-from collections import defaultdict
-import hashlib
+from collections import namedtuple
+from contextlib import nullcontext
+from utils.stopwords import get_stopwords
+from utils.simhash import SimhashFingerprinter, SimhashIndex
+from utils.tokenizer import tokenize, count_tokens
+from utils.html_extract import parse_page
+from utils.stats import CrawlStats
+from utils.url_filter import UrlFilter
+from utils.trap_detector import TrapDetector
+from utils.exact_dup import ExactDuplicateIndex, content_digest, text_digest
+from utils.page_cache import PageCache
+from utils.checkpoint import Checkpointer
+from utils.metrics import metrics
 
 # Global variables to keep track of stats for the report
-# unique_list is a list that will keep track of all unique pages encountered throughout the crawl
-#
-# running_dict is a running dictionary of all of the tokenized words and their frequencies. We will count the top 50 words.
-# We still need to exclude stopwords
-#
-# max_word_count is the count of the webpage with the highest amount of words
-#
-# max_word_url holds the url of the longest page in terms of the number of words
-#
-# sub_domain_dict is a dictionary that contains the subdomains of the ics.uci.edu domain. The keys are the subdomains of ics.uci.edu
-# and the values are the amount of unique pages on each subdomain
-#
-# stopwords_set is a set of stopwords to be excluded from our running_dict. Still needs to be utilized
-unique_list = list()
-running_dict = dict()
-max_word_count = 0
-max_word_url = str()
-sub_domain_dict = dict()
-nltk.download('stopwords')
-stopwords_set = stopwords.words('english')
-checksum_dict = dict()
-simhash_set = set()
-similarCount = 0
+# stats collects the stats for the report (see utils/stats.py):
+# the unique pages encountered throughout the crawl, the frequencies of all the tokenized words (without stopwords)
+# for the top 50 words, the longest page in terms of the number of words, the amount of unique pages on each
+# subdomain of ics.uci.edu and the number of similar pages.
+# Each thread records into its own counters, the worker merges them into the global view after every page.
+stats = CrawlStats()
+# exact_index holds a 128-bit digest of the raw bytes and of the text of every page we have seen
+exact_index = ExactDuplicateIndex()
+# url_filter holds the compiled is_valid rules, configure() replaces it with the rules from config.ini
+url_filter = UrlFilter()
 
 FINGERPRINT_SIZE = 256
-# Modified to take in a webpage in the form of text/string
-def tokenize(page_text: str):
-    """
-    reads a content string and returns a list of the tokens in that page
-    The time complexity is O(n) where n is the number of characters in the page
-    This would make it run in polynomial time to the size of the input.
-    """
-    index = 0
-    new_word = ""
-    token_list = []
-    letter = page_text[index]
-    while index < len(page_text):
-        val = ord(letter.lower())
-        if letter.isalnum() and (97 <= val <= 122 or 48 <= val <= 57):
-            new_word += letter.lower()
-        else:
-            if new_word != "":
-                token_list.append(new_word)
-            new_word = ""
-        letter = page_text[index]
-        index += 1
-    if new_word != "":
-        token_list.append(new_word)
-    return token_list
-
-def scraper(url, resp, robot_permissions_dict):
-    links = extract_next_links(url, resp, robot_permissions_dict)
-    return [link for link in links if is_valid(link, robot_permissions_dict)]
-
-def extract_next_links(url, resp, robot_permissions_dict):
+# a webpage is considered 'similar' if it's fingerprint has a ~95% match
+FINGER_THRESHOLD = int(FINGERPRINT_SIZE * 0.95) # 256 * 0.95 = 243.2 = 243
+# fingerprinter computes the simhash of a page's tokens and caches the hash of every token it has seen
+fingerprinter = SimhashFingerprinter(FINGERPRINT_SIZE)
+# simhash_index holds the fingerprints of every page we kept, packed as ints and indexed by band
+simhash_index = SimhashIndex(FINGERPRINT_SIZE, FINGERPRINT_SIZE - FINGER_THRESHOLD)
+
+# checkpointer saves stats and simhash_index next to the frontier's save file, see utils/checkpoint.py
+checkpointer = None
+# trap_detector learns the url patterns that are crawler traps (TRAPDETECTION in config.ini), see utils/trap_detector.py
+trap_detector = None
+# page_cache keeps the analysis of every parsed page across crawls (PAGECACHE in config.ini), see utils/page_cache.py
+page_cache = None
+
+def configure(config, restart=False):
+    # Called once at startup: compiles the is_valid rules from the [CRAWLER] section of config.ini
+    # and loads the exact duplicate digests, the stats and the fingerprints saved next to the
+    # frontier's save file (a restart deletes them instead)
+    global url_filter, checkpointer, trap_detector, page_cache
+    url_filter = UrlFilter.from_config(config)
+    trap_detector = TrapDetector.from_config(config) if config.trap_detection else None
+    # the page cache is kept on restart, that is what makes a recrawl cheap
+    page_cache = PageCache(config.page_cache) if config.page_cache else None
+    stats.set_word_capacity(config.word_capacity, config.word_sketch_width)
+    exact_index.open(f"{config.save_file}.digests", restart)
+    checkpointer = Checkpointer(config.save_file, stats, simhash_index, exact_index, config.checkpoint_interval)
+    checkpointer.open(restart)
+
+def recording():
+    # with scraper.recording(): around everything a worker records for one page, so the checkpoints
+    # only ever save whole pages (see utils/checkpoint.py)
+    return checkpointer.recording() if checkpointer is not None else nullcontext()
+
+def close():
+    # Writes out what is still buffered, called when the crawl ends
+    if checkpointer is not None:
+        checkpointer.close()
+    exact_index.close()
+    if trap_detector is not None:
+        trap_detector.write_report()
+    if page_cache is not None:
+        page_cache.close()
+
+# What analyze_page finds on a page: its links (resolved and defragmented, not filtered yet),
+# word -> count, the number of words, the simhash fingerprint and the digest of its text
+PageAnalysis = namedtuple("PageAnalysis", ["links", "word_counts", "word_count", "fingerprint", "text_digest"])
+
+def scraper(url, resp, robots=None, analyze=None):
+    # robots is the crawler's utils.robots.RobotsCache
+    # analyze runs analyze_page somewhere else (the crawler's parse processes), by default it runs here
+    # extract_next_links only returns links that passed is_valid
+    return extract_next_links(url, resp, robots, analyze)
+
+def extract_next_links(url, resp, robots=None, analyze=None):
     # Implementation required.
     # url: the URL that was used to get the page
     # resp.url: the actual url of the page
@@ -73,197 +89,126 @@ def extract_next_links(url, resp, robot_permissions_dict):
     #         resp.raw_response.content: the content of the page!
     # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
     #
-    # Global declarations to access our global variables for the report. Potentially look into better ways to store data
-    global running_dict
-    global max_word_count
-    global sub_domain_dict
-    global unique_list
-    global max_word_url
-    global similarCount
-
     # Return if resp.status is 204 (No Content) or >= 400 (Bad Request)
     if resp.status == 204 or resp.status >= 400:
+        # an empty page or a missing one is a low value page of its url's pattern
+        if trap_detector is not None and resp.status < 500:
+            trap_detector.record(url, list(), True)
         return list()
 
-    # Downloads webpage with BeautifulSoup
-    try: 
-        soup = BeautifulSoup(resp.raw_response.content, "lxml")
-    except:
-        soup = BeautifulSoup(resp.raw_response.content, "utf-8")
-    retList = []
+    # Skips pages whose bytes are exactly the same as a page we have seen before, before parsing them
+    # (their links were already added when we saw that page)
+    content = resp.raw_response.content
+    if not content:
+        return list()
+    digest = content_digest(content)
+    if exact_index.seen_raw_digest(digest):
+        stats.add_duplicate(url)
+        if trap_detector is not None:
+            trap_detector.record(url, list(), True)
+        return list()
 
+    # A page whose bytes did not change since an earlier crawl cached it is not parsed again
+    analysis = None
+    if page_cache is not None:
+        with metrics.timer("page cache"):
+            cached = page_cache.get(url, digest)
+        if cached is not None:
+            analysis = PageAnalysis(*cached)
+            metrics.count("cached pages")
+
+    # The CPU heavy part (parsing, tokenizing, fingerprinting) has no shared state,
+    # so it can run in another process
+    if analysis is None:
+        analysis = (analyze or analyze_page)(url, getattr(resp.raw_response, "url", None) or url, content)
+        if page_cache is not None:
+            page_cache.put(url, digest, resp.raw_response.headers, tuple(analysis))
+    return record_page(url, analysis, robots)
+
+def analyze_page(url, base_url, content):
+    # Parses the webpage once, page holds its visible text, links and metadata
+    # (the stage timings go to utils.metrics, they are only seen when pages are parsed in the crawler's process)
+    with metrics.timer("parse"):
+        page = parse_page(base_url, content)
     # Tokenize content of current webpage
-    # All words stored in list, non-unique
-    # Will be repeating words in list
-    word_list = []
-    if len(soup.get_text()) != 0:
-        word_list = tokenize(soup.get_text())
+    # word_counts maps every word on the page to the number of times it appears,
+    # the tokens are streamed into it so the full word list is never built
+    with metrics.timer("tokenize"):
+        word_counts = page.word_counts
+    with metrics.timer("fingerprint"):
+        fingerprint = fingerprinter.fingerprint(word_counts)
+    return PageAnalysis(page.links, word_counts, page.word_count, fingerprint, text_digest(page.text))
+
+def record_page(url, analysis, robots=None):
+    # Updates the dedup indexes and the stats with an analyzed page, returns its valid links
+    # Checks number of words on webpage, stats keeps the longest one
+    stats.add_word_count(url, analysis.word_count)
 
     # Gets links from current webpage as listed in HTML
-    links = soup.find_all('a')
-    for link in links:
-        link = link.get('href')
-        # href is most of the time the suffix of a link ex. "/index.html"
-        # we check if href does not return a full link and if it does not, we append the href
-        # to the current url
-        if not link == None:
-            # Defragments the url
-            split_link = link.split('#')
-            add_url = split_link[0]
-            if is_valid(add_url, robot_permissions_dict):
-                retList.append(add_url)
-                # if we have not encountered this page before we will add it to the unique list
-                if add_url not in unique_list:
-                    unique_list.append(add_url)
-
-                # Checks number of words on webpage
-                # If number of words greater than max, update max
-                if len(word_list) > max_word_count:
-                    max_word_count = len(word_list)
-                    max_word_url = url
-
-    if isNearSimilarity(word_list) or isExactSimilarity(url, soup.get_text()):
-        similarCount += 1
+    # page.links are already resolved against the page's url (so "/index.html" becomes a full link)
+    # and defragmented, url_filter checks all of them with is_valid in one call.
+    # The frontier checks whether we have encountered each page before,
+    # stats gets the number of unique pages from the frontier's seen urls
+    with metrics.timer("is_valid"):
+        retList = url_filter.filter(analysis.links, robots)
+
+    # a page is near similar if its fingerprint is within the threshold of one we kept (see isNearSimilarity)
+    # and exactly similar if the digest of its text was seen before (see isExactSimilarity)
+    duplicate = simhash_index.find_or_add(analysis.fingerprint, url) is not None or exact_index.seen_text_digest(analysis.text_digest)
+
+    # the trap detector learns from the page and drops the links to patterns it found to be traps
+    if trap_detector is not None:
+        with metrics.timer("traps"):
+            retList = trap_detector.record(url, retList, duplicate or analysis.word_count < trap_detector.min_words)
+
+    if duplicate:
+        stats.add_duplicate(url)
         # print(f'current url [{url}] is similar or exact to another, not adding to frontier...')
         return retList # we don't use the url in the stats, but we get all its outgoing links
 
-    # Checks that the current url is a subdomain of ics.uci.edu
-    # If it is, make an entry in the sub_domain_dict and add this current url
-    parsed = urlparse(url)
-    if ".ics.uci.edu" in parsed.hostname:
-        subdomain = parsed.hostname.split(".")[0]
-        fullsubdomain = "https://" + parsed.hostname
-        if fullsubdomain in sub_domain_dict:
-            sub_domain_dict[fullsubdomain] += 1
-        else:
-            sub_domain_dict[fullsubdomain] = 1
-
-    # Checks each word in word_list
-    # Updates running_dict
-    for word in word_list:
-        if word not in stopwords_set:
-            if word in running_dict:
-                running_dict[word] += 1
-            else:
-                running_dict[word] = 1
+    # Counts the page for its subdomain (if it is a subdomain of ics.uci.edu)
+    # and adds the words that are not stopwords (bundled in utils/stopwords.py) to the word frequencies
+    stopwords_set = get_stopwords()
+    stats.add_page(url, {word: count for word, count in analysis.word_counts.items() if word not in stopwords_set})
 
     return retList
 
 
-def is_valid(url, robot_permissions_dict):
+def is_valid(url, robots=None):
     # Decide whether to crawl this url or not. 
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-    try:
-        parsed = urlparse(url)
-        # check if url contains "pdf"
-        for extension in {"pdf", ".zip", ".gz", ".css", ".ps", ".ppt", ".js", ".bib", ".ppsx", ".txt", ".r"}:
-            if extension in url:
-                return False
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-        # Gets the ending of the url
-        # filtered_hostname is everything to the right of the first "."
-        if parsed.hostname == None or '.' not in parsed.hostname:
-            return False
-        else:
-            filtered_hostname = parsed.hostname.split('.', 1)[1]
-        if filtered_hostname not in set(["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]):
-            return False
-        if robot_permissions_dict[filtered_hostname].can_fetch('*', url) == False:
-            return False
-        if parsed.query is not None:
-            # Gets rid of "share=" urls, Gets rid of "action=" urls (ex. login, forgot password, etc..)
-            if ("share=" in parsed.query) or ("action=" in parsed.query):
-                return False
-        # Gets rid of calendar event paths by checking path
-        if "event" in parsed.path:
-            return False
-
-        # Deal with page traps for example .../page/200 we handle this by setting max page # as 5
-        if "/page/" in parsed.path:
-            splitparse = parsed.path.split("/")[-2:]
-            if splitparse[1] == "":
-                pagenum = int(splitparse[0])
-            else:
-                pagenum = int(splitparse[1])
-            if pagenum <= 5:
-                return False
+    # The rules (allowed domains, non-webpage extensions and the trap rules for page numbers,
+    # query keys and calendar paths) are compiled once in url_filter, see utils/url_filter.py
+    # Also checks the cached robots.txt of the url's host (robots is not available when the frontier
+    # reloads its save file, hosts whose robots.txt was not fetched yet are checked by the worker)
+    return url_filter.is_valid(url, robots)
 
-        return not re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower())
 
-    except TypeError:
-        # if parsed is not None:
-        print("TypeError for ", parsed)
-        raise
+def is_trap(url):
+    # Why url is a crawler trap according to what the trap detector learned so far, None if it is not
+    # (the workers check the urls that were queued before their pattern was blocked)
+    return trap_detector.check(url) if trap_detector is not None else None
 
 
 def isExactSimilarity(url, page_text: str):
-    #with checksum
-    checksum = 0
-    page_bytes = page_text.encode('utf-8')
-    for byte in page_bytes:
-        checksum += byte
-    if checksum in checksum_dict:
-        return True #there is an exact similarity
-    checksum_dict[checksum] = url
-    return False
+    # with a 128-bit blake2b digest of the page's text (whitespace-normalized)
+    # returns True if there is an exact similarity, otherwise the page's digest is remembered
+    return exact_index.seen_text(page_text)
     
     
 def getFingerprint(tokens):
-    global FINGERPRINT_SIZE
     # Simhash fingerprint generation
-    token_dict = defaultdict(int)  # words with weights
-    token_binH = defaultdict(str)
-    for token in tokens:
-        token_dict[token] += 1
-    for token in token_dict.keys():
-        # Hash tokens using SHA-256
-        hash_value = hashlib.sha256(token.encode('utf-8')).hexdigest() 
-        # Convert hash values [hexadecimal] to binary representation
-        binH = bin(int(hash_value, 16))[2:][:FINGERPRINT_SIZE].zfill(256)
-        token_binH[token] = binH
-    # Initialize fingerprint as a list of zeros
-    fingerprint = ['0'] * FINGERPRINT_SIZE  # Using FINGERPRINT_SIZE bits
-    fingerprint_dict = {i: 0 for i in range(FINGERPRINT_SIZE)}
-    for i in range(FINGERPRINT_SIZE):
-        sign = 0
-        for token in token_dict.keys():
-            if token_binH[token][i] == '1':
-                sign = 1
-            elif token_binH[token][i] == '0':
-                sign = -1
-            # fingerprint[i] = str(int(fingerprint[i]) + (sign * token_dict[token]))
-            fingerprint_dict[i] += sign * token_dict[token]
-    
-    for i in range(FINGERPRINT_SIZE):
-        fingerprint[i] = '1' if fingerprint_dict[i] > 0 else '0'
-
-    return ''.join(fingerprint)
+    # Every token is weighted by its count and hashed with SHA-256 (cached across pages), bit i of the
+    # fingerprint is '1' if the weighted votes of the tokens whose hash has bit i set outweigh the rest.
+    # Returns the fingerprint as a string of FINGERPRINT_SIZE '0'/'1' characters
+    return fingerprinter.fingerprint_str(tokens)
 
 
 
-def isNearSimilarity(tokens):
-    # a webpage is considered 'similar' if it's tokens have a ~95% match
-    global FINGERPRINT_SIZE
-    FINGER_THRESHOLD = int(FINGERPRINT_SIZE * 0.95) # 256 * 0.95 = 243.2 = 243
-    fingerprint = getFingerprint(tokens)
-    for finger in simhash_set:
-        # Reset finger similarity for each new fingerprint comparison
-        finger_similarity = 0
-        for i in range(len(finger)):
-            if finger[i] == fingerprint[i]:
-                finger_similarity += 1
-            if finger_similarity >= FINGER_THRESHOLD:
-                return True
-    # if not a similar fingerprint, add it to our [simhash_set]
-    simhash_set.add(fingerprint)
-    return False
\ No newline at end of file
+def isNearSimilarity(tokens, url=None):
+    # tokens can be the list of words or a mapping of word -> count
+    # a webpage is considered 'similar' if it's tokens have a ~95% match,
+    # i.e. at most FINGERPRINT_SIZE - FINGER_THRESHOLD bits differ from a page we already kept
+    fingerprint = fingerprinter.fingerprint(tokens)
+    # if not a similar fingerprint, find_or_add stores it in our [simhash_index]
+    return simhash_index.find_or_add(fingerprint, url) is not None
\ No newline at end of file
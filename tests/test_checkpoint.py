@@ -0,0 +1,51 @@
+from collections import Counter
+
+from utils.checkpoint import Checkpointer
+from utils.simhash import SimhashIndex
+from utils.stats import CrawlStats
+
+PAGES = [(f"https://lab{i % 3}.ics.uci.edu/p{i}", Counter({f"w{i % 7}": i + 1, "common": 1})) for i in range(30)]
+
+
+def record(stats, pages):
+    for url, counts in pages:
+        stats.add_page(url, counts)
+        stats.add_word_count(url, sum(counts.values()))
+        stats.flush()
+
+
+def test_incremental_checkpoints_add_up(tmp_path):
+    save_file = str(tmp_path / "frontier.db")
+    stats = CrawlStats()
+    checkpointer = Checkpointer(save_file, stats, SimhashIndex(64, 3), interval=3600)
+    checkpointer.open(restart=True)
+    try:
+        for start in range(0, len(PAGES), 5):
+            record(stats, PAGES[start:start + 5])
+            checkpointer.checkpoint()
+    finally:
+        checkpointer.close()
+    restored = CrawlStats()
+    Checkpointer(save_file, restored, SimhashIndex(64, 3)).open()
+    assert restored.state() == stats.state()
+
+
+def test_record_cut_short_is_dropped(tmp_path):
+    save_file = str(tmp_path / "frontier.db")
+    stats = CrawlStats()
+    checkpointer = Checkpointer(save_file, stats, SimhashIndex(64, 3), interval=3600)
+    checkpointer.open(restart=True)
+    record(stats, PAGES[:25])
+    checkpointer.checkpoint()
+    saved = stats.state()
+    size = (tmp_path / "frontier.db.stats").stat().st_size
+    # small enough to be appended, not compacted with the first one
+    record(stats, PAGES[25:])
+    checkpointer.close()
+    assert (tmp_path / "frontier.db.stats").stat().st_size > size
+    # a crash while the second record was written
+    with open(save_file + ".stats", "r+b") as stats_file:
+        stats_file.truncate(size + 20)
+    restored = CrawlStats()
+    Checkpointer(save_file, restored, SimhashIndex(64, 3)).open()
+    assert restored.state() == saved
@@ -0,0 +1,35 @@
+import threading
+from multiprocessing.connection import Client
+from types import SimpleNamespace
+
+import pytest
+
+from crawler.distributed import Coordinator
+
+AUTHKEY = b"test"
+
+
+def test_accept_rejects_bad_hello():
+    coordinator = Coordinator(SimpleNamespace(partitions=2, coordinator="127.0.0.1:0"), AUTHKEY)
+    accepting = threading.Thread(target=coordinator.accept)
+    accepting.start()
+    connections = list()
+    try:
+        for message in [("hello", 5), "hello", ("hello", "0"), ("hello", 0), ("hello", 0), ("hello", 1)]:
+            connection = Client(coordinator.address, authkey=AUTHKEY)
+            connection.send(message)
+            connections.append(connection)
+        accepting.join(10)
+        assert not accepting.is_alive()
+        # only the first hello of each partition in range joined
+        assert sorted(coordinator.connections) == [0, 1]
+        for rejected in connections[:3] + connections[4:5]:
+            assert rejected.poll(5)
+            with pytest.raises(EOFError):
+                rejected.recv()
+    finally:
+        for connection in connections:
+            connection.close()
+        for connection in coordinator.connections.values():
+            connection.close()
+        coordinator.listener.close()
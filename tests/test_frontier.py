@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from crawler.frontier import Frontier
+
+HOSTS = 5
+PAGES = 400
+
+
+def make_config(tmp_path, shards):
+    return SimpleNamespace(
+        save_file=str(tmp_path / "frontier.db"), frontier_store="sqlite", sync_interval=0.05, time_delay=0,
+        url_seen="set", queue_window=0, queue_order="lifo", max_time_delay=0, host_concurrency=1,
+        frontier_shards=shards, seed_urls=["https://host0.ics.uci.edu/page0"])
+
+
+def page_links(url):
+    page = int(url.rsplit("page", 1)[1])
+    targets = [(page * 7 + i * 13) % PAGES for i in range(10)] + [(page + 1) % PAGES]
+    return [f"https://host{target % HOSTS}.ics.uci.edu/page{target}" for target in targets]
+
+
+@pytest.mark.parametrize("shards", [1, 16])
+def test_concurrent_add_urls_and_get(tmp_path, shards):
+    frontier = Frontier(make_config(tmp_path, shards), True)
+    downloads = Counter()
+    # host -> downloads in flight, never above host_concurrency
+    in_flight = Counter()
+    overlaps = list()
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            url = frontier.get_tbd_url()
+            if url is None:
+                return
+            host = url.split("/")[2]
+            with lock:
+                first = url not in downloads
+                downloads[url] += 1
+                in_flight[host] += 1
+                if in_flight[host] > 1:
+                    overlaps.append(url)
+            time.sleep(0.0005)
+            with lock:
+                in_flight[host] -= 1
+            frontier.release_host(url)
+            if first:
+                # like the first url of a host fetching robots.txt: put back, handed out again later
+                frontier.requeue_url(url)
+                continue
+            frontier.add_urls(page_links(url))
+            frontier.mark_url_complete(url)
+
+    threads = [threading.Thread(target=work) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    try:
+        assert not any(thread.is_alive() for thread in threads)
+        assert not overlaps
+        # every page was found, handed out once, requeued once and completed
+        assert len(frontier.seen) == PAGES
+        assert set(downloads.values()) == {2}
+        assert frontier.save.count_incomplete() == 0
+        assert frontier.to_be_downloaded.idle()
+    finally:
+        frontier.close()
+
+
+def test_requeued_url_taken_by_another_worker_stays_in_progress(tmp_path, monkeypatch):
+    frontier = Frontier(make_config(tmp_path, 1), True)
+    scheduler = frontier.to_be_downloaded
+    url = frontier.get_tbd_url()
+    frontier.release_host(url)
+    taken = list()
+    put_many = scheduler.put_many
+
+    def put_then_race(urls):
+        # another worker asks for a url right after the requeued one is queued again
+        put_many(urls)
+        other = threading.Thread(target=lambda: taken.append(scheduler.get()))
+        other.start()
+        other.join(0.2)
+        threads.append(other)
+
+    threads = list()
+    monkeypatch.setattr(scheduler, "put_many", put_then_race)
+    frontier.requeue_url(url)
+    threads[0].join(5)
+    try:
+        # the other worker's download of it is still in progress and holds the host
+        assert taken == [url]
+        assert url in scheduler.in_progress and url in scheduler.holding
+        assert not scheduler.idle()
+    finally:
+        frontier.close()
@@ -0,0 +1,14 @@
+from utils.html_extract import parse_page
+
+
+def test_malformed_href_only_drops_its_link():
+    page = parse_page("https://www.ics.uci.edu/a/", b"""<html><body>
+        <a href="http://[::1">broken</a> <a href="b.html#top">b</a> <a href="/c">c</a>
+        </body></html>""")
+    assert page.links == ["https://www.ics.uci.edu/a/b.html", "https://www.ics.uci.edu/c"]
+
+
+def test_malformed_base_is_ignored():
+    page = parse_page("https://www.ics.uci.edu/a/", b"""<html><head><base href="http://[::1"></head>
+        <body><a href="b.html">b</a></body></html>""")
+    assert page.links == ["https://www.ics.uci.edu/a/b.html"]
@@ -0,0 +1,16 @@
+from utils.metrics import prometheus_text
+
+
+def test_label_values_are_escaped():
+    snapshot = {
+        "pages_per_second": 1.5,
+        "counters": {'odd "event"\nname\\': 2},
+        "stages": {},
+        "locks": {"frontier store": {"contended": 1, "wait_seconds": 0.5}},
+        "gauges": {"host delay": {'bad"host\n': 3.0}, "queue-depth": 4},
+    }
+    lines = prometheus_text(snapshot).splitlines()
+    assert 'crawler_events_total{event="odd \\"event\\"\\nname\\\\"} 2' in lines
+    assert 'crawler_host_delay{key="bad\\"host\\n"} 3.0' in lines
+    assert "crawler_queue_depth 4" in lines
+    assert 'crawler_lock_wait_seconds{lock="frontier store"} 0.5' in lines
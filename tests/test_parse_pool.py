@@ -0,0 +1,23 @@
+import scraper
+from crawler.parse_pool import ParsePool, SHARED_MEMORY_SIZE
+from utils.html_extract import parse_page
+
+URL = "https://www.ics.uci.edu/"
+PAGE = ("<html><body>" + "".join(
+    f"<p>Research in machine learning, page {i} <a href='/p{i}'>link</a></p>" for i in range(3000)) +
+    "</body></html>").encode("utf-8")
+
+
+def test_memoryview_parses_like_bytes():
+    from_view = parse_page(URL, memoryview(PAGE))
+    from_bytes = parse_page(URL, PAGE)
+    assert from_view.links == from_bytes.links and from_view.text == from_bytes.text
+
+
+def test_shared_memory_page_matches_local_analysis():
+    assert len(PAGE) >= SHARED_MEMORY_SIZE
+    pool = ParsePool(1)
+    try:
+        assert pool.analyze_page(URL, URL, PAGE) == scraper.analyze_page(URL, URL, PAGE)
+    finally:
+        pool.close()
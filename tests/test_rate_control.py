@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+
+from crawler.rate_control import HEALTHY_STREAK, MIN_BACKOFF, RateControl, retry_after
+
+HOST = "www.ics.uci.edu"
+
+
+@pytest.mark.parametrize("status", [None, 429, 500, 503, 600, 606])
+def test_backoff_doubles_up_to_the_ceiling(status):
+    rate = RateControl(0.5, 3, max_concurrency=4)
+    delays = list()
+    for _ in range(4):
+        rate.record(HOST, 0.1, status)
+        delays.append(rate.delay(HOST))
+    assert delays == [1, 2, 3, 3]
+    # only the backoffs that raised the delay count
+    assert rate.backoffs == 3
+
+
+def test_backoff_from_a_zero_floor_and_retry_after():
+    rate = RateControl(0, 60)
+    rate.record(HOST, 0.1, 503)
+    assert rate.delay(HOST) == MIN_BACKOFF
+    rate.record(HOST, 0.1, 429, retry=30)
+    assert rate.delay(HOST) == 30
+    rate.record(HOST, 0.1, 429, retry=120)
+    assert rate.delay(HOST) == 60
+
+
+def test_delay_decays_back_to_the_floor():
+    rate = RateControl(0.5, 8)
+    rate.record(HOST, 0.1, 500)
+    rate.record(HOST, 0.1, 500)
+    assert rate.delay(HOST) == 2
+    delays = list()
+    for _ in range(3):
+        rate.record(HOST, 0.1, 200)
+        delays.append(rate.delay(HOST))
+    # half of the way to the floor per healthy response
+    assert delays == [1.25, 0.875, 0.6875]
+    for _ in range(20):
+        rate.record(HOST, 0.1, 200)
+    assert rate.delay(HOST) == 0.5
+    assert rate.delays() == {}
+
+
+def test_slower_host_gets_a_longer_delay():
+    rate = RateControl(0.5, 8)
+    for _ in range(5):
+        rate.record(HOST, 0.1, 200)
+    rate.record(HOST, 1.0, 200)
+    # smoothed latency 0.37 over a usual 0.1 that drifted 1% of the way up to it
+    assert rate.delay(HOST) == pytest.approx(0.5 * 0.37 / (0.1 + 0.01 * 0.27))
+    assert rate.delays() == {HOST: rate.delay(HOST)}
+
+
+def test_concurrency_grows_when_healthy_and_drops_on_backoff():
+    rate = RateControl(0.5, 8, max_concurrency=3)
+    for _ in range(3 * HEALTHY_STREAK):
+        rate.record(HOST, 0.1, 200)
+    assert rate.concurrency(HOST) == 3
+    rate.record(HOST, 0.1, 503)
+    assert rate.concurrency(HOST) == 1 and rate.delay(HOST) == 1
+
+
+def test_fixed_delay_without_a_ceiling():
+    rate = RateControl(0.5)
+    for status in [503, 200, 429, None, 200]:
+        rate.record(HOST, 2.0, status)
+        assert rate.delay(HOST) == 0.5 and rate.concurrency(HOST) == 1
+
+
+def test_crawl_delay_is_a_floor_above_the_ceiling():
+    rate = RateControl(0.5, 2)
+    rate.record(HOST, 0.1, 200, crawl_delay=5)
+    assert rate.delay(HOST) == 5
+    rate.record(HOST, 0.1, 503, crawl_delay=5)
+    assert rate.delay(HOST) == 5
+
+
+def test_retry_after_header():
+    def response(status, value):
+        return SimpleNamespace(status=status, raw_response=SimpleNamespace(headers={"Retry-After": value}))
+    assert retry_after(response(503, "120")) == 120
+    assert retry_after(response(429, " 7 ")) == 7
+    assert retry_after(response(429, "Wed, 21 Oct 2015 07:28:00 GMT")) is None
+    assert retry_after(response(500, "120")) is None
@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.robots import RobotsCache, RobotsRules
+
+ROBOTS = """
+User-agent: *
+Disallow: /private
+Allow: /private/public
+Disallow: /*.pdf$
+Disallow: /search*q=
+Allow: /page
+Disallow: /page
+
+User-agent: IR UW24 crawler
+Disallow: /only-us
+"""
+
+
+@pytest.mark.parametrize("path, allowed", [
+    ("/", True),
+    ("/private", False),
+    ("/private/notes", False),
+    # the longest matching pattern wins whatever the order of the lines
+    ("/private/public", True),
+    ("/private/public/x", True),
+    # "$" anchors the end of the path
+    ("/files/paper.pdf", False),
+    ("/files/paper.pdf?download=1", True),
+    ("/files/paper.pdfx", True),
+    # "*" matches any characters, the query is part of the path
+    ("/search?lang=en&q=crawler", False),
+    ("/search?lang=en", True),
+    # allow wins a tie between patterns of the same length
+    ("/page", True),
+])
+def test_longest_match_wildcards_and_anchors(path, allowed):
+    rules = RobotsRules(ROBOTS, "IR UW24 bot")
+    assert rules.can_fetch(f"https://www.ics.uci.edu{path}") is allowed
+
+
+def test_most_specific_user_agent_group():
+    rules = RobotsRules(ROBOTS, "IR UW24 crawler,12345678")
+    assert not rules.can_fetch("https://www.ics.uci.edu/only-us")
+    # the "*" group does not apply any more
+    assert rules.can_fetch("https://www.ics.uci.edu/private")
+
+
+def make_cache(statuses, retries=3):
+    config = SimpleNamespace(robots_ttl=3600, robots_retries=retries, robots_file="", user_agent="IR UW24 bot")
+    fetched = list()
+
+    def fetch(url, config, logger=None):
+        fetched.append(url)
+        status = statuses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        return SimpleNamespace(status=status, raw_response=SimpleNamespace(content=ROBOTS.encode("utf-8")))
+
+    return RobotsCache(config, fetch), fetched
+
+
+def test_server_errors_are_retried_then_the_file_is_cached():
+    cache, fetched = make_cache([503, 600, 200])
+    url = "https://www.ics.uci.edu/private"
+    assert cache.fetch(url) is None
+    assert not cache.is_cached(url)
+    assert cache.fetch(url) is None
+    rules = cache.fetch(url)
+    assert rules is not None and not cache.can_fetch(url)
+    assert fetched == ["https://www.ics.uci.edu/robots.txt"] * 3
+    # cached: no fourth download
+    assert cache.fetch(url) is rules and len(fetched) == 3
+
+
+def test_host_disallowed_after_retries_fail():
+    cache, fetched = make_cache([500, ConnectionError("refused"), 502], retries=3)
+    url = "https://www.ics.uci.edu/"
+    assert cache.fetch(url) is None
+    assert cache.fetch(url) is None
+    rules = cache.fetch(url)
+    assert not rules.can_fetch(url) and not cache.can_fetch("https://www.ics.uci.edu/anything")
+    # kept for the ttl, in memory only
+    assert cache.is_cached(url) and not cache.saved
+
+
+@pytest.mark.parametrize("status", [403, 404])
+def test_client_errors_allow_everything(status):
+    cache, fetched = make_cache([status])
+    assert cache.fetch("https://www.ics.uci.edu/private").rules == []
+    assert cache.can_fetch("https://www.ics.uci.edu/private")
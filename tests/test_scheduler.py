@@ -0,0 +1,20 @@
+import pytest
+
+from crawler.scheduler import HostScheduler
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 4, 10])
+def test_small_windows_hand_out_every_spilled_url(tmp_path, window):
+    scheduler = HostScheduler(0, window, str(tmp_path / "queue"), "fifo")
+    urls = [f"https://host{i % 3}.ics.uci.edu/p{i}" for i in range(25)]
+    scheduler.put_many(urls)
+    handed_out = list()
+    while True:
+        url = scheduler.get()
+        if url is None:
+            break
+        handed_out.append(url)
+        scheduler.release(url)
+        scheduler.done(url)
+    scheduler.close()
+    assert sorted(handed_out) == sorted(urls)
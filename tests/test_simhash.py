@@ -0,0 +1,59 @@
+import hashlib
+import random
+from collections import defaultdict, Counter
+
+import pytest
+
+from utils.simhash import SimhashFingerprinter, SimhashIndex, fingerprint_to_int, hamming_distance
+
+
+def old_fingerprint(tokens, size=256):
+    # scraper.getFingerprint before it used numpy: a python loop over every (bit, token) pair
+    token_dict = defaultdict(int)
+    for token in tokens:
+        token_dict[token] += 1
+    token_bin = {token: bin(int(hashlib.sha256(token.encode("utf-8")).hexdigest(), 16))[2:][:size].zfill(256)
+                 for token in token_dict}
+    fingerprint = list()
+    for i in range(size):
+        total = sum(weight if token_bin[token][i] == "1" else -weight for token, weight in token_dict.items())
+        fingerprint.append("1" if total > 0 else "0")
+    return "".join(fingerprint)
+
+
+def random_tokens(rng):
+    vocabulary = [f"word{i}" for i in range(rng.randint(1, 60))] + ["café", "naïve", ""]
+    return [rng.choice(vocabulary) for _ in range(rng.randint(1, 300))]
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_fingerprint_matches_old_implementation(seed):
+    tokens = random_tokens(random.Random(seed))
+    fingerprinter = SimhashFingerprinter()
+    expected = old_fingerprint(tokens)
+    assert fingerprinter.fingerprint_str(tokens) == expected
+    # a mapping of token -> weight is the same as the tokens repeated
+    assert fingerprinter.fingerprint(Counter(tokens)) == fingerprint_to_int(expected)
+
+
+def test_ties_and_empty_pages():
+    fingerprinter = SimhashFingerprinter()
+    assert fingerprinter.fingerprint([]) == 0
+    # two tokens with the same weight cancel out where their bits differ: those bits are 0
+    assert fingerprinter.fingerprint_str(["a", "b"]) == old_fingerprint(["a", "b"])
+
+
+def test_index_finds_fingerprints_within_max_distance():
+    rng = random.Random(0)
+    index = SimhashIndex(256, 13)
+    stored = [rng.getrandbits(256) for _ in range(200)]
+    for i, fingerprint in enumerate(stored):
+        index.add(fingerprint, f"https://www.ics.uci.edu/{i}")
+    for i, fingerprint in enumerate(stored[:50]):
+        near = fingerprint
+        for bit in rng.sample(range(256), 13):
+            near ^= 1 << bit
+        assert index.find(near) == (f"https://www.ics.uci.edu/{i}", 13)
+        far = near ^ next(1 << bit for bit in range(256) if not (near ^ fingerprint) >> bit & 1)
+        assert hamming_distance(far, fingerprint) == 14
+        assert index.find(far) is None
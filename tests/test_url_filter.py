@@ -0,0 +1,53 @@
+import pytest
+
+from utils.url_filter import UrlFilter
+
+
+@pytest.mark.parametrize("url, valid", [
+    ("https://ics.uci.edu/", True),
+    ("https://www.ics.uci.edu/", True),
+    ("https://vision.ics.uci.edu/", True),
+    ("https://a.b.c.vision.ics.uci.edu/", True),
+    ("https://WWW.Stat.UCI.edu/", True),
+    ("https://uci.edu/", False),
+    ("https://www.uci.edu/", False),
+    ("https://physics.uci.edu/", False),
+    ("https://evilics.uci.edu/", False),
+    ("https://ics.uci.edu.example.com/", False),
+    ("https://www.ics.uci.edu:8080/", True),
+    ("ftp://www.ics.uci.edu/", False),
+])
+def test_allowed_domains_and_subdomains(url, valid):
+    assert UrlFilter().is_valid(url) is valid
+
+
+@pytest.mark.parametrize("page, valid", [(0, True), (4, True), (5, True), (6, False), (50, False)])
+def test_pages_past_max_page(page, valid):
+    url_filter = UrlFilter(max_page=5)
+    assert url_filter.is_valid(f"https://www.ics.uci.edu/news/page/{page}") is valid
+    assert url_filter.is_valid(f"https://www.ics.uci.edu/news/page/{page}/") is valid
+    # only a trailing page number is a listing page
+    assert url_filter.is_valid(f"https://www.ics.uci.edu/news/page/{page}/story")
+
+
+def test_max_page_from_config():
+    url_filter = UrlFilter(max_page=0)
+    assert url_filter.is_valid("https://www.ics.uci.edu/page/0")
+    assert not url_filter.is_valid("https://www.ics.uci.edu/page/1")
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.ics.uci.edu/files/paper.PDF",
+    "https://www.ics.uci.edu/events/2024",
+    "https://www.ics.uci.edu/calendar",
+    "https://www.ics.uci.edu/doku.php?id=start&do=edit&share=twitter",
+    "https://www.ics.uci.edu/?ACTION=login",
+    "https://[::1/",
+])
+def test_rejected_urls(url):
+    assert not UrlFilter().is_valid(url)
+
+
+def test_filter_keeps_order_without_repeats():
+    urls = ["https://www.ics.uci.edu/b", "https://www.uci.edu/", "https://www.ics.uci.edu/a", "https://www.ics.uci.edu/b"]
+    assert UrlFilter().filter(urls) == ["https://www.ics.uci.edu/b", "https://www.ics.uci.edu/a"]
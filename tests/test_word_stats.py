@@ -0,0 +1,52 @@
+import random
+from collections import Counter
+
+import pytest
+
+from utils.word_stats import WordCounts
+
+
+def expected_top(counter, k):
+    return sorted(counter.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+def random_pages(rng, pages=40):
+    # few letters and small counts, so many words tie with the k-th one
+    letters = "abcdefghijklmnopqrstuvwxyz"[:rng.randint(6, 26)]
+    for _ in range(pages):
+        yield Counter({rng.choice(letters): rng.randint(1, 3) for _ in range(rng.randint(1, 8))})
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_top_words_match_sorted_counter(seed):
+    rng = random.Random(seed)
+    words = WordCounts(5)
+    counter = Counter()
+    for counts in random_pages(rng):
+        words.update(counts)
+        counter.update(counts)
+        assert words.top_words() == expected_top(counter, 5)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_bounded_top_words_without_collisions(seed):
+    # with room for every word and a sketch far wider than the vocabulary the estimates are exact
+    rng = random.Random(seed)
+    words = WordCounts(5, capacity=30, sketch_width=1 << 20)
+    counter = Counter()
+    for counts in random_pages(rng):
+        words.update(counts)
+        counter.update(counts)
+    assert words.top_words() == expected_top(counter, 5)
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_bounded_top_words_break_ties_at_capacity(seed):
+    # capacity == k: every word that ties with the lowest kept word has to win or lose by name
+    rng = random.Random(seed)
+    words = WordCounts(5, capacity=5, sketch_width=1 << 20)
+    counter = Counter()
+    for counts in random_pages(rng):
+        words.update(counts)
+        counter.update(counts)
+        assert words.top_words() == expected_top(counter, 5)
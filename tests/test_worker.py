@@ -0,0 +1,82 @@
+import os
+from configparser import ConfigParser
+
+import pytest
+
+import crawler.async_worker as async_worker_module
+import crawler.worker as worker_module
+from crawler.async_worker import AsyncWorker
+from crawler.frontier import Frontier
+from crawler.worker import Worker
+from utils.config import Config
+from utils.response import Response
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.ini")
+PAGES = [f"https://www.ics.uci.edu/p{i}" for i in range(20)]
+# every page links to the next two, so the pages after a failing one are still found
+LINKS = {url: PAGES[i + 1:i + 3] for i, url in enumerate(PAGES)}
+FAILING = {PAGES[1], PAGES[7]}
+
+
+def make_config(tmp_path, download_mode):
+    cparser = ConfigParser()
+    cparser.read(CONFIG_FILE)
+    cparser["CRAWLER"]["SEEDURL"] = PAGES[0]
+    cparser["CRAWLER"]["POLITENESS"] = "0"
+    local = cparser["LOCAL PROPERTIES"]
+    local["SAVE"] = str(tmp_path / "frontier.db")
+    local["ROBOTSFILE"] = ""
+    local["DOWNLOADMODE"] = download_mode
+    local["ASYNCTASKS"] = "4"
+    return Config(cparser)
+
+
+class FailingPages(object):
+    # a scraper that raises on the pages in FAILING, robots.txt allows everything
+    def check_robots(self, tbd_url):
+        self.frontier.release_host(tbd_url)
+        return True
+
+    def process_page(self, tbd_url, resp):
+        if tbd_url in FAILING:
+            raise RuntimeError(f"scraper failed on {tbd_url}")
+        self.frontier.add_urls(LINKS[tbd_url])
+        self.frontier.mark_url_complete(tbd_url)
+
+
+class FailingWorker(FailingPages, Worker):
+    pass
+
+
+class FailingAsyncWorker(FailingPages, AsyncWorker):
+    pass
+
+
+def ok_response(url):
+    return Response({"url": url, "status": 200})
+
+
+async def ok_response_async(url, config, session, logger=None):
+    return ok_response(url)
+
+
+@pytest.mark.parametrize("download_mode", ["threads", "async"])
+def test_failing_page_does_not_stop_the_crawl(tmp_path, monkeypatch, download_mode):
+    monkeypatch.setattr(worker_module, "download", lambda url, config, logger=None: ok_response(url))
+    monkeypatch.setattr(async_worker_module, "download", ok_response_async)
+    config = make_config(tmp_path, download_mode)
+    frontier = Frontier(config, True)
+    worker_class = FailingAsyncWorker if download_mode == "async" else FailingWorker
+    workers = [worker_class(i, config, frontier) for i in range(1 if download_mode == "async" else 4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    try:
+        # every worker saw the end of the crawl instead of waiting on the failed urls
+        assert not any(worker.is_alive() for worker in workers)
+        assert frontier.to_be_downloaded.idle()
+        assert len(frontier.seen) == len(PAGES)
+        assert frontier.save.count_incomplete() == 0
+    finally:
+        frontier.close()
@@ -33,3 +33,7 @@ def normalize(url):
     if url.endswith("/"):
         return url.rstrip("/")
     return url
+
+def get_host(url):
+    # host part of the url, used to key per host state such as politeness
+    return urlparse(url).netloc.lower()
@@ -0,0 +1,203 @@
+import json
+import os
+import pickle
+import random
+import time
+
+import cbor
+import requests
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock
+from urllib.parse import urlparse, parse_qs
+
+from utils import get_urlhash, normalize, get_host
+
+# A local stand-in for the spacetime cache server, for offline runs and benchmarks.
+#
+# It answers the same GET /?q=<url>&u=<user agent> requests as the real cache server with the
+# same cbor {"url", "status", "response": pickled requests.Response} replies, so utils.download
+# and utils.download_async work against it unchanged. Pages come from a Corpus, a directory of
+# recorded responses; urls that are not in the corpus get a 404 like a missing page would.
+# latency (plus up to jitter) seconds are added to every reply, and error_rate of the requests
+# fail with a cache server error (status 600-606) instead. host_profiles make single hosts slower
+# or overloaded: host -> (latency, error_rate) added for that host's urls, whose failures are 503s
+# from the host itself.
+
+CACHE_ERROR_STATUS = 603
+
+
+class Corpus(object):
+    ''' Recorded responses, one cbor file per url named after its urlhash, and the seed urls
+        of the crawl in corpus.json. '''
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self.seeds = list()
+        index_file = os.path.join(self.path, "corpus.json")
+        if os.path.exists(index_file):
+            with open(index_file) as index:
+                self.seeds = json.load(index)["seeds"]
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.path) if name.endswith(".cbor"))
+
+    def _file(self, url):
+        return os.path.join(self.path, get_urlhash(normalize(url)) + ".cbor")
+
+    def get(self, url):
+        ''' {"url", "status", "headers", "content"} recorded for url, or None. '''
+        try:
+            with open(self._file(url), "rb") as page:
+                return cbor.loads(page.read())
+        except FileNotFoundError:
+            return None
+
+    def put(self, url, status, content, headers=None):
+        with open(self._file(url), "wb") as page:
+            page.write(cbor.dumps({
+                "url": url, "status": status, "headers": dict(headers or {}), "content": content}))
+
+    def record(self, url, resp):
+        # saves a utils.response.Response downloaded from the real cache server
+        if resp.raw_response is not None:
+            self.put(url, resp.status, resp.raw_response.content, resp.raw_response.headers)
+
+    def set_seeds(self, seeds):
+        with self.lock:
+            self.seeds = list(seeds)
+            with open(os.path.join(self.path, "corpus.json"), "w") as index:
+                json.dump({"seeds": self.seeds}, index)
+
+
+WORDS = (
+    "research", "machine", "learning", "systems", "students", "faculty", "graph", "network",
+    "security", "data", "informatics", "course", "seminar", "lab", "the", "and", "of", "software",
+    "computing", "statistics", "vision", "theory", "algorithms", "database", "project", "award")
+
+
+def make_synthetic_corpus(path, hosts=8, pages_per_host=250, seed=0):
+    ''' Fills path with a generated site: hosts under ics.uci.edu whose pages link to each other,
+        to a few urls that are not in the corpus (404s), to traps and to near duplicate pages. '''
+    rng = random.Random(seed)
+    corpus = Corpus(path)
+    host_names = ["www.ics.uci.edu"] + [f"lab{i}.ics.uci.edu" for i in range(1, hosts)]
+    for host in host_names:
+        corpus.put(f"https://{host}/robots.txt", 200,
+                   b"User-agent: *\nDisallow: /private\n", {"Content-Type": "text/plain"})
+        for i in range(pages_per_host):
+            links = list()
+            for _ in range(rng.randint(5, 15)):
+                target = rng.choice(host_names)
+                links.append(f"https://{target}/p/{rng.randrange(pages_per_host)}")
+            links.append(f"https://{host}/missing/{rng.randrange(1000)}")
+            links.append(f"https://{host}/private/{i}")
+            links.append(f"https://{host}/blog/page/{rng.randint(1, 10)}")
+            if i % 10 == 0:
+                # same text as the page before it, with one word changed
+                rng_state = random.Random(f"{host}-{i - 1}")
+            else:
+                rng_state = random.Random(f"{host}-{i}")
+            words = [rng_state.choice(WORDS) for _ in range(rng_state.randint(50, 2000))]
+            if i % 10 == 0:
+                words[0] = "changed"
+            body = "".join(f"<a href='{link}'>link</a>\n" for link in links)
+            content = (f"<html><head><title>{host} {i}</title></head><body>"
+                       f"<p>{' '.join(words)}</p>{body}</body></html>").encode("utf-8")
+            corpus.put(f"https://{host}/p/{i}", 200, content, {"Content-Type": "text/html; charset=utf-8"})
+    corpus.set_seeds([f"https://{host_names[0]}/p/0"])
+    return corpus
+
+
+def _raw_response(url, status, content=b"", headers=None):
+    raw = requests.models.Response()
+    raw.url = url
+    raw.status_code = status
+    raw._content = content
+    raw.headers.update(headers or {})
+    return raw
+
+
+class CacheStub(object):
+    def __init__(self, corpus, latency=0, jitter=0, error_rate=0, seed=None, host="127.0.0.1", port=0,
+                 host_profiles=None):
+        self.corpus = corpus
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.host_profiles = dict(host_profiles or {})
+        self.random = random.Random(seed)
+        self.random_lock = Lock()
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self):
+        # what goes in config.cache_server
+        return self.server.server_address[:2]
+
+    def start(self):
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.address
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reply(self, url):
+        ''' The cbor body the cache server sends back for url. '''
+        host_latency, host_error_rate = self.host_profiles.get(get_host(url), (0, 0))
+        with self.random_lock:
+            self.requests += 1
+            delay = self.latency + host_latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+            overloaded = self.random.random() < host_error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            return cbor.dumps({
+                "url": url, "status": CACHE_ERROR_STATUS,
+                "error": f"Simulated cache server error for {url}."})
+        page = self.corpus.get(url)
+        if overloaded:
+            raw = _raw_response(url, 503)
+        elif page is None:
+            raw = _raw_response(url, 404)
+        else:
+            raw = _raw_response(url, page["status"], page["content"], page["headers"])
+        return cbor.dumps({"url": url, "status": raw.status_code, "response": pickle.dumps(raw)})
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are separate writes, with Nagle every reply would wait on a delayed ack
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                # the crawler hangs up in the middle of replies that are over its maximum page size
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                if "q" not in query:
+                    self.send_error(400)
+                    return
+                body = stub.reply(query["q"][0])
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
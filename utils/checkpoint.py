@@ -0,0 +1,257 @@
+import os
+import struct
+from array import array
+from collections import Counter
+from threading import Thread, Event, RLock, Condition, Lock
+
+from utils.stats import delta_state
+
+# Checkpoints of the crawl statistics and of the near duplicate index, so a crawl resumed
+# without --restart reports the same numbers as one that never stopped.
+#
+# Two files sit next to the frontier's save file:
+#   <SAVE>.stats    utils.stats.CrawlStats as records that add up: every checkpoint appends
+#                   what was counted since the previous one. A record is a header of counters,
+#                   then tables of newline-joined keys followed by their counts packed as uint64s.
+#                   Once the file doubles in size it is compacted into one record (written to a
+#                   temporary file, then renamed), whose word table is sorted by word. A record
+#                   cut short by a crash is dropped on load.
+#   <SAVE>.simhash  append-only, every checkpoint only adds the fingerprints kept since the
+#                   previous one: the fingerprint (bits / 8 bytes), the length of the url
+#                   (uint16) and the url. A record cut short by a crash is dropped on load.
+# (the exact duplicate digests are appended to <SAVE>.digests, see utils/exact_dup.py)
+# Checkpoints are taken every interval seconds by a background thread and once more on close().
+#
+# Workers record every page inside recording(). A checkpoint waits for the pages in progress and
+# only swaps out what changed since the previous one: the stats deltas, the frontier's pending
+# batch and the new digests, and the number of fingerprints. Then it lets the workers go on and
+# writes the frontier's batch (after every batch taken before it) and the digests, and only then
+# the stats and the fingerprints. So what is checkpointed is always saved in the frontier too: a
+# page the frontier will download again after a crash is never in the dedup state already (which
+# would drop its links). A crash loses the statistics of the pages recorded since the last
+# checkpoint, at most interval seconds of them.
+
+STATS_MAGIC = b"CRSTATS1"
+HEADER = struct.Struct("<8sQQQ")
+TABLE = struct.Struct("<QQ")
+URL_LENGTH = struct.Struct("<H")
+
+
+def _table(items):
+    keys = "\n".join(key for key, _ in items).encode("utf-8")
+    return TABLE.pack(len(items), len(keys)) + keys + array("Q", [count for _, count in items]).tobytes()
+
+
+def _read_table(data, offset):
+    # None if the table runs past the end of data
+    if offset + TABLE.size > len(data):
+        return None, offset
+    size, keys_length = TABLE.unpack_from(data, offset)
+    offset += TABLE.size
+    if offset + keys_length + 8 * size > len(data):
+        return None, offset
+    keys = data[offset:offset + keys_length].decode("utf-8").split("\n") if size else list()
+    offset += keys_length
+    counts = array("Q")
+    counts.frombytes(data[offset:offset + 8 * size])
+    return dict(zip(keys, counts)), offset + 8 * size
+
+
+def _record(state, sort=False):
+    longest_words, longest_url = state["longest_page"]
+    subdomains, words = state["subdomains"].items(), state["words"].items()
+    return b"".join([
+        HEADER.pack(STATS_MAGIC, state["pages"], state["duplicates"], longest_words),
+        _table([(longest_url, longest_words)]),
+        _table(sorted(subdomains) if sort else list(subdomains)),
+        _table(sorted(words) if sort else list(words))])
+
+
+def write_stats(path, state):
+    ''' Writes a CrawlStats.state() to path as one record. '''
+    temp_file = path + ".tmp"
+    with open(temp_file, "wb") as out:
+        out.write(_record(state, sort=True))
+    os.replace(temp_file, path)
+
+
+def append_stats(path, state):
+    ''' Appends a record of what was counted since the last one (see utils.stats.delta_state). '''
+    with open(path, "ab") as out:
+        out.write(_record(state))
+
+
+def read_stats(path):
+    ''' The CrawlStats.state() of the records written to path, added up. '''
+    with open(path, "rb") as stats_file:
+        data = stats_file.read()
+    pages, duplicates, longest_page = 0, 0, (0, "")
+    subdomains, words = Counter(), Counter()
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        magic, record_pages, record_duplicates, longest_words = HEADER.unpack_from(data, offset)
+        assert magic == STATS_MAGIC, f"{path} is not a crawl statistics checkpoint"
+        longest, offset = _read_table(data, offset + HEADER.size)
+        record_subdomains, offset = _read_table(data, offset) if longest is not None else (None, offset)
+        record_words, offset = _read_table(data, offset) if record_subdomains is not None else (None, offset)
+        if record_words is None:
+            break
+        pages += record_pages
+        duplicates += record_duplicates
+        if longest_words > longest_page[0]:
+            longest_page = (longest_words, next(iter(longest), ""))
+        subdomains.update(record_subdomains)
+        words.update(record_words)
+    return {
+        "pages": pages,
+        "duplicates": duplicates,
+        "longest_page": longest_page,
+        "subdomains": dict(subdomains),
+        "words": dict(words),
+    }
+
+
+class _Gate(object):
+    # any number of threads at once inside "with gate:", close() waits for them to leave and
+    # keeps new ones out until open()
+    def __init__(self):
+        self.condition = Condition(Lock())
+        self.active = 0
+        self.closed = False
+
+    def __enter__(self):
+        with self.condition:
+            while self.closed:
+                self.condition.wait()
+            self.active += 1
+
+    def __exit__(self, *args):
+        with self.condition:
+            self.active -= 1
+            if not self.active:
+                self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            while self.active:
+                self.condition.wait()
+
+    def open(self):
+        with self.condition:
+            self.closed = False
+            self.condition.notify_all()
+
+
+class Checkpointer(object):
+    def __init__(self, save_file, stats, simhash_index, exact_index=None, interval=0):
+        self.stats_file = f"{save_file}.stats"
+        self.simhash_file = f"{save_file}.simhash"
+        self.stats = stats
+        self.simhash_index = simhash_index
+        self.exact_index = exact_index
+        self.interval = interval
+        # the frontier's store, flushed at every checkpoint (set by the Crawler)
+        self.store = None
+        self.gate = _Gate()
+        self.lock = RLock()
+        # fingerprints of simhash_index already in simhash_file
+        self.saved_fingerprints = 0
+        # size of stats_file when it was last compacted into one record
+        self.compacted_size = 0
+        self.fingerprint_size = simhash_index.bits // 8
+        self._closed = Event()
+        self._thread = None
+
+    def open(self, restart=False):
+        ''' Loads the last checkpoint (or deletes it on restart) and starts the checkpoint thread. '''
+        with self.lock:
+            for path in (self.stats_file, self.simhash_file):
+                if restart and os.path.exists(path):
+                    os.remove(path)
+            if os.path.exists(self.stats_file):
+                state = read_stats(self.stats_file)
+                self.stats.restore(state)
+                # also drops a record cut short by a crash
+                write_stats(self.stats_file, state)
+                self.compacted_size = os.path.getsize(self.stats_file)
+            if os.path.exists(self.simhash_file):
+                self._load_fingerprints()
+        if self.interval > 0:
+            # the checkpoints append only what was counted since the previous one
+            self.stats.track_unsaved()
+            self._thread = Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def recording(self):
+        ''' with checkpointer.recording(): around everything a worker records for one page. '''
+        return self.gate
+
+    def checkpoint(self):
+        with self.lock:
+            self.gate.close()
+            try:
+                # the workers wait, so only swap out what changed since the last checkpoint
+                deltas = self.stats.take_unsaved()
+                # without a checkpoint thread the deltas are not kept, this is the one at the end
+                state = self.stats.state() if deltas is None else None
+                saved_fingerprints = len(self.simhash_index)
+                batch = self.store.take_pending() if self.store is not None else None
+                digests = self.exact_index.take_unsaved() if self.exact_index is not None else None
+            finally:
+                self.gate.open()
+            if batch is not None:
+                self.store.write_pending(batch)
+            if digests is not None:
+                self.exact_index.write_unsaved(digests)
+            self._write_stats(state, deltas)
+            fingerprints, urls = self.simhash_index.entries(self.saved_fingerprints, saved_fingerprints)
+            if fingerprints:
+                with open(self.simhash_file, "ab") as simhash_file:
+                    simhash_file.write(b"".join(
+                        fingerprint.to_bytes(self.fingerprint_size, "big")
+                        + URL_LENGTH.pack(len(url)) + url
+                        for fingerprint, url in zip(
+                            fingerprints, ((url or "").encode("utf-8")[:0xFFFF] for url in urls))))
+                self.saved_fingerprints += len(fingerprints)
+
+    def _write_stats(self, state, deltas):
+        if deltas is None:
+            write_stats(self.stats_file, state)
+            self.compacted_size = os.path.getsize(self.stats_file)
+            return
+        append_stats(self.stats_file, delta_state(deltas))
+        if os.path.getsize(self.stats_file) > 2 * self.compacted_size:
+            write_stats(self.stats_file, read_stats(self.stats_file))
+            self.compacted_size = os.path.getsize(self.stats_file)
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.checkpoint()
+
+    def _load_fingerprints(self):
+        with open(self.simhash_file, "rb") as simhash_file:
+            data = simhash_file.read()
+        fingerprints, urls = list(), list()
+        offset, end = 0, 0
+        while offset + self.fingerprint_size + URL_LENGTH.size <= len(data):
+            url_offset = offset + self.fingerprint_size + URL_LENGTH.size
+            url_length, = URL_LENGTH.unpack_from(data, offset + self.fingerprint_size)
+            if url_offset + url_length > len(data):
+                break
+            fingerprints.append(int.from_bytes(data[offset:offset + self.fingerprint_size], "big"))
+            urls.append(data[url_offset:url_offset + url_length].decode("utf-8", errors="replace"))
+            offset = end = url_offset + url_length
+        self.simhash_index.load(fingerprints, urls)
+        if end < len(data):
+            # a record cut short by a crash
+            with open(self.simhash_file, "r+b") as simhash_file:
+                simhash_file.truncate(end)
+        self.saved_fingerprints = len(self.simhash_index)
+
+    def _loop(self):
+        while not self._closed.wait(self.interval):
+            self.checkpoint()
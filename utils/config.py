@@ -9,11 +9,91 @@ class Config(object):
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.frontier_store = config["LOCAL PROPERTIES"].get("STORE", "shelve").strip()
+        self.sync_interval = float(config["LOCAL PROPERTIES"].get("SYNCINTERVAL", "0"))
+        # the frontier store locks the urls in FRONTIERSHARDS shards by their hash (a bloom URLSEEN keeps one lock)
+        self.frontier_shards = int(config["LOCAL PROPERTIES"].get("FRONTIERSHARDS", "1"))
+        # in seconds, how often the crawl statistics and the near duplicate index are checkpointed
+        self.checkpoint_interval = float(config["LOCAL PROPERTIES"].get("CHECKPOINTINTERVAL", "30"))
+        # set keeps 64 bits per discovered url, bloom a fixed size filter sized for BLOOMCAPACITY urls
+        self.url_seen = config["LOCAL PROPERTIES"].get("URLSEEN", "set").strip()
+        assert self.url_seen in {"set", "bloom"}, "URLSEEN should be set or bloom"
+        self.bloom_capacity = int(config["LOCAL PROPERTIES"].get("BLOOMCAPACITY", "10000000"))
+        self.bloom_error_rate = float(config["LOCAL PROPERTIES"].get("BLOOMERRORRATE", "0.001"))
+        # WORDCAPACITY > 0 keeps only that many of the most frequent words for the report, the counts
+        # of all of them go into a count-min sketch WORDSKETCHWIDTH counters wide (0 counts every word)
+        self.word_capacity = int(config["LOCAL PROPERTIES"].get("WORDCAPACITY", "0"))
+        self.word_sketch_width = int(config["LOCAL PROPERTIES"].get("WORDSKETCHWIDTH", "262144"))
+        # at most QUEUEWINDOW urls to be downloaded are kept in memory (0 keeps all of them),
+        # QUEUEORDER is lifo, fifo or depth (shallowest path first) within every host
+        self.queue_window = int(config["LOCAL PROPERTIES"].get("QUEUEWINDOW", "0"))
+        self.queue_order = config["LOCAL PROPERTIES"].get("QUEUEORDER", "lifo").strip()
+        # PARTITIONS > 1 splits the hosts over that many crawler processes, coordinated on COORDINATOR
+        # (host:port, port 0 picks a free one for local partitions), which exchange the links they
+        # find in batches of FORWARDBATCH urls, sent at least every FORWARDINTERVAL seconds
+        self.partitions = int(config["LOCAL PROPERTIES"].get("PARTITIONS", "1"))
+        self.coordinator = config["LOCAL PROPERTIES"].get("COORDINATOR", "127.0.0.1:0").strip()
+        self.forward_batch = int(config["LOCAL PROPERTIES"].get("FORWARDBATCH", "500"))
+        self.forward_interval = float(config["LOCAL PROPERTIES"].get("FORWARDINTERVAL", "1"))
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        # every host's delay adapts between POLITENESS and MAXPOLITENESS seconds to its latency and
+        # errors, a healthy host may have up to HOSTCONCURRENCY downloads in flight, still started
+        # at least POLITENESS apart
+        self.max_time_delay = float(config["CRAWLER"].get("MAXPOLITENESS", str(self.time_delay)))
+        self.host_concurrency = int(config["CRAWLER"].get("HOSTCONCURRENCY", "1"))
+        # is_valid rules: crawled domains (and their subdomains), the highest .../page/<n> to follow,
+        # query keys and path fragments that mark crawler traps
+        self.allowed_domains = [domain.strip() for domain in config["CRAWLER"].get(
+            "ALLOWEDDOMAINS", "ics.uci.edu,cs.uci.edu,informatics.uci.edu,stat.uci.edu").split(",") if domain.strip()]
+        self.max_page = int(config["CRAWLER"].get("MAXPAGE", "5"))
+        self.trap_query_keys = [key.strip() for key in config["CRAWLER"].get(
+            "TRAPQUERYKEYS", "share,action").split(",") if key.strip()]
+        self.trap_paths = [path.strip() for path in config["CRAWLER"].get(
+            "TRAPPATHS", "event,calendar").split(",") if path.strip()]
+        # TRAPDETECTION learns url patterns that are crawler traps from the pages, see utils/trap_detector.py:
+        # a pattern is blocked once at least TRAPMAXLOWVALUE of its first TRAPMINSAMPLES or more pages were
+        # duplicates, under TRAPMINWORDS words or 4xxs (half that with more than TRAPMAXURLS urls), urls deeper
+        # than TRAPMAXDEPTH segments or with a segment TRAPMAXREPEATS times are blocked right away
+        self.trap_detection = config["CRAWLER"].getboolean("TRAPDETECTION", False)
+        self.trap_min_samples = int(config["CRAWLER"].get("TRAPMINSAMPLES", "20"))
+        self.trap_max_low_value = float(config["CRAWLER"].get("TRAPMAXLOWVALUE", "0.8"))
+        self.trap_max_urls = int(config["CRAWLER"].get("TRAPMAXURLS", "1000"))
+        self.trap_min_words = int(config["CRAWLER"].get("TRAPMINWORDS", "50"))
+        self.trap_max_depth = int(config["CRAWLER"].get("TRAPMAXDEPTH", "12"))
+        self.trap_max_repeats = int(config["CRAWLER"].get("TRAPMAXREPEATS", "3"))
+        # the blocked patterns and the largest ones are written to TRAPREPORT when the crawl ends
+        self.trap_report = config["LOCAL PROPERTIES"].get("TRAPREPORT", "").strip()
+        # PAGECACHE keeps the links, word counts and fingerprint of every parsed page by url (kept on
+        # restart), a page downloaded again with the same bytes is not parsed again (empty is off)
+        self.page_cache = config["LOCAL PROPERTIES"].get("PAGECACHE", "").strip()
+        # pages larger than MAXPAGESIZE bytes are dropped while they download, pages whose Content-Type
+        # is not one of CONTENTTYPES are dropped before they are parsed
+        self.max_page_size = int(config["CRAWLER"].get("MAXPAGESIZE", "5242880"))
+        self.content_types = frozenset(content_type.strip().lower() for content_type in config["CRAWLER"].get(
+            "CONTENTTYPES", "text/html,application/xhtml+xml").split(",") if content_type.strip())
+        # robots.txt files are cached in ROBOTSFILE and downloaded again after ROBOTSTTL seconds
+        self.robots_file = config["LOCAL PROPERTIES"].get("ROBOTSFILE", "robots.json")
+        self.robots_ttl = float(config["CRAWLER"].get("ROBOTSTTL", "86400"))
+        # a robots.txt that fails is fetched ROBOTSRETRIES times before its host is disallowed
+        self.robots_retries = int(config["CRAWLER"].get("ROBOTSRETRIES", "3"))
+
+        # threads (one Worker thread per THREADCOUNT) or async (one event loop with ASYNCTASKS downloads in flight)
+        self.download_mode = config["LOCAL PROPERTIES"].get("DOWNLOADMODE", "threads").strip()
+        assert self.download_mode in {"threads", "async"}, "DOWNLOADMODE should be threads or async"
+        self.async_tasks = int(config["LOCAL PROPERTIES"].get("ASYNCTASKS", "100"))
+        # number of processes that parse pages, 0 parses them in the worker threads
+        self.parse_processes = int(config["LOCAL PROPERTIES"].get("PARSEPROCESSES", "0"))
+        # metrics are served on localhost:METRICSPORT (0 is off) and/or written to METRICSFILE every
+        # METRICSINTERVAL seconds, PROFILEINTERVAL > 0 samples every thread's stack into PROFILEFILE
+        self.metrics_port = int(config["LOCAL PROPERTIES"].get("METRICSPORT", "0"))
+        self.metrics_file = config["LOCAL PROPERTIES"].get("METRICSFILE", "").strip()
+        self.metrics_interval = float(config["LOCAL PROPERTIES"].get("METRICSINTERVAL", "10"))
+        self.profile_file = config["LOCAL PROPERTIES"].get("PROFILEFILE", "profile.folded").strip()
+        self.profile_interval = float(config["LOCAL PROPERTIES"].get("PROFILEINTERVAL", "0"))
 
         self.cache_server = None
\ No newline at end of file
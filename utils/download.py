@@ -2,20 +2,64 @@ import requests
 import cbor
 import time
 
-from utils.response import Response
+from threading import Lock
+from requests.adapters import HTTPAdapter
 
-def download(url, config, logger=None):
-    host, port = config.cache_server
-    resp = requests.get(
-        f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+from utils.response import Response, TOO_LARGE
+
+# The cache server's reply holds the page plus a pickled requests.Response around it,
+# replies are allowed this many bytes on top of config.max_page_size
+REPLY_OVERHEAD = 1 << 16
+CHUNK_SIZE = 1 << 16
+
+# One keep-alive connection pool to the cache server shared by every worker thread,
+# instead of a new TCP connection for every url.
+_session = None
+_session_lock = Lock()
+
+def get_session(config):
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(config.threads_count, 10))
+            _session.mount("http://", adapter)
+        return _session
+
+def make_response(url, status, content, logger=None):
+    # Turns the cache server's reply into a Response, shared by the threaded and the asyncio download
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+        if 200 <= status < 400 and content:
+            return Response(cbor.loads(content))
     except (EOFError, ValueError) as e:
         pass
-    logger.error(f"Spacetime Response error {resp} with url {url}.")
+    if logger:
+        logger.error(f"Spacetime Response error <{status}> with url {url}.")
     return Response({
-        "error": f"Spacetime Response error {resp} with url {url}.",
-        "status": resp.status_code,
+        "error": f"Spacetime Response error <{status}> with url {url}.",
+        "status": status,
         "url": url})
+
+def too_large(url, config, logger=None):
+    error = f"Page {url} is larger than the maximum page size of {config.max_page_size} bytes."
+    if logger:
+        logger.info(error)
+    return Response({"error": error, "status": TOO_LARGE, "url": url})
+
+def download(url, config, logger=None):
+    # The reply is streamed and dropped as soon as it is known to be larger than MAXPAGESIZE,
+    # so one huge page or binary never sits in a worker's memory
+    host, port = config.cache_server
+    limit = config.max_page_size + REPLY_OVERHEAD
+    with get_session(config).get(
+            f"http://{host}:{port}/",
+            params=[("q", f"{url}"), ("u", f"{config.user_agent}")], stream=True) as resp:
+        length = resp.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > limit:
+            return too_large(url, config, logger)
+        content = bytearray()
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            content += chunk
+            if len(content) > limit:
+                return too_large(url, config, logger)
+    return make_response(url, resp.status_code, bytes(content), logger)
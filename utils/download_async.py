@@ -0,0 +1,27 @@
+import aiohttp
+
+from utils.download import make_response, too_large, REPLY_OVERHEAD, CHUNK_SIZE
+
+# asyncio version of utils.download, used by crawler.async_worker.AsyncWorker.
+# aiohttp is only needed when the crawler runs with DOWNLOADMODE = async.
+
+def create_session(config):
+    # keep-alive pool to the cache server, one connection per download in flight
+    connector = aiohttp.TCPConnector(limit=config.async_tasks, keepalive_timeout=30)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60))
+
+async def download(url, config, session, logger=None):
+    host, port = config.cache_server
+    async with session.get(
+            f"http://{host}:{port}/",
+            params=[("q", f"{url}"), ("u", f"{config.user_agent}")]) as resp:
+        # same size limit as utils.download, checked while the reply streams in
+        limit = config.max_page_size + REPLY_OVERHEAD
+        if resp.content_length is not None and resp.content_length > limit:
+            return too_large(url, config, logger)
+        content = bytearray()
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            content += chunk
+            if len(content) > limit:
+                return too_large(url, config, logger)
+        return make_response(url, resp.status, bytes(content), logger)
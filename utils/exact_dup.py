@@ -0,0 +1,109 @@
+import os
+from hashlib import blake2b
+from threading import RLock
+
+# Exact duplicate detection.
+#
+# Pages are identified by a 128-bit blake2b digest, kept as ints in two sets: one for the raw
+# bytes of a response (checked before the page is parsed at all) and one for the
+# whitespace-normalized visible text. New digests are appended to a small binary file next to
+# the frontier's save file on flush() (the checkpoints of utils/checkpoint.py), so a resumed
+# crawl keeps its dedup state and never has digests of pages the frontier has not saved yet.
+
+DIGEST_SIZE = 16
+RAW, TEXT = b"r", b"t"
+
+
+def content_digest(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="replace")
+    return int.from_bytes(blake2b(data, digest_size=DIGEST_SIZE).digest(), "big")
+
+
+def normalize_text(text):
+    # the same words in the same order are the same page, whatever the whitespace around them
+    return " ".join(text.split())
+
+
+def text_digest(text):
+    return content_digest(normalize_text(text))
+
+
+class ExactDuplicateIndex(object):
+    def __init__(self):
+        self.lock = RLock()
+        # held while writing to digest_file, so the checks don't wait on the disk
+        self.file_lock = RLock()
+        self.raw_digests = set()
+        self.text_digests = set()
+        self.digest_file = None
+        # records not written to digest_file yet
+        self.unsaved = list()
+
+    def __len__(self):
+        return len(self.text_digests)
+
+    def open(self, path, restart=False):
+        ''' Loads the digests saved at path and appends new ones to it. '''
+        with self.lock:
+            if restart and os.path.exists(path):
+                os.remove(path)
+            if os.path.exists(path):
+                with open(path, "rb") as digest_file:
+                    data = digest_file.read()
+                record = 1 + DIGEST_SIZE
+                # a record cut short by a crash is ignored
+                for start in range(0, len(data) - record + 1, record):
+                    kind = data[start:start + 1]
+                    digest = int.from_bytes(data[start + 1:start + record], "big")
+                    (self.raw_digests if kind == RAW else self.text_digests).add(digest)
+                if len(data) % record:
+                    with open(path, "r+b") as digest_file:
+                        digest_file.truncate(len(data) - len(data) % record)
+            self.digest_file = open(path, "ab")
+
+    def close(self):
+        with self.lock, self.file_lock:
+            self.flush()
+            if self.digest_file is not None:
+                self.digest_file.close()
+                self.digest_file = None
+
+    def flush(self):
+        self.write_unsaved(self.take_unsaved())
+
+    def take_unsaved(self):
+        # the records not written yet, swapped out so a checkpoint can write them later
+        with self.lock:
+            unsaved, self.unsaved = self.unsaved, list()
+            return unsaved
+
+    def write_unsaved(self, unsaved):
+        with self.file_lock:
+            if self.digest_file is not None and unsaved:
+                self.digest_file.write(b"".join(unsaved))
+                self.digest_file.flush()
+
+    def _check(self, digests, kind, digest):
+        with self.lock:
+            if digest in digests:
+                return True
+            digests.add(digest)
+            self.unsaved.append(kind + digest.to_bytes(DIGEST_SIZE, "big"))
+            return False
+
+    def seen_raw(self, content):
+        ''' True if a response with exactly these bytes was seen before, otherwise remembers it. '''
+        return self.seen_raw_digest(content_digest(content))
+
+    def seen_raw_digest(self, digest):
+        # seen_raw for the content_digest of the bytes, computed by the caller
+        return self._check(self.raw_digests, RAW, digest)
+
+    def seen_text(self, text):
+        ''' True if a page with the same (whitespace-normalized) text was seen before, otherwise remembers it. '''
+        return self.seen_text_digest(text_digest(text))
+
+    def seen_text_digest(self, digest):
+        # seen_text for a digest computed elsewhere (e.g. in a parse process)
+        return self._check(self.text_digests, TEXT, digest)
@@ -0,0 +1,137 @@
+from urllib.parse import urljoin
+
+from lxml import etree
+
+from utils.tokenizer import count_tokens
+
+# Single pass html extraction.
+#
+# The raw page is fed to lxml's html parser in chunks with a SAX-style target, so no tree is
+# built. In that one pass we collect the visible text, the links (resolved against the page's
+# base url and defragmented) and the page metadata into a ParsedPage, which the scraper, the
+# statistics and the duplicate checks all share.
+
+FEED_SIZE = 1 << 16
+# text inside these tags is not visible
+HIDDEN_TAGS = {"script", "style", "noscript", "template", "head"}
+# tags that do not break words, text around every other tag is separated by a newline
+INLINE_TAGS = {
+    "a", "abbr", "b", "bdi", "bdo", "cite", "code", "data", "dfn", "em", "font", "i", "kbd",
+    "mark", "q", "s", "samp", "small", "span", "strong", "sub", "sup", "time", "u", "var"}
+
+
+class ParsedPage(object):
+    def __init__(self, url):
+        self.url = url
+        self.base_url = url
+        self.text = ""
+        self.links = list()
+        self.title = ""
+        self.description = ""
+        # values of <meta name="robots">, e.g. {"noindex", "nofollow"}
+        self.robots = set()
+        self._word_counts = None
+
+    @property
+    def word_counts(self):
+        # Counter of word -> occurrences in the visible text, computed once
+        if self._word_counts is None:
+            self._word_counts = count_tokens(self.text)
+        return self._word_counts
+
+    @property
+    def word_count(self):
+        return sum(self.word_counts.values())
+
+
+class _PageCollector(object):
+    # lxml parser target, gets called for every tag and piece of text
+    def __init__(self, page):
+        self.page = page
+        self.text = list()
+        self.title = list()
+        self.hrefs = list()
+        self.hidden = 0
+        self.in_title = False
+
+    def start(self, tag, attrib):
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        if tag == "a":
+            href = attrib.get("href")
+            if href:
+                self.hrefs.append(href)
+        elif tag == "base" and attrib.get("href") and self.page.base_url == self.page.url:
+            try:
+                self.page.base_url = urljoin(self.page.url, attrib["href"].strip())
+            except ValueError:
+                # a malformed base (e.g. http://[::1) is ignored, links resolve against the url
+                pass
+        elif tag == "meta":
+            name = (attrib.get("name") or "").lower()
+            if name == "description":
+                self.page.description = attrib.get("content") or ""
+            elif name == "robots":
+                self.page.robots.update(
+                    value.strip().lower() for value in (attrib.get("content") or "").split(","))
+        elif tag == "title":
+            self.in_title = True
+        if tag in HIDDEN_TAGS:
+            self.hidden += 1
+        elif tag not in INLINE_TAGS:
+            self.text.append("\n")
+
+    def end(self, tag):
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        if tag == "title":
+            self.in_title = False
+        if tag in HIDDEN_TAGS:
+            self.hidden = max(self.hidden - 1, 0)
+        elif tag not in INLINE_TAGS:
+            self.text.append("\n")
+
+    def data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        elif not self.hidden:
+            self.text.append(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        page = self.page
+        page.text = "".join(self.text)
+        page.title = "".join(self.title).strip()
+        seen = set()
+        for href in self.hrefs:
+            # resolves relative links and removes the fragment, a malformed href only loses its link
+            try:
+                link = urljoin(page.base_url, href.strip()).split("#")[0]
+            except ValueError:
+                continue
+            if link and link not in seen:
+                seen.add(link)
+                page.links.append(link)
+        return page
+
+
+def parse_page(url, content):
+    ''' Parses the raw bytes (a bytes-like object, or text) of a page once and returns a ParsedPage. '''
+    page = ParsedPage(url)
+    if not content:
+        return page
+    collector = _PageCollector(page)
+    parser = etree.HTMLParser(target=collector, remove_comments=True)
+    try:
+        for start in range(0, len(content), FEED_SIZE):
+            chunk = content[start:start + FEED_SIZE]
+            # a memoryview (a page in shared memory) is copied a chunk at a time, lxml wants bytes
+            parser.feed(bytes(chunk) if isinstance(chunk, memoryview) else chunk)
+        return parser.close()
+    except etree.LxmlError:
+        # broken markup past what libxml2 can recover, keep what was collected
+        return collector.close()
@@ -0,0 +1,279 @@
+import json
+import os
+import re
+import time
+
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock, Event, local
+
+# Crawler instrumentation: stage timers, counters, lock wait times and gauges.
+#
+# Like utils.stats, every thread records into its own local tables, so timing a stage costs two
+# perf_counter calls and a few list updates, no locking. The tables are registered once per
+# thread and only summed when a snapshot is taken (by the metrics endpoint, the snapshot file or
+# the report), so counts recorded by threads that have finished are kept.
+#
+# Stage times go in histograms with fixed, doubling buckets from 100us to ~100s, which is
+# enough to report p50/p99 and to export them as Prometheus histograms.
+
+BUCKETS = tuple(0.0001 * 2 ** i for i in range(21))
+
+
+def _percentile(counts, total, fraction):
+    # upper bound of the bucket that holds the fraction-th sample
+    rank = fraction * total
+    seen = 0
+    for bound, count in zip(BUCKETS, counts):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float("inf")
+
+
+class _Timer(object):
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+class TimedLock(object):
+    ''' A Lock or RLock that records in metrics how long threads waited to acquire it.
+        Uncontended acquires take the fast path and record nothing. '''
+    def __init__(self, metrics, name, lock):
+        self.metrics = metrics
+        self.name = name
+        self.lock = lock
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.lock.acquire(False):
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self.lock.acquire(True, timeout)
+        self.metrics.lock_wait(self.name, time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *args):
+        self.release()
+
+    def _is_owned(self):
+        # lets a Condition built on a TimedLock check ownership without acquiring it
+        if hasattr(self.lock, "_is_owned"):
+            return self.lock._is_owned()
+        return self.lock.locked()
+
+
+class Metrics(object):
+    def __init__(self):
+        self.lock = Lock()
+        self.local = local()
+        self.started = time.time()
+        # every thread's (stages, counters, lock waits) tables
+        self.tables = list()
+        # name -> function returning a number, or a dict of label -> number
+        self.gauges = dict()
+
+    def _tables(self):
+        tables = getattr(self.local, "tables", None)
+        if tables is None:
+            # stage -> [bucket counts, count, total seconds], counter -> n, lock -> [waits, seconds]
+            tables = self.local.tables = (dict(), dict(), dict())
+            with self.lock:
+                self.tables.append(tables)
+        return tables
+
+    def timer(self, stage):
+        ''' with metrics.timer("download"): ... adds the time spent in the block to stage. '''
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        stages = self._tables()[0]
+        entry = stages.get(stage)
+        if entry is None:
+            entry = stages[stage] = [[0] * (len(BUCKETS) + 1), 0, 0.0]
+        entry[0][bisect_left(BUCKETS, seconds)] += 1
+        entry[1] += 1
+        entry[2] += seconds
+
+    def count(self, name, n=1):
+        counters = self._tables()[1]
+        counters[name] = counters.get(name, 0) + n
+
+    def lock_wait(self, name, seconds):
+        waits = self._tables()[2]
+        entry = waits.get(name)
+        if entry is None:
+            entry = waits[name] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def timed_lock(self, name, lock):
+        return TimedLock(self, name, lock)
+
+    def gauge(self, name, function):
+        self.gauges[name] = function
+
+    def snapshot(self):
+        ''' Everything recorded so far, summed over all the threads. '''
+        stages, counters, locks = dict(), dict(), dict()
+        with self.lock:
+            tables = list(self.tables)
+        for thread_stages, thread_counters, thread_locks in tables:
+            # copies, the owning thread may add entries while we read
+            for stage, (buckets, count, total) in list(thread_stages.items()):
+                entry = stages.setdefault(stage, [[0] * (len(BUCKETS) + 1), 0, 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+                entry[1] += count
+                entry[2] += total
+            for name, n in list(thread_counters.items()):
+                counters[name] = counters.get(name, 0) + n
+            for name, (waits, seconds) in list(thread_locks.items()):
+                entry = locks.setdefault(name, [0, 0.0])
+                entry[0] += waits
+                entry[1] += seconds
+        gauges = dict()
+        for name, function in list(self.gauges.items()):
+            try:
+                gauges[name] = function()
+            except Exception:
+                gauges[name] = None
+        elapsed = time.time() - self.started
+        return {
+            "elapsed": elapsed,
+            "pages_per_second": counters.get("pages", 0) / elapsed if elapsed > 0 else 0.0,
+            "counters": counters,
+            "stages": {
+                stage: {"count": count, "seconds": total, "buckets": buckets,
+                        "p50": _percentile(buckets, count, 0.5), "p99": _percentile(buckets, count, 0.99)}
+                for stage, (buckets, count, total) in stages.items()},
+            "locks": {name: {"contended": waits, "wait_seconds": seconds} for name, (waits, seconds) in locks.items()},
+            "gauges": gauges,
+        }
+
+
+def _label(value):
+    # a label value as the exposition format wants it, backslashes, quotes and newlines escaped
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(snapshot):
+    ''' A snapshot in the Prometheus text exposition format. '''
+    lines = [
+        "# TYPE crawler_pages_per_second gauge",
+        f"crawler_pages_per_second {snapshot['pages_per_second']}",
+        "# TYPE crawler_events_total counter"]
+    for name, n in sorted(snapshot["counters"].items()):
+        lines.append(f'crawler_events_total{{event="{_label(name)}"}} {n}')
+    lines.append("# TYPE crawler_stage_seconds histogram")
+    for stage, entry in sorted(snapshot["stages"].items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), entry["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'crawler_stage_seconds_bucket{{stage="{_label(stage)}",le="{le}"}} {cumulative}')
+        lines.append(f'crawler_stage_seconds_sum{{stage="{_label(stage)}"}} {entry["seconds"]}')
+        lines.append(f'crawler_stage_seconds_count{{stage="{_label(stage)}"}} {entry["count"]}')
+    lines.append("# TYPE crawler_lock_wait_seconds counter")
+    for name, entry in sorted(snapshot["locks"].items()):
+        lines.append(f'crawler_lock_wait_seconds{{lock="{_label(name)}"}} {entry["wait_seconds"]}')
+        lines.append(f'crawler_lock_contended_total{{lock="{_label(name)}"}} {entry["contended"]}')
+    for name, value in sorted(snapshot["gauges"].items()):
+        # metric names only allow letters, digits and underscores
+        metric = "crawler_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+        lines.append(f"# TYPE {metric} gauge")
+        if isinstance(value, dict):
+            for label, n in sorted(value.items()):
+                lines.append(f'{metric}{{key="{_label(label)}"}} {n}')
+        elif value is not None:
+            lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer(object):
+    ''' Serves /metrics (Prometheus) and /metrics.json on localhost. '''
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        self.metrics = metrics
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body, content_type = prometheus_text(metrics.snapshot()).encode(), "text/plain; version=0.0.4"
+                elif path == "/metrics.json":
+                    body, content_type = json.dumps(metrics.snapshot()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class SnapshotWriter(object):
+    ''' Writes a json snapshot to path every interval seconds, and a last one on stop(). '''
+    def __init__(self, metrics, path, interval):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stopped = Event()
+        self.thread = Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self.thread.join()
+        self.write()
+
+    def write(self):
+        temp_file = self.path + ".tmp"
+        with open(temp_file, "w") as snapshot_file:
+            json.dump(self.metrics.snapshot(), snapshot_file)
+        os.replace(temp_file, self.path)
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+
+# the crawler's metrics, shared by every module like scraper.stats
+metrics = Metrics()
@@ -0,0 +1,99 @@
+import pickle
+import sqlite3
+import time
+import zlib
+from threading import RLock
+
+from utils.exact_dup import DIGEST_SIZE
+from utils.metrics import metrics
+
+# Content cache of the pages parsed by earlier crawls, so a recrawl (launch.py --restart) only
+# parses the pages that changed.
+#
+# Every parsed page is kept by url in an SQLite file that --restart leaves alone: the digest of
+# its raw bytes (the one the raw duplicate check computes anyway, see utils/exact_dup.py), its
+# ETag and Last-Modified headers when it had them, and what scraper.analyze_page found on it
+# (links, word counts, number of words, fingerprint, text digest), pickled and compressed.
+# When a url is downloaded again with the same digest the cached analysis is used instead of
+# parsing, tokenizing and fingerprinting the page; it then goes through the dedup indexes, the
+# stats and the trap detector like a parsed page, so the report is the same. The cache server
+# does not pass conditional requests on, so every page is still downloaded, the validators are
+# only kept with the page. New entries are written in batches of batch_size, one transaction each.
+
+
+class PageCache(object):
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = metrics.timed_lock("page cache", RLock())
+        self.write_lock = RLock()
+        # url -> row, entries that are not on disk yet
+        self.pending = dict()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, digest BLOB NOT NULL, etag TEXT, last_modified TEXT, "
+            "fetched REAL NOT NULL, analysis BLOB NOT NULL)")
+
+    def __len__(self):
+        self.flush()
+        with self.write_lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def get(self, url, digest):
+        ''' The cached analysis of url if it was cached with this digest of its bytes, else None. '''
+        key = digest.to_bytes(DIGEST_SIZE, "big")
+        with self.lock:
+            row = self.pending.get(url)
+        if row is None:
+            with self.write_lock:
+                row = self.conn.execute("SELECT digest, analysis FROM pages WHERE url = ?", (url,)).fetchone()
+        else:
+            row = (row[0], row[4])
+        analysis = None
+        if row is not None and row[0] == key:
+            try:
+                analysis = pickle.loads(zlib.decompress(row[1]))
+            except Exception:
+                # written by another version of the crawler, parsed again
+                analysis = None
+        with self.lock:
+            if analysis is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return analysis
+
+    def put(self, url, digest, headers, analysis):
+        ''' Caches the analysis of url, headers are its response headers (or None). '''
+        headers = headers or dict()
+        row = (digest.to_bytes(DIGEST_SIZE, "big"), headers.get("ETag"), headers.get("Last-Modified"), time.time(),
+               zlib.compress(pickle.dumps(analysis, pickle.HIGHEST_PROTOCOL), 1))
+        with self.lock:
+            self.pending[url] = row
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.write_lock:
+            with self.lock:
+                if not self.pending:
+                    return
+                batch, self.pending = self.pending, dict()
+            with metrics.timer("page cache write"):
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO pages (url, digest, etag, last_modified, fetched, analysis) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(url,) + row for url, row in batch.items()])
+                self.conn.execute("COMMIT")
+
+    def close(self):
+        self.flush()
+        with self.write_lock:
+            self.conn.close()
@@ -0,0 +1,63 @@
+import sys
+import time
+
+from collections import Counter
+from threading import Thread, Event, get_ident, enumerate as threads
+
+# Opt-in sampling profiler for a running crawl.
+#
+# Every interval seconds a background thread takes the current stack of every other thread
+# (sys._current_frames) and counts it. The counts are written in the "folded" format,
+# one "thread name;outer function;...;inner function count" line per stack, which flamegraph.pl,
+# speedscope and most flame graph viewers read directly. Sampling costs one stack walk per
+# thread per interval, nothing is added to the crawler's own code paths.
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+class SamplingProfiler(object):
+    def __init__(self, path, interval=0.01):
+        self.path = path
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = Event()
+        self.thread = Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self.thread.join()
+        self.write()
+
+    def sample(self):
+        own = get_ident()
+        thread_names = {thread.ident: thread.name for thread in threads()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            names = list()
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            names.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+            self.stacks[";".join(reversed(names))] += 1
+        self.samples += 1
+
+    def write(self):
+        with open(self.path, "w") as folded:
+            for stack, count in self.stacks.most_common():
+                folded.write(f"{stack} {count}\n")
+
+    def _loop(self):
+        next_sample = time.monotonic()
+        while not self._stopped.is_set():
+            self.sample()
+            next_sample += self.interval
+            self._stopped.wait(max(0, next_sample - time.monotonic()))
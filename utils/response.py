@@ -1,5 +1,9 @@
 import pickle
 
+# Statuses for responses the crawler refuses itself, after the cache server's own 600-606
+TOO_LARGE = 607
+UNSUPPORTED_TYPE = 608
+
 class Response(object):
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
@@ -12,3 +16,31 @@ class Response(object):
                 None)
         except TypeError:
             self.raw_response = None
+
+    @property
+    def content_type(self):
+        # media type of the page without its parameters, None if the server did not send one.
+        # The cache server only passes the page's headers inside the pickled requests.Response,
+        # so the page is always unpickled first; the check saves parsing it, not decoding it.
+        raw_response = self.raw_response
+        if raw_response is None or raw_response.headers is None:
+            return None
+        content_type = raw_response.headers.get("Content-Type")
+        if not content_type:
+            return None
+        return content_type.split(";", 1)[0].strip().lower()
+
+    def reject(self, status, error):
+        # turns this response into an error response and drops the page
+        self.status = status
+        self.error = error
+        self.raw_response = None
+
+    def check_content_type(self, content_types):
+        ''' Rejects a page whose Content-Type is not one of content_types (pages without one are kept).
+            Returns True if the page is kept. '''
+        content_type = self.content_type
+        if content_type is None or content_type in content_types:
+            return True
+        self.reject(UNSUPPORTED_TYPE, f"Content-Type {content_type} of {self.url} is not crawled.")
+        return False
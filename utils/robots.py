@@ -0,0 +1,209 @@
+import json
+import os
+import re
+import time
+
+from threading import Lock
+from urllib.parse import urlparse
+
+from utils import get_host
+from utils.download import download
+
+# robots.txt cache shared by every worker in the process.
+#
+# robots.txt is downloaded once per host through the cache server, compiled into a list of
+# regex rules and kept in memory for ttl seconds. The raw files are also written to a json
+# file so a restarted crawler does not download them again.
+#
+# A robots.txt that cannot be read because of the server (5xx, a cache server error 6xx, a
+# connection error) is not cached: the next url of the host fetches it again. After retries
+# failures in a row the host is disallowed for ttl seconds, in memory only, so a restarted crawler
+# tries again. Any other status (404, 403, ...) allows everything.
+
+
+def compile_pattern(pattern):
+    # robots.txt paths are prefixes, "*" matches any characters and a trailing "$" anchors the end
+    regex = re.escape(pattern).replace(r"\*", ".*")
+    if regex.endswith(r"\$"):
+        regex = regex[:-2] + "$"
+    return re.compile(regex)
+
+
+class RobotsRules(object):
+    def __init__(self, text, user_agent="*"):
+        # (pattern length, allow, compiled pattern), longest pattern first and allow before disallow,
+        # so the first rule that matches decides (the same precedence Google and RFC 9309 use)
+        self.rules = list()
+        self.crawl_delay = None
+        groups = self._parse(text)
+        agent = user_agent.lower()
+        # the most specific group that names our user agent, otherwise the "*" group
+        matching = [name for name in groups if name != "*" and name in agent]
+        selected = max(matching, key=len) if matching else "*"
+        for field, value in groups.get(selected, list()):
+            if field == "crawl-delay":
+                try:
+                    self.crawl_delay = float(value)
+                except ValueError:
+                    pass
+            elif value:
+                # an empty Disallow allows everything, so it adds no rule
+                self.rules.append((len(value), field == "allow", compile_pattern(value)))
+        self.rules.sort(key=lambda rule: (rule[0], rule[1]), reverse=True)
+
+    @staticmethod
+    def _parse(text):
+        # user agent -> list of (field, value) of its group
+        groups = dict()
+        agents = list()
+        in_rules = False
+        for line in text.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+            field, value = line.split(":", 1)
+            field, value = field.strip().lower(), value.strip()
+            if field == "user-agent":
+                # consecutive user-agent lines share the group that follows them
+                if in_rules:
+                    agents = list()
+                    in_rules = False
+                agents.append(value.lower())
+                for agent in agents:
+                    groups.setdefault(agent, list())
+            elif field in {"allow", "disallow", "crawl-delay"}:
+                in_rules = True
+                for agent in agents:
+                    groups[agent].append((field, value))
+        return groups
+
+    def can_fetch(self, url):
+        parsed = urlparse(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        for _, allow, pattern in self.rules:
+            if pattern.match(path):
+                return allow
+        return True
+
+
+class RobotsCache(object):
+    def __init__(self, config, fetch=download):
+        self.config = config
+        self.fetch_url = fetch
+        self.ttl = config.robots_ttl
+        self.retries = config.robots_retries
+        self.cache_file = config.robots_file
+        self.lock = Lock()
+        # host -> lock, so only one worker downloads the robots.txt of a host
+        self.fetch_locks = dict()
+        # host -> (fetched at, RobotsRules)
+        self.rules = dict()
+        # host -> {"fetched": time, "status": status, "text": robots.txt}, what is written to disk
+        self.saved = dict()
+        # host -> robots.txt downloads that failed in a row
+        self.failures = dict()
+        self._load()
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file) as cache_file:
+                self.saved = json.load(cache_file)
+        except (OSError, ValueError):
+            self.saved = dict()
+        # failed downloads saved by an older crawler are fetched again
+        self.saved = {host: entry for host, entry in self.saved.items() if not self._failed(entry["status"])}
+        for host, entry in self.saved.items():
+            self.rules[host] = (entry["fetched"], RobotsRules(entry["text"], self.config.user_agent))
+
+    @staticmethod
+    def _failed(status):
+        return status is None or status >= 500
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        temp_file = self.cache_file + ".tmp"
+        with open(temp_file, "w") as cache_file:
+            json.dump(self.saved, cache_file)
+        os.replace(temp_file, self.cache_file)
+
+    def is_cached(self, url):
+        entry = self.rules.get(get_host(url))
+        return entry is not None and time.time() - entry[0] < self.ttl
+
+    def can_fetch(self, url):
+        ''' Checks url against the cached robots.txt of its host, urls of hosts whose
+            robots.txt has not been fetched yet are allowed. '''
+        entry = self.rules.get(get_host(url))
+        return entry is None or entry[1].can_fetch(url)
+
+    def get_rules(self, url):
+        entry = self.rules.get(get_host(url))
+        return entry[1] if entry else None
+
+    def crawl_delay(self, url):
+        # the Crawl-delay in the cached robots.txt of the host of url, None if it has none
+        entry = self.rules.get(get_host(url))
+        return entry[1].crawl_delay if entry else None
+
+    def fetch(self, url, logger=None):
+        ''' Downloads and caches the robots.txt of the host of url, unless another worker already did.
+            Returns its rules, None if the download failed and will be retried. '''
+        host = get_host(url)
+        with self.lock:
+            host_lock = self.fetch_locks.setdefault(host, Lock())
+        with host_lock:
+            if self.is_cached(url):
+                return self.rules[host][1]
+            robots_url = f"{urlparse(url).scheme or 'https'}://{host}/robots.txt"
+            try:
+                resp = self.fetch_url(robots_url, self.config, logger)
+                status = resp.status
+            except Exception as e:
+                if logger:
+                    logger.error(f"Failed to download {robots_url}: {e}")
+                resp, status = None, None
+            fetched = time.time()
+            if self._failed(status):
+                with self.lock:
+                    failures = self.failures[host] = self.failures.get(host, 0) + 1
+                    if failures < self.retries:
+                        if logger:
+                            logger.info(f"Fetching {robots_url} failed, status <{status}>, retrying ({failures}).")
+                        return None
+                    del self.failures[host]
+                    rules = RobotsRules("User-agent: *\nDisallow: /", self.config.user_agent)
+                    self.rules[host] = (fetched, rules)
+                if logger:
+                    logger.error(f"Fetching {robots_url} failed {failures} times, status <{status}>, "
+                                 f"disallowing {host} for {self.ttl:.0f}s.")
+                return rules
+            text = ""
+            # a robots.txt we could not read for another reason (404, 403, ...) allows everything
+            if status == 200 and resp.raw_response is not None:
+                text = resp.raw_response.content.decode("utf-8", errors="replace")
+            rules = RobotsRules(text, self.config.user_agent)
+            with self.lock:
+                self.failures.pop(host, None)
+                self.rules[host] = (fetched, rules)
+                self.saved[host] = {"fetched": fetched, "status": status, "text": text}
+                self._save()
+            if logger:
+                logger.info(f"Fetched {robots_url}, status <{status}>, {len(rules.rules)} rules.")
+            return rules
+
+
+_robots_cache = None
+_robots_cache_lock = Lock()
+
+def get_robots_cache(config):
+    # One cache per process, shared by all the workers
+    global _robots_cache
+    with _robots_cache_lock:
+        if _robots_cache is None:
+            _robots_cache = RobotsCache(config)
+        return _robots_cache
@@ -0,0 +1,167 @@
+import hashlib
+from collections import Counter
+from functools import lru_cache
+from threading import RLock, Thread, Event
+
+import numpy as np
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    # Python < 3.10
+    def popcount(value):
+        return bin(value).count("1")
+
+
+def fingerprint_to_int(fingerprint):
+    # Accepts the '0'/'1' string produced by scraper.getFingerprint or an already packed int
+    if isinstance(fingerprint, str):
+        return int(fingerprint, 2)
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return popcount(fingerprint_to_int(a) ^ fingerprint_to_int(b))
+
+
+def fingerprint_to_str(fingerprint, bits=256):
+    return format(fingerprint, f"0{bits}b")
+
+
+class SimhashFingerprinter(object):
+    ''' Computes simhash fingerprints with one matrix product instead of a python loop
+        over every (bit, token) pair.
+
+        Token hashes come from hash_name (sha256 by default, the same hash scraper.getFingerprint
+        always used) and are cached in a bounded LRU since most tokens repeat across pages.
+        bits=256 gives the same fingerprints as the old string implementation, bits=64 keeps only
+        the top 64 bits of every token hash for callers that want smaller fingerprints. '''
+    def __init__(self, bits=256, hash_name="sha256", cache_size=1 << 18):
+        self.bits = bits
+        self.num_bytes = bits // 8
+        assert bits % 8 == 0, "fingerprint size must be a multiple of 8"
+        assert hashlib.new(hash_name).digest_size >= self.num_bytes, f"{hash_name} is too short for {bits} bits"
+        self.hash_name = hash_name
+        num_bytes = self.num_bytes
+        # token -> the first num_bytes of its digest, i.e. its packed bit vector
+        @lru_cache(maxsize=cache_size)
+        def token_hash(token):
+            return hashlib.new(hash_name, token.encode("utf-8")).digest()[:num_bytes]
+        self.token_hash = token_hash
+
+    def fingerprint(self, tokens):
+        ''' tokens is either an iterable of tokens or a mapping of token -> weight (e.g. a Counter).
+            Returns the fingerprint packed into an int, most significant bit first. '''
+        weights = tokens if hasattr(tokens, "items") else Counter(tokens)
+        if not weights:
+            return 0
+        token_hash = self.token_hash
+        packed = np.frombuffer(
+            b"".join([token_hash(token) for token in weights]), dtype=np.uint8
+        ).reshape(len(weights), self.num_bytes)
+        # rows are tokens, columns are the hash bits (same order as the old '0'/'1' strings)
+        bit_matrix = np.unpackbits(packed, axis=1)
+        weight_vector = np.fromiter(weights.values(), dtype=np.int64, count=len(weights))
+        # for every bit: sum(+w where the bit is 1, -w where it is 0) > 0  <=>  2 * ones > total
+        ones = weight_vector @ bit_matrix
+        signature = np.packbits(2 * ones > weight_vector.sum())
+        return int.from_bytes(signature.tobytes(), "big")
+
+    def fingerprint_str(self, tokens):
+        return fingerprint_to_str(self.fingerprint(tokens), self.bits)
+
+
+# Near-duplicate index for simhash fingerprints.
+#
+# Fingerprints are kept as packed ints instead of '0'/'1' strings. To find every stored
+# fingerprint within max_distance bits of a query we use the pigeonhole trick: split the
+# fingerprint into (max_distance + 1) bands. If two fingerprints differ in at most
+# max_distance bits, at least one band has to be identical, so we only need to compare
+# against fingerprints that share a band with the query (one dict lookup per band) and
+# confirm those candidates with popcount(a ^ b).
+class SimhashIndex(object):
+    def __init__(self, bits=256, max_distance=13):
+        assert 0 <= max_distance < bits, "max_distance must be smaller than the fingerprint size"
+        self.bits = bits
+        self.max_distance = max_distance
+        self.lock = RLock()
+        # (shift, mask) of every band, the last band takes the leftover bits
+        num_bands = max_distance + 1
+        width = bits // num_bands
+        self.bands = list()
+        for band in range(num_bands):
+            shift = band * width
+            band_width = width if band < num_bands - 1 else bits - shift
+            self.bands.append((shift, (1 << band_width) - 1))
+        # one table per band: band value -> list of fingerprint ids
+        self.tables = [dict() for _ in self.bands]
+        self.fingerprints = list()
+        self.urls = list()
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def _keys(self, fingerprint):
+        return [(fingerprint >> shift) & mask for shift, mask in self.bands]
+
+    def find(self, fingerprint):
+        ''' Returns (url, distance) of the closest stored fingerprint within max_distance,
+            or None if there is no near duplicate. '''
+        fingerprint = fingerprint_to_int(fingerprint)
+        best = None
+        seen = set()
+        with self.lock:
+            for table, key in zip(self.tables, self._keys(fingerprint)):
+                for fid in table.get(key, ()):
+                    if fid in seen:
+                        continue
+                    seen.add(fid)
+                    distance = popcount(self.fingerprints[fid] ^ fingerprint)
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (self.urls[fid], distance)
+                        if distance == 0:
+                            return best
+        return best
+
+    def add(self, fingerprint, url=None):
+        fingerprint = fingerprint_to_int(fingerprint)
+        with self.lock:
+            fid = len(self.fingerprints)
+            self.fingerprints.append(fingerprint)
+            self.urls.append(url)
+            for table, key in zip(self.tables, self._keys(fingerprint)):
+                table.setdefault(key, list()).append(fid)
+
+    def load(self, fingerprints, urls):
+        ''' Adds fingerprints (of pages kept before a restart) without looking for near duplicates.
+            The band tables are filled by a background thread that holds the lock, so the caller
+            does not wait for them but find() and add() do. '''
+        loaded = Event()
+
+        def build():
+            with self.lock:
+                start = len(self.fingerprints)
+                self.fingerprints.extend(fingerprints)
+                self.urls.extend(urls)
+                loaded.set()
+                for table, (shift, mask) in zip(self.tables, self.bands):
+                    for fid, fingerprint in enumerate(fingerprints, start):
+                        table.setdefault((fingerprint >> shift) & mask, list()).append(fid)
+
+        Thread(target=build, daemon=True).start()
+        loaded.wait()
+
+    def entries(self, start=0, end=None):
+        ''' (fingerprints, urls) of everything added after the first start fingerprints (up to end). '''
+        with self.lock:
+            return self.fingerprints[start:end], self.urls[start:end]
+
+    def find_or_add(self, fingerprint, url=None):
+        ''' Looks up the fingerprint and stores it if it has no near duplicate.
+            Done under one lock so two threads can't both add the same page. '''
+        fingerprint = fingerprint_to_int(fingerprint)
+        with self.lock:
+            match = self.find(fingerprint)
+            if match is None:
+                self.add(fingerprint, url)
+            return match
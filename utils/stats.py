@@ -0,0 +1,168 @@
+from collections import Counter
+from threading import RLock, local
+from urllib.parse import urlparse
+
+from utils.metrics import metrics
+from utils.word_stats import WordCounts
+
+# Crawl statistics for the report.
+#
+# Every thread records into its own local delta (no locking on the hot path). flush() merges
+# the delta into the global view under the lock and starts a new one, so the cost of a merge
+# is the size of one page, not the size of everything counted so far. With track_unsaved() the
+# merged deltas are also kept until take_unsaved(), so a checkpoint saves only what changed.
+
+
+class _Delta(object):
+    def __init__(self):
+        self.words = Counter()
+        self.subdomains = Counter()
+        self.longest_page = (0, "")
+        self.pages = 0
+        self.duplicates = 0
+
+
+class CrawlStats(object):
+    def __init__(self, word_capacity=0, sketch_width=1 << 18):
+        self.lock = metrics.timed_lock("stats", RLock())
+        self.local = local()
+        # word -> frequency over every page kept (stopwords excluded by the scraper), with the
+        # top 50 kept up to date; with a word_capacity only that many words are kept, see utils/word_stats.py
+        self.words = WordCounts(50, word_capacity, sketch_width)
+        # the frontier's utils.url_seen structure, every valid url found (set by the Crawler)
+        self.url_seen = None
+        # "https://<subdomain>.ics.uci.edu" -> number of pages kept on that subdomain
+        self.subdomains = Counter()
+        # (number of words, url) of the longest page
+        self.longest_page = (0, "")
+        self.pages = 0
+        # pages dropped as exact or near duplicates
+        self.duplicates = 0
+        # deltas merged since the last take_unsaved(), None unless track_unsaved() was called
+        self.unsaved = None
+
+    def _delta(self):
+        delta = getattr(self.local, "delta", None)
+        if delta is None:
+            delta = self.local.delta = _Delta()
+        return delta
+
+    def add_word_count(self, url, word_count):
+        delta = self._delta()
+        if word_count > delta.longest_page[0]:
+            delta.longest_page = (word_count, url)
+
+    def add_duplicate(self, url):
+        self._delta().duplicates += 1
+
+    def add_page(self, url, word_counts):
+        ''' Counts a page that is kept for the report, word_counts is word -> occurrences. '''
+        delta = self._delta()
+        delta.pages += 1
+        delta.words.update(word_counts)
+        hostname = urlparse(url).hostname or ""
+        if ".ics.uci.edu" in hostname:
+            delta.subdomains["https://" + hostname] += 1
+
+    def flush(self):
+        ''' Merges what the calling thread recorded since its last flush into the global view. '''
+        delta = getattr(self.local, "delta", None)
+        if delta is None:
+            return
+        self.local.delta = None
+        with self.lock:
+            self.words.update(delta.words)
+            self.subdomains.update(delta.subdomains)
+            if delta.longest_page[0] > self.longest_page[0]:
+                self.longest_page = delta.longest_page
+            self.pages += delta.pages
+            self.duplicates += delta.duplicates
+            if self.unsaved is not None:
+                self.unsaved.append(delta)
+
+    def track_unsaved(self):
+        # from now on flush() keeps the deltas it merges, for the checkpoints of utils.checkpoint
+        with self.lock:
+            self.unsaved = list()
+
+    def take_unsaved(self):
+        ''' The deltas merged since the last call (see delta_state), None if they are not tracked. '''
+        with self.lock:
+            unsaved = self.unsaved
+            if unsaved is not None:
+                self.unsaved = list()
+            return unsaved
+
+    def state(self):
+        ''' A copy of the global view, for utils.checkpoint. '''
+        with self.lock:
+            return {
+                "pages": self.pages,
+                "duplicates": self.duplicates,
+                "longest_page": self.longest_page,
+                "subdomains": dict(self.subdomains),
+                "words": dict(self.words.items()),
+            }
+
+    def restore(self, state):
+        # starts from a checkpoint taken with state()
+        with self.lock:
+            self.pages = state["pages"]
+            self.duplicates = state["duplicates"]
+            self.longest_page = tuple(state["longest_page"])
+            self.subdomains = Counter(state["subdomains"])
+            self.words.restore(state["words"])
+
+    def merge(self, state):
+        # adds the state() of another crawler's stats, e.g. of a partition of a distributed crawl
+        with self.lock:
+            self.pages += state["pages"]
+            self.duplicates += state["duplicates"]
+            if state["longest_page"][0] > self.longest_page[0]:
+                self.longest_page = tuple(state["longest_page"])
+            self.subdomains.update(state["subdomains"])
+            self.words.update(state["words"])
+
+    def set_word_capacity(self, word_capacity, sketch_width=1 << 18):
+        # switches the word store, called before anything is counted (see scraper.configure)
+        with self.lock:
+            words = self.words
+            self.words = WordCounts(words.k, word_capacity, sketch_width)
+            self.words.update(dict(words.items()))
+
+    def top_words(self, k=50):
+        # most frequent first, ties in alphabetical order
+        with self.lock:
+            return self.words.top_words(k)
+
+    def snapshot(self, k=50):
+        ''' The live global view, everything flushed so far. '''
+        with self.lock:
+            return {
+                "unique_pages": len(self.url_seen) if self.url_seen is not None else 0,
+                "pages": self.pages,
+                "top_words": self.top_words(k),
+                "longest_page": {"url": self.longest_page[1], "words": self.longest_page[0]},
+                "subdomains": dict(sorted(self.subdomains.items())),
+                "duplicates": self.duplicates,
+            }
+
+
+def delta_state(deltas):
+    ''' The deltas of CrawlStats.take_unsaved() added up, in the form of CrawlStats.state(). '''
+    words, subdomains = Counter(), Counter()
+    longest_page, pages, duplicates = (0, ""), 0, 0
+    for delta in deltas:
+        words.update(delta.words)
+        subdomains.update(delta.subdomains)
+        if delta.longest_page[0] > longest_page[0]:
+            longest_page = delta.longest_page
+        pages += delta.pages
+        duplicates += delta.duplicates
+    return {
+        "pages": pages,
+        "duplicates": duplicates,
+        "longest_page": longest_page,
+        "subdomains": dict(subdomains),
+        "words": dict(words),
+    }
@@ -0,0 +1,49 @@
+import re
+from collections import Counter
+
+# A token is a maximal run of ASCII letters and digits, lowercased.
+# Text is lowercased and scanned with one compiled regex, so there is no per-character python work.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+", re.ASCII)
+# Tokens never span whitespace, so the streaming functions cut the page at whitespace
+WHITESPACE_PATTERN = re.compile(r"\s")
+CHUNK_SIZE = 1 << 16
+
+
+def tokenize(page_text: str):
+    """
+    reads a content string and returns a list of the tokens in that page
+    The time complexity is O(n) where n is the number of characters in the page
+    """
+    return TOKEN_PATTERN.findall(page_text.lower())
+
+
+def iter_chunks(page_text: str, chunk_size=CHUNK_SIZE):
+    """
+    splits the page into pieces of about chunk_size characters without cutting a token in half
+    """
+    start = 0
+    while start < len(page_text):
+        boundary = WHITESPACE_PATTERN.search(page_text, start + chunk_size)
+        end = boundary.end() if boundary else len(page_text)
+        yield page_text[start:end]
+        start = end
+
+
+def iter_tokens(page_text: str, chunk_size=CHUNK_SIZE):
+    """
+    generator version of tokenize, yields the tokens one at a time.
+    Only one chunk of the page is lowercased and tokenized at a time, so the full list is never built.
+    """
+    for chunk in iter_chunks(page_text, chunk_size):
+        yield from TOKEN_PATTERN.findall(chunk.lower())
+
+
+def count_tokens(page_text: str, chunk_size=CHUNK_SIZE):
+    """
+    returns a Counter of token -> number of occurrences in the page, built chunk by chunk.
+    The counts can be fed directly to the word statistics and to the simhash fingerprint.
+    """
+    counts = Counter()
+    for chunk in iter_chunks(page_text, chunk_size):
+        counts.update(TOKEN_PATTERN.findall(chunk.lower()))
+    return counts
@@ -0,0 +1,247 @@
+import json
+import os
+import re
+from array import array
+from collections import Counter
+from threading import RLock
+from urllib.parse import urlsplit, parse_qsl
+
+from utils import get_logger
+from utils.metrics import metrics
+
+# Crawler trap detection learned from the pages as they are scraped, on top of the fixed rules
+# of utils/url_filter.py.
+#
+# Every url is reduced to a pattern: its path with the parts that vary between the pages of one
+# generator replaced (runs of digits by {n}, long hex ids by {id}) and the names of its query
+# keys without their values, so /calendar/2019/05/12 and /calendar/2020/1/3 are both
+# /calendar/{n}/{n}/{n}, and /doku.php?id=start&rev=1619&do=diff is /doku.php?do&id&rev.
+#
+# Per host and pattern the detector counts the distinct urls found (its cardinality, counted up
+# to max_urls), the pages downloaded and how many of them were low value: a near or exact
+# duplicate of a page already seen, fewer than min_words words, or a 204/4xx. Once a pattern has
+# min_samples pages and at least max_low_value of them were low value it is blocked; a pattern
+# with more than max_urls urls (an endless generator: calendars, revisions, session ids) is
+# blocked once half that many were. Urls more than max_depth path segments deep, or with a
+# segment repeated max_repeats times, are blocked without waiting for pages. Blocked links never
+# reach the frontier, and the workers skip urls of a pattern blocked while they were queued.
+#
+# The out-links of every page also go into a LinkGraph, from which every pattern gets how many
+# links point to it from its own pages (fanout, a generator links to itself) and from others.
+# The blocked patterns are logged, served as the "trap patterns" metric and written with the
+# largest patterns to report_file when the crawl ends. Nothing is checkpointed, a resumed crawl
+# learns the patterns again.
+
+DIGITS = re.compile(r"\d+")
+HEX_ID = re.compile(r"[0-9a-f]{16,}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def segment_pattern(segment):
+    if HEX_ID.fullmatch(segment):
+        return "{id}"
+    return DIGITS.sub("{n}", segment)
+
+
+def url_pattern(url):
+    ''' (host, pattern, path segments) of url. '''
+    parsed = urlsplit(url)
+    # path parameters (;jsessionid=...) are dropped like the query values
+    segments = [segment.split(";", 1)[0] for segment in parsed.path.lower().split("/") if segment]
+    pattern = "/" + "/".join(segment_pattern(segment) for segment in segments)
+    if parsed.query:
+        keys = sorted({key.lower() for key, _ in parse_qsl(parsed.query, keep_blank_values=True)})
+        if keys:
+            pattern += "?" + "&".join(keys)
+    return parsed.hostname or "", pattern, segments
+
+
+class LinkGraph(object):
+    ''' The out-links of every scraped page. Urls are numbered by hash(), the out-links of a page
+        are one slice of a flat array of node ids, so an edge costs 4 bytes. '''
+    def __init__(self):
+        # hash(url) -> node
+        self.nodes = dict()
+        # node -> pattern id, start of its out-links in targets, number of out-links
+        self.patterns = array("I")
+        self.starts = array("Q")
+        self.degrees = array("I")
+        self.targets = array("I")
+
+    def __len__(self):
+        return len(self.patterns)
+
+    @property
+    def edges(self):
+        return len(self.targets)
+
+    def node(self, url, pattern_id):
+        key = hash(url)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = len(self.patterns)
+            self.patterns.append(pattern_id)
+            self.starts.append(0)
+            self.degrees.append(0)
+        return node
+
+    def add_page(self, node, targets):
+        self.starts[node] = len(self.targets)
+        self.degrees[node] = len(targets)
+        self.targets.extend(targets)
+
+    def out_links(self, node):
+        start = self.starts[node]
+        return self.targets[start:start + self.degrees[node]]
+
+
+class _Pattern(object):
+    __slots__ = ("id", "host", "pattern", "urls", "pages", "low_value", "self_links", "in_links", "blocked")
+
+    def __init__(self, pattern_id, host, pattern):
+        self.id = pattern_id
+        self.host = host
+        self.pattern = pattern
+        # hash() of its urls, up to max_urls + 1 of them
+        self.urls = set()
+        self.pages = 0
+        self.low_value = 0
+        # links to it from its own pages and from other patterns
+        self.self_links = 0
+        self.in_links = 0
+        # why it is blocked, None while it is not
+        self.blocked = None
+
+    def describe(self):
+        return {
+            "host": self.host,
+            "pattern": self.pattern,
+            "urls": len(self.urls),
+            "pages": self.pages,
+            "low_value": self.low_value,
+            "fanout": round(self.self_links / self.pages, 2) if self.pages else 0,
+            "in_links": self.in_links,
+            "blocked": self.blocked,
+        }
+
+
+class TrapDetector(object):
+    def __init__(self, min_samples=20, max_low_value=0.8, max_urls=1000, min_words=50, max_depth=12,
+                 max_repeats=3, report_file=""):
+        self.logger = get_logger("TRAPS")
+        self.lock = metrics.timed_lock("traps", RLock())
+        self.min_samples = min_samples
+        self.max_low_value = max_low_value
+        self.max_urls = max_urls
+        self.min_words = min_words
+        self.max_depth = max_depth
+        self.max_repeats = max_repeats
+        self.report_file = report_file
+        # (host, pattern) -> _Pattern, and the same by pattern id
+        self.patterns = dict()
+        self.pattern_list = list()
+        self.graph = LinkGraph()
+        # reason -> urls dropped or skipped for it
+        self.dropped = Counter()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.trap_min_samples, config.trap_max_low_value, config.trap_max_urls,
+                   config.trap_min_words, config.trap_max_depth, config.trap_max_repeats, config.trap_report)
+
+    def _pattern(self, host, pattern):
+        entry = self.patterns.get((host, pattern))
+        if entry is None:
+            entry = self.patterns[(host, pattern)] = _Pattern(len(self.pattern_list), host, pattern)
+            self.pattern_list.append(entry)
+        return entry
+
+    def _path_trap(self, segments):
+        if len(segments) > self.max_depth:
+            return "too deep"
+        if len(set(segments)) < len(segments) and max(map(segments.count, segments)) >= self.max_repeats:
+            return "repeating path"
+        return None
+
+    def check(self, url):
+        ''' Why url is a trap, None if it is not (as far as the detector knows yet). '''
+        host, pattern, segments = url_pattern(url)
+        with self.lock:
+            reason = self._path_trap(segments)
+            if reason is None:
+                entry = self.patterns.get((host, pattern))
+                reason = entry.blocked if entry is not None else None
+            if reason is not None:
+                self.dropped[reason] += 1
+        return reason
+
+    def record(self, url, links, low_value):
+        ''' Learns from a downloaded page of url with its valid links and whether it was low value,
+            returns the links that are not traps. '''
+        host, pattern, _ = url_pattern(url)
+        links = [(link,) + url_pattern(link) for link in links]
+        kept = list()
+        with self.lock:
+            page = self._pattern(host, pattern)
+            page.pages += 1
+            page.low_value += bool(low_value)
+            targets = array("I")
+            for link, link_host, link_pattern, segments in links:
+                entry = self._pattern(link_host, link_pattern)
+                targets.append(self.graph.node(link, entry.id))
+                if entry is page:
+                    entry.self_links += 1
+                else:
+                    entry.in_links += 1
+                if len(entry.urls) <= self.max_urls:
+                    entry.urls.add(hash(link))
+                reason = entry.blocked or self._path_trap(segments)
+                if reason is not None:
+                    self.dropped[reason] += 1
+                    continue
+                kept.append(link)
+            self.graph.add_page(self.graph.node(url, page.id), targets)
+            self._judge(page)
+        return kept
+
+    def _judge(self, entry):
+        if entry.blocked is not None or entry.pages < self.min_samples:
+            return
+        rate = entry.low_value / entry.pages
+        if rate >= self.max_low_value:
+            entry.blocked = "low value"
+        elif len(entry.urls) > self.max_urls and rate >= self.max_low_value / 2:
+            entry.blocked = "unbounded"
+        else:
+            return
+        metrics.count("blocked patterns")
+        self.logger.info(
+            f"Blocking {entry.host}{entry.pattern} ({entry.blocked}): {entry.low_value} of {entry.pages} "
+            f"pages were low value, {len(entry.urls)}{'+' if len(entry.urls) > self.max_urls else ''} urls.")
+
+    def blocked(self, k=None):
+        ''' host + pattern -> reason of the blocked patterns, the k with the most urls if k is given. '''
+        with self.lock:
+            entries = [entry for entry in self.pattern_list if entry.blocked is not None]
+        entries.sort(key=lambda entry: -len(entry.urls))
+        return {entry.host + entry.pattern: entry.blocked for entry in entries[:k]}
+
+    def decisions(self, k=100):
+        ''' Everything the detector decided: the blocked patterns, the k patterns with the most
+            urls, the urls dropped per reason and the size of the link graph. '''
+        with self.lock:
+            blocked = [entry.describe() for entry in self.pattern_list if entry.blocked is not None]
+            largest = sorted(self.pattern_list, key=lambda entry: -len(entry.urls))[:k]
+            return {
+                "blocked": blocked,
+                "largest": [entry.describe() for entry in largest],
+                "dropped": dict(self.dropped),
+                "graph": {"nodes": len(self.graph), "edges": self.graph.edges, "patterns": len(self.pattern_list)},
+            }
+
+    def write_report(self):
+        if not self.report_file:
+            return
+        temp_file = self.report_file + ".tmp"
+        with open(temp_file, "w") as report:
+            json.dump(self.decisions(), report, indent=1)
+        os.replace(temp_file, self.report_file)
@@ -0,0 +1,89 @@
+import re
+from urllib.parse import urlsplit, parse_qsl
+
+# The rules behind scraper.is_valid, compiled once.
+#
+# A url is valid if it is http(s), its host is one of the allowed domains or a subdomain of one,
+# its path does not end in a non-webpage extension, and it does not fall in one of the trap rules:
+# a paginated listing past max_page, a query with one of trap_query_keys, or a path matching one
+# of trap_paths (calendars and events).
+
+DEFAULT_DOMAINS = ("ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu")
+DEFAULT_EXTENSIONS = (
+    "css|js|bmp|gif|jpe?g|ico"
+    "|png|tiff?|mid|mp2|mp3|mp4"
+    "|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+    "|ps|eps|tex|ppt|pptx|ppsx|doc|docx|xls|xlsx|names"
+    "|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+    "|epub|dll|cnf|tgz|sha1"
+    "|thmx|mso|arff|rtf|jar|csv|bib|txt|r"
+    "|rm|smil|wmv|swf|wma|zip|rar|gz")
+DEFAULT_MAX_PAGE = 5
+DEFAULT_TRAP_QUERY_KEYS = ("share", "action")
+DEFAULT_TRAP_PATHS = ("event", "calendar")
+
+# .../page/<n> or .../page/<n>/
+PAGE_PATTERN = re.compile(r"/page/(\d+)/?$")
+
+
+class UrlFilter(object):
+    def __init__(self, domains=DEFAULT_DOMAINS, extensions=DEFAULT_EXTENSIONS, max_page=DEFAULT_MAX_PAGE,
+                 trap_query_keys=DEFAULT_TRAP_QUERY_KEYS, trap_paths=DEFAULT_TRAP_PATHS):
+        self.domains = frozenset(domain.lower().strip(".") for domain in domains)
+        self.suffix_pattern = re.compile(r"\.(?:" + extensions + r")$")
+        self.max_page = max_page
+        self.trap_query_keys = frozenset(trap_query_keys)
+        self.trap_pattern = (
+            re.compile("|".join(re.escape(path) for path in trap_paths)) if trap_paths else None)
+        # host -> allowed, hosts repeat for almost every link so the lookup is done once per host
+        self.hosts = dict()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.allowed_domains, DEFAULT_EXTENSIONS, config.max_page,
+                   config.trap_query_keys, config.trap_paths)
+
+    def allowed_host(self, host):
+        allowed = self.hosts.get(host)
+        if allowed is None:
+            # the host itself or any of its parent domains has to be in the allow-list
+            labels = host.split(".")
+            allowed = any(".".join(labels[i:]) in self.domains for i in range(len(labels) - 1))
+            self.hosts[host] = allowed
+        return allowed
+
+    def is_valid(self, url, robots=None):
+        try:
+            parsed = urlsplit(url)
+            host = parsed.hostname
+        except ValueError:
+            # e.g. invalid ipv6 hosts or ports
+            return False
+        if parsed.scheme not in {"http", "https"} or not host or not self.allowed_host(host):
+            return False
+        path = parsed.path.lower()
+        if self.suffix_pattern.search(path):
+            return False
+        if self.trap_pattern is not None and self.trap_pattern.search(path):
+            return False
+        if parsed.query and self.trap_query_keys:
+            if any(key.lower() in self.trap_query_keys
+                   for key, _ in parse_qsl(parsed.query, keep_blank_values=True)):
+                return False
+        page = PAGE_PATTERN.search(path)
+        if page and int(page.group(1)) > self.max_page:
+            return False
+        if robots is not None and not robots.can_fetch(url):
+            return False
+        return True
+
+    def filter(self, urls, robots=None):
+        ''' The valid urls out of urls, in order and without repeats. '''
+        seen = set()
+        valid = list()
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+                if self.is_valid(url, robots):
+                    valid.append(url)
+        return valid
@@ -0,0 +1,75 @@
+import math
+
+# Structures that remember which urls have been discovered.
+#
+# Both take the hex sha256 from utils.get_urlhash (computed once per url by the frontier) and
+# only keep a few bytes of it: UrlHashSet keeps 64 bits per url in a set, BloomFilter keeps a
+# fixed size bit array for crawls too large for memory, at the cost of a small rate of urls
+# wrongly reported as seen (which are then never crawled).
+
+
+def url_key(urlhash):
+    # first 64 bits of the url's sha256, collisions are negligible below billions of urls
+    return int(urlhash[:16], 16)
+
+
+class UrlHashSet(object):
+    # urls only share state through the set itself, so the frontier store may lock it by shard
+    shardable = True
+
+    def __init__(self):
+        self.keys = set()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, urlhash):
+        return url_key(urlhash) in self.keys
+
+    def add(self, urlhash):
+        ''' Returns True if the url was not seen before. '''
+        key = url_key(urlhash)
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+
+class BloomFilter(object):
+    def __init__(self, capacity, error_rate=0.001):
+        # bits and hash functions for error_rate false positives once capacity urls are added
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, urlhash):
+        # double hashing with two independent 64-bit parts of the sha256
+        first, second = int(urlhash[:16], 16), int(urlhash[16:32], 16) | 1
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, urlhash):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(urlhash))
+
+    def add(self, urlhash):
+        ''' Returns True if the url was not seen before (False can be a false positive). '''
+        bits = self.bits
+        new = False
+        for position in self._positions(urlhash):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+
+def make_url_seen(config):
+    if config.url_seen == "bloom":
+        return BloomFilter(config.bloom_capacity, config.bloom_error_rate)
+    return UrlHashSet()
@@ -0,0 +1,202 @@
+from heapq import heapify, heappush, heapreplace, nsmallest
+
+import numpy as np
+
+# Word frequencies of the crawl statistics.
+#
+# Every word is counted exactly by default. The top k words are kept up to date as the counts
+# grow (TopWords), so the report costs O(k log k) however many words there are.
+#
+# With a capacity, memory is bounded: the counts of all the words go into a count-min sketch
+# (a depth x width table of counters, a word's count is the smallest of its depth counters and
+# is never below the true count) and only the capacity words with the highest estimates are
+# kept by name. A word that appears often enough always gets in: its estimate only grows, and
+# once it is above the lowest kept word it replaces it. With N words counted in total the
+# estimates are at most about e * N / width too high. The sketch hashes with hash(), which is
+# only stable within a process: it is not checkpointed, a resumed crawl starts a new one from the
+# kept words and their counts.
+
+
+class _Last(object):
+    # a word that sorts the other way round, so the heap's smallest entry is the word that goes
+    # last in the report: the lowest count, then the last in alphabetical order
+    __slots__ = ("word",)
+
+    def __init__(self, word):
+        self.word = word
+
+    def __lt__(self, other):
+        return self.word > other.word
+
+    def __eq__(self, other):
+        return self.word == other.word
+
+
+class TopWords(object):
+    ''' The k words with the highest counts, for counts that only grow.
+
+        update() is called with a word's new count every time it changes. The members sit in a
+        min-heap on the count they had when they got in; an entry that is out of date is only
+        fixed when it reaches the top of the heap, so updating a member is one dict write. '''
+    def __init__(self, k):
+        self.k = k
+        # word -> count of the members
+        self.members = dict()
+        # (count, _Last(word)) of the members, possibly with an older count
+        self.heap = list()
+
+    def __len__(self):
+        return len(self.members)
+
+    def floor(self):
+        # no word with a count below this can get in, one with this count only if it wins the tie
+        # (it may be lower than the true minimum)
+        return self.heap[0][0] if len(self.members) >= self.k else 0
+
+    def update(self, word, count):
+        ''' word has count now, returns the word it pushed out or None. '''
+        members = self.members
+        if word in members:
+            members[word] = count
+            return None
+        if len(members) < self.k:
+            members[word] = count
+            heappush(self.heap, (count, _Last(word)))
+            return None
+        heap = self.heap
+        # brings the real lowest member to the top
+        while heap[0][0] != members[heap[0][1].word]:
+            heapreplace(heap, (members[heap[0][1].word], heap[0][1]))
+        entry = (count, _Last(word))
+        if not heap[0] < entry:
+            return None
+        _, last = heapreplace(heap, entry)
+        del members[last.word]
+        members[word] = count
+        return last.word
+
+    def discard(self, word):
+        if self.members.pop(word, None) is not None:
+            self.heap = [(count, last) for count, last in self.heap if last.word != word]
+            heapify(self.heap)
+
+    def items(self):
+        ''' (word, count) of the members, most frequent first, ties in alphabetical order. '''
+        return sorted(self.members.items(), key=lambda item: (-item[1], item[0]))
+
+
+class CountMinSketch(object):
+    def __init__(self, width=1 << 18, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros(width * depth, dtype=np.uint64)
+        # start of every row in table
+        self.rows = np.arange(depth, dtype=np.uint64) * np.uint64(width)
+
+    def _cells(self, words):
+        # the depth cells of every word, h1 + i * h2 with h1 the word's hash() (cached by the
+        # string) and h2 an odd multiplicative scramble of it
+        h1 = np.fromiter(map(hash, words), dtype=np.int64, count=len(words)).view(np.uint64)[:, None]
+        h2 = (h1 * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(29) | np.uint64(1)
+        steps = np.arange(self.depth, dtype=np.uint64)
+        return (h1 + steps * h2) % np.uint64(self.width) + self.rows
+
+    def add(self, word_counts):
+        ''' Adds word -> count, returns the estimated count of every word in the same order. '''
+        words = list(word_counts)
+        if not words:
+            return list()
+        cells = self._cells(words)
+        counts = np.fromiter(word_counts.values(), dtype=np.uint64, count=len(words))
+        estimates = self.table[cells].min(axis=1) + counts
+        # conservative update: a cell is only raised as far as the new estimate of its word
+        np.maximum.at(self.table, cells.ravel(), np.repeat(estimates, self.depth))
+        return estimates
+
+
+class WordCounts(object):
+    ''' word -> count with the top k words maintained incrementally. capacity 0 counts every word
+        exactly, otherwise only the capacity most frequent words are kept (see above). Not thread
+        safe, CrawlStats calls it under its lock. '''
+    def __init__(self, k=50, capacity=0, sketch_width=1 << 18):
+        self.k = k
+        self.capacity = capacity
+        self.sketch_width = sketch_width
+        self.clear()
+
+    def clear(self):
+        self.top = TopWords(self.k)
+        if self.capacity:
+            self.sketch = CountMinSketch(self.sketch_width)
+            # the kept words and their estimates
+            self.heavy = TopWords(max(self.capacity, self.k))
+            self.counts = self.heavy.members
+        else:
+            self.sketch = None
+            self.counts = dict()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, word):
+        return word in self.counts
+
+    def __getitem__(self, word):
+        return self.counts[word]
+
+    def get(self, word, default=None):
+        return self.counts.get(word, default)
+
+    def items(self):
+        return self.counts.items()
+
+    def update(self, word_counts):
+        if self.sketch is not None:
+            self._update_estimates(word_counts)
+            return
+        counts = self.counts
+        top = self.top
+        floor = top.floor()
+        for word, n in word_counts.items():
+            count = counts.get(word, 0) + n
+            counts[word] = count
+            if count >= floor:
+                top.update(word, count)
+                floor = top.floor()
+
+    def _update_estimates(self, word_counts):
+        heavy = self.heavy
+        top = self.top
+        words = list(word_counts)
+        estimates = self.sketch.add(word_counts)
+        # the floor only rises, so no word below it now can get in (one at it may win the tie)
+        candidates = np.flatnonzero(estimates >= heavy.floor())
+        kept = heavy.members
+        top_floor = top.floor()
+        for i, estimate in zip(candidates.tolist(), estimates[candidates].tolist()):
+            word = words[i]
+            if word in kept:
+                kept[word] = estimate
+            else:
+                if estimate < heavy.floor():
+                    continue
+                pushed_out = heavy.update(word, estimate)
+                if pushed_out is not None:
+                    top.discard(pushed_out)
+                elif word not in kept:
+                    # lost the tie with the lowest kept word
+                    continue
+            if estimate >= top_floor:
+                top.update(word, estimate)
+                top_floor = top.floor()
+
+    def top_words(self, k=None):
+        ''' (word, count) of the k most frequent words, most frequent first, ties in alphabetical order. '''
+        if k is None or k <= self.k:
+            return self.top.items()[:k]
+        return nsmallest(k, self.counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def restore(self, word_counts):
+        # starts over from word -> count, e.g. a checkpoint
+        self.clear()
+        self.update(word_counts)